@@ -17,6 +17,17 @@ import asyncio
 import io
 from discord.ui import View, Button
 import functools
+import sqlite3
+import unicodedata
+import heapq
+import gzip
+import html
+import tempfile
+import collections
+import bisect
+from array import array
+import concurrent.futures
+import signal
 
 # =========================
 # Intents and Bot Instance
@@ -32,7 +43,24 @@ load_dotenv()
 
 # We need to initialize the bot early to avoid decorator issues
 # We'll set the proper prefix after loading config
-bot = commands.Bot(command_prefix="?", intents=intents, help_command=None)
+class NovaBot(commands.Bot):
+    """commands.Bot that saves whatever the background writers still have queued when it shuts down."""
+
+    async def setup_hook(self):
+        # bot.run only turns Ctrl+C into close(); a service stop sends SIGTERM, which would exit without it
+        try:
+            self.loop.add_signal_handler(signal.SIGTERM, lambda: self.loop.create_task(self.close()))
+        except NotImplementedError:
+            pass  # Windows event loops have no signal handlers
+
+    async def close(self):
+        try:
+            await shutdown_flush()
+        except Exception as e:
+            print(f"❌ Error saving data on shutdown: {e}")
+        await super().close()
+
+bot = NovaBot(command_prefix="?", intents=intents, help_command=None)
 
 # =========================
 # Constants and Globals
@@ -45,6 +73,7 @@ BIRTHDAY_FILE = "birthdays.json"
 RELATIONSHIPS_FILE = "relationships.json"
 REMINDERS_FILE = "reminders.json"
 THRIFT_FILE = "thrift.json"
+INVENTORY_FILE = "inventory.json"
 AFK_FILE = "afk.json"
 PROFILES_FILE = "profiles.json"
 MESSAGE_ACTIVITY_FILE = "message_activity.json"
@@ -53,10 +82,12 @@ BCA_VOTES_FILE = "bca_votes.json"
 BCA_CATEGORIES_FILE = "bca_categories.json"
 BCA_CHANGES_FILE = "bca_changes.json"
 BCA_COUNTDOWNS_FILE = "bca_countdowns.json"
+BCA_ANNOUNCEMENTS_FILE = "bca_announcements.json"
+CENTRAL_LOG_CHANNELS_FILE = "central_log_channels.json"
 SERVER_CONFIGS_FILE = "server_configs.json"
 
 balances = {}  # guild_id: {user_id: balance}
-user_xp = {}  # guild_id: {user_id: xp_data}
+user_xp = {}  # guild_id: {user_id: total XP}, GLOBAL_SCOPE parks pre-split XP of members with no server yet
 config = {}
 
 # Per-server prefixes - loaded from config, defaults to "?"
@@ -73,78 +104,173 @@ def get_prefix(bot, message):
     # Return server-specific prefix or default
     return SERVER_PREFIXES.get(message.guild.id, DEFAULT_PREFIX)
 
-beg_cooldowns = {}
-work_cooldowns = {}
-daily_cooldowns = {}
 
 # Live countdown message tracking
-active_countdown_messages = {}  # message_id: {guild_id, channel_id, event_name, message_obj}
+active_countdown_messages = {}  # message_id: {guild_id, channel_id, event_name, message_obj, text}
+
+COUNTDOWN_TZ = pytz.timezone('US/Eastern')
+COUNTDOWN_EDIT_RATE = 5.0  # message edits per second across all countdowns
+COUNTDOWN_CHANNEL_INTERVAL = 1.2  # seconds between edits in one channel, under Discord's 5 per 5s
+COUNTDOWN_RETRY_DELAY = 5  # seconds before retrying an edit that failed for a transient reason
+countdown_queue = []  # heap of (due, message_id), due on the loop clock
+countdown_wakeup = None
+countdown_task = None
+countdown_channel_ready = {}  # channel_id: loop time the channel can take its next edit
+
+def countdown_granularity(seconds_left):
+    """How precisely to show (and so how often to refresh) a countdown with this much time left."""
+    if seconds_left > 2 * 86400:
+        return 3600
+    if seconds_left > 3600:
+        return 60
+    return 1
+
+def render_countdown(event_name, event_data, now=None):
+    """Return (embed text, seconds until the text next changes or None once the event has ended)."""
+    now = now or datetime.now(COUNTDOWN_TZ)
+    seconds_left = (event_data["end_time"] - now).total_seconds()
+    if seconds_left <= 0:
+        time_str = "eVENT hAS eNDED!"
+        next_change = None
+    else:
+        step = countdown_granularity(seconds_left)
+        shown = int(seconds_left // step) * step
+        days, remainder = divmod(shown, 86400)
+        hours, remainder = divmod(remainder, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        if step == 3600:
+            time_str = f"{days} days, {hours} hours"
+        elif step == 60:
+            time_str = f"{days} days, {hours} hours, {minutes} minutes"
+        else:
+            time_str = f"{days} days, {hours} hours, {minutes} minutes, {seconds} seconds"
+        # The text changes when seconds_left drops below the shown value (or to the next, finer granularity)
+        next_change = max(seconds_left - shown, 0.05)
+    return f"{event_data['description']}\n\n⏱️ **tIME rEMAINING:** **{time_str}**", next_change
+
+def schedule_countdown(message_id, delay=0):
+    heapq.heappush(countdown_queue, (asyncio.get_running_loop().time() + delay, message_id))
+    if countdown_wakeup is not None:
+        countdown_wakeup.set()
+
+def track_countdown_message(guild_id, channel_id, event_name, message, text=None):
+    """Keep a countdown message live, and remember it in BCA_COUNTDOWNS so it survives restarts."""
+    active_countdown_messages[message.id] = {
+        'guild_id': guild_id,
+        'channel_id': channel_id,
+        'event_name': event_name,
+        'message_obj': message,
+        'text': text,
+    }
+    event_data = BCA_COUNTDOWNS.get(guild_id, {}).get(event_name)
+    if event_data is not None:
+        messages = event_data.setdefault("messages", [])
+        if [channel_id, message.id] not in messages:
+            messages.append([channel_id, message.id])
+            save_bca_countdowns()
+    schedule_countdown(message.id)
+
+def untrack_countdown_message(message_id):
+    data = active_countdown_messages.pop(message_id, None)
+    if data is None:
+        return
+    event_data = BCA_COUNTDOWNS.get(data['guild_id'], {}).get(data['event_name'])
+    if event_data is not None and [data['channel_id'], message_id] in event_data.get("messages", []):
+        event_data["messages"].remove([data['channel_id'], message_id])
+        save_bca_countdowns()
+
+def rehydrate_countdowns():
+    """Re-track the live countdown messages saved in BCA_COUNTDOWNS, without fetching them."""
+    for guild_id, guild_countdowns in BCA_COUNTDOWNS.items():
+        for event_name, event_data in guild_countdowns.items():
+            for channel_id, message_id in list(event_data.get("messages", [])):
+                if message_id in active_countdown_messages:
+                    continue
+                channel = bot.get_channel(channel_id)
+                if channel is None:
+                    event_data["messages"].remove([channel_id, message_id])
+                    save_bca_countdowns()
+                    continue
+                track_countdown_message(guild_id, channel_id, event_name, channel.get_partial_message(message_id))
+
+async def edit_countdown(message_id, data, text, next_change):
+    """Send one edit, then schedule the next render for when the text will change."""
+    try:
+        await data['message_obj'].edit(embed=nova_embed(f"⏰ {data['event_name']}", text))
+        data['text'] = text
+    except (discord.NotFound, discord.Forbidden):
+        untrack_countdown_message(message_id)
+        return
+    except Exception as e:
+        print(f"❌ Error updating countdown message {message_id}: {e}")
+        schedule_countdown(message_id, COUNTDOWN_RETRY_DELAY)
+        return
+    if next_change is None:
+        untrack_countdown_message(message_id)
+    else:
+        schedule_countdown(message_id, next_change)
 
-# Background task for live countdown updates
 async def countdown_update_loop():
-    """Continuously update countdown messages every second"""
-    global active_countdown_messages, BCA_COUNTDOWNS
-    
-    print("🔴 COUNTDOWN UPDATE LOOP STARTED - RUNNING EVERY SECOND")
-    
+    """Render each live countdown only when its text changes, spreading edits under a rate budget.
+
+    Every message sits in a heap keyed by when its text next changes: hourly while the event is
+    days away, per minute within two days, per second in the last hour. Channels get at most one
+    edit per COUNTDOWN_CHANNEL_INTERVAL; a message whose channel is busy is pushed back and
+    rendered fresh when its turn comes, so a backlog coalesces instead of piling up.
+    """
+    global countdown_wakeup
+    countdown_wakeup = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    budget = RateBudget(COUNTDOWN_EDIT_RATE)
+    rehydrate_countdowns()
     while True:
         try:
-            if active_countdown_messages:
-                print(f"DEBUG: Updating {len(active_countdown_messages)} countdown messages...")
-                
-                messages_to_remove = []
-                
-                for message_id, data in list(active_countdown_messages.items()):
-                    try:
-                        guild_id = data['guild_id']
-                        event_name = data['event_name']
-                        message = data['message_obj']
-                        
-                        # Get current countdown data
-                        server_countdowns = BCA_COUNTDOWNS.get(guild_id, {})
-                        if event_name not in server_countdowns:
-                            messages_to_remove.append(message_id)
-                            continue
-                        
-                        event_data = server_countdowns[event_name]
-                        est = pytz.timezone('US/Eastern')
-                        now = datetime.now(est)
-                        time_diff = event_data["end_time"] - now
-                        
-                        if time_diff.total_seconds() <= 0:
-                            time_str = "eVENT hAS eNDED!"
-                            messages_to_remove.append(message_id)
-                        else:
-                            days = time_diff.days
-                            hours, remainder = divmod(time_diff.seconds, 3600)
-                            minutes, seconds = divmod(remainder, 60)
-                            time_str = f"{days} days, {hours} hours, {minutes} minutes, {seconds} seconds"
-                        
-                        # Update the embed
-                        description = f"{event_data['description']}\n\n⏱️ **tIME rEMAINING:** **{time_str}**"
-                        embed = nova_embed(f"⏰ {event_name}", description)
-                        
-                        # Edit the message
-                        await message.edit(embed=embed)
-                        print(f"✅ Updated countdown for {event_name}")
-                        
-                    except Exception as e:
-                        print(f"❌ Error updating countdown message {message_id}: {e}")
-                        messages_to_remove.append(message_id)
-                
-                # Remove failed/ended messages
-                for message_id in messages_to_remove:
-                    if message_id in active_countdown_messages:
-                        del active_countdown_messages[message_id]
-                        print(f"🗑️ Removed countdown message {message_id} from tracking")
-            
-            # Wait 1 second before next update
-            await asyncio.sleep(1)
-            
+            if not countdown_queue:
+                countdown_wakeup.clear()
+                await countdown_wakeup.wait()
+                continue
+            due, message_id = countdown_queue[0]
+            delay = due - loop.time()
+            if delay > 0:
+                countdown_wakeup.clear()
+                try:
+                    await asyncio.wait_for(countdown_wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(countdown_queue)
+            data = active_countdown_messages.get(message_id)
+            if data is None:
+                continue
+            event_data = BCA_COUNTDOWNS.get(data['guild_id'], {}).get(data['event_name'])
+            if event_data is None:
+                untrack_countdown_message(message_id)
+                continue
+            ready_at = countdown_channel_ready.get(data['channel_id'], 0)
+            if ready_at > loop.time():
+                schedule_countdown(message_id, ready_at - loop.time())
+                continue
+            text, next_change = render_countdown(data['event_name'], event_data)
+            if text == data['text']:
+                if next_change is None:
+                    untrack_countdown_message(message_id)
+                else:
+                    schedule_countdown(message_id, next_change)
+                continue
+            await budget.acquire()
+            countdown_channel_ready[data['channel_id']] = loop.time() + COUNTDOWN_CHANNEL_INTERVAL
+            loop.create_task(edit_countdown(message_id, data, text, next_change))
         except Exception as e:
             print(f"❌ Error in countdown update loop: {e}")
             await asyncio.sleep(1)
 
+def start_countdown_renderer():
+    """Start the countdown renderer once (on_ready can fire again after reconnects)."""
+    global countdown_task
+    if countdown_task is None or countdown_task.done():
+        countdown_task = bot.loop.create_task(countdown_update_loop())
+        print("🚀 LIVE COUNTDOWN RENDERER STARTED")
+
 OWNER_ID = 755846396208218174
 
 # Server restriction - Set to your server ID
@@ -169,7 +295,7 @@ AUTO_REACTIONS = {}  # trigger_word: emoji
 DISABLED_COMMANDS = set()  # Set of disabled command names
 
 # Message activity tracking system
-MESSAGE_ACTIVITY = {}  # guild_id: {user_id: [{"timestamp": datetime, "count": int}]}
+MESSAGE_ACTIVITY = {}  # guild_id: {user_id: ActivityCounter}
 
 # Runway system
 RUNWAY_CHANNEL_ID = None  # Set this to your runway channel ID
@@ -354,6 +480,661 @@ INTERNATIONAL_DAYS = {
     "25-12": "cHRISTMAS dAY"
 }
 
+# =========================
+# Write-behind Persistence
+# =========================
+
+PERSIST_FLUSH_INTERVAL = 5  # Seconds between background flushes
+PERSIST_MAX_DIRTY = 200  # Pending dirty keys that force an early flush
+
+PERSIST_STORES = {}  # store_name: {"path": str, "serialize": callable, "indent": int}
+PERSIST_DIRTY = {}  # store_name: set of keys changed since the last flush
+persist_pending = 0  # Total dirty keys across all stores
+persist_wakeup = None  # asyncio.Event, created by the flush loop
+persist_flush_task = None
+
+def register_store(name, path, serialize, indent=None):
+    """Register a JSON-backed store with the write-behind persistence engine."""
+    PERSIST_STORES[name] = {"path": path, "serialize": serialize, "indent": indent}
+    PERSIST_DIRTY.setdefault(name, set())
+
+def register_table_store(name, write_keys):
+    """Register a SQLite-backed store. write_keys(conn, keys) upserts or deletes only the rows for those keys."""
+    PERSIST_STORES[name] = {"write_keys": write_keys}
+    PERSIST_DIRTY.setdefault(name, set())
+
+def mark_dirty(name, key=None):
+    """Queue a store for the next background flush instead of rewriting it now."""
+    global persist_pending
+    dirty = PERSIST_DIRTY.setdefault(name, set())
+    if key not in dirty:
+        dirty.add(key)
+        persist_pending += 1
+    if persist_wakeup is not None and persist_pending >= PERSIST_MAX_DIRTY:
+        persist_wakeup.set()
+
+def atomic_write_text(path, text):
+    """Write text to a temp file and rename it over the target so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class StatementBatch:
+    """Records the SQL a table store's write_keys() wants to run so it can be applied later on the storage thread."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params, False))
+
+    def executemany(self, sql, rows):
+        self.statements.append((sql, list(rows), True))
+
+    def run(self, conn):
+        for sql, params, many in self.statements:
+            if many:
+                conn.executemany(sql, params)
+            else:
+                conn.execute(sql, params)
+
+    def apply(self, conn):
+        with conn:
+            self.run(conn)
+
+    def __call__(self):
+        """Apply the batch in a transaction of its own, so it can be used as a flush job."""
+        self.apply(get_db())
+
+def prepare_flush(name):
+    """Claim a store's dirty keys and snapshot them on the event loop thread.
+
+    Returns (keys, job) where job() does the disk or database write and is safe to run
+    on the storage thread, or None if there is nothing to flush.
+    """
+    global persist_pending
+    dirty = PERSIST_DIRTY.get(name)
+    store = PERSIST_STORES.get(name)
+    if not dirty or not store:
+        return None
+    PERSIST_DIRTY[name] = set()
+    persist_pending = max(0, persist_pending - len(dirty))
+    try:
+        if "write_keys" in store:
+            batch = StatementBatch()
+            store["write_keys"](batch, dirty)
+            return dirty, batch
+        text = json.dumps(store["serialize"](), indent=store["indent"])
+        return dirty, lambda: atomic_write_text(store["path"], text)
+    except Exception:
+        requeue_dirty(name, dirty)
+        raise
+
+def requeue_dirty(name, keys):
+    """Put keys back after a failed flush so the next one retries them."""
+    for key in keys:
+        mark_dirty(name, key)
+
+def flush_store(name):
+    """Write a single store to disk right now, blocking the caller (startup and shutdown only)."""
+    prepared = None
+    try:
+        prepared = prepare_flush(name)
+        if prepared is None:
+            return
+        keys, job = prepared
+        job()
+    except Exception as e:
+        print(f"Error flushing {name}: {e}")
+        if prepared is not None:
+            requeue_dirty(name, keys)
+
+async def flush_store_async(name):
+    """Snapshot a store on the loop and write it on the storage thread."""
+    prepared = None
+    try:
+        prepared = prepare_flush(name)
+        if prepared is None:
+            return
+        keys, job = prepared
+        await run_storage(job)
+    except Exception as e:
+        print(f"Error flushing {name}: {e}")
+        if prepared is not None:
+            requeue_dirty(name, keys)
+
+def prepare_flush_all():
+    """Claim and snapshot every dirty store in one pass, with nothing able to run in between.
+
+    Returns [(name, keys, job)]. Snapshotting store by store across awaits would let a later store
+    (a scan cursor) cover changes that arrived after an earlier one (the counts) was taken.
+    """
+    prepared = []
+    for name in list(PERSIST_STORES):
+        try:
+            result = prepare_flush(name)
+        except Exception as e:
+            print(f"Error flushing {name}: {e}")
+            continue
+        if result is not None:
+            prepared.append((name, *result))
+    return prepared
+
+def write_prepared(prepared):
+    """Write what prepare_flush_all claimed: every table store in one SQLite transaction, then each JSON file.
+
+    Returns the (name, keys) pairs that failed so the caller can requeue them on the event loop thread.
+    """
+    failed = []
+    tables = [(name, keys, batch) for name, keys, batch in prepared if isinstance(batch, StatementBatch)]
+    if tables:
+        try:
+            conn = get_db()
+            with conn:
+                for _, _, batch in tables:
+                    batch.run(conn)
+        except Exception as e:
+            print(f"Error flushing {', '.join(name for name, _, _ in tables)}: {e}")
+            failed.extend((name, keys) for name, keys, _ in tables)
+    for name, keys, job in prepared:
+        if not isinstance(job, StatementBatch):
+            try:
+                job()
+            except Exception as e:
+                print(f"Error flushing {name}: {e}")
+                failed.append((name, keys))
+    return failed
+
+def flush_all_stores():
+    """Flush every store with pending changes, blocking the caller (startup and shutdown only)."""
+    for name, keys in write_prepared(prepare_flush_all()):
+        requeue_dirty(name, keys)
+
+async def flush_all_stores_async():
+    """Snapshot every dirty store at once on the loop, then write them together on the storage thread."""
+    prepared = prepare_flush_all()
+    if not prepared:
+        return
+    try:
+        failed = await run_storage(write_prepared, prepared)
+    except Exception as e:
+        print(f"Error flushing stores: {e}")
+        failed = [(name, keys) for name, keys, _ in prepared]
+    for name, keys in failed:
+        requeue_dirty(name, keys)
+
+async def persistence_flush_loop():
+    """Flush dirty stores every PERSIST_FLUSH_INTERVAL seconds, or sooner once PERSIST_MAX_DIRTY keys pile up."""
+    global persist_wakeup
+    persist_wakeup = asyncio.Event()
+    while True:
+        try:
+            await asyncio.wait_for(persist_wakeup.wait(), timeout=PERSIST_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        persist_wakeup.clear()
+        try:
+            await flush_all_stores_async()
+        except Exception as e:
+            print(f"❌ Error in persistence flush loop: {e}")
+
+def start_persistence():
+    """Start the background flush task once (on_ready can fire again after reconnects)."""
+    global persist_flush_task
+    if persist_flush_task is None or persist_flush_task.done():
+        persist_flush_task = bot.loop.create_task(persistence_flush_loop())
+
+# =========================
+# Storage Thread and Loop Lag Monitoring
+# =========================
+
+# Every disk write and SQLite query runs on one dedicated worker thread. A single worker keeps
+# database access serialized and writes in order, so no locking is needed around the connection.
+STORAGE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="nova-storage")
+# Set NOVA_INLINE_STORAGE=1 to run storage jobs on the event loop like before, for comparing loop lag
+STORAGE_INLINE = os.getenv("NOVA_INLINE_STORAGE") == "1"
+
+LOOP_LAG_INTERVAL = 0.25  # Seconds between loop lag samples
+LOOP_LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)  # Upper bounds; the last bucket is everything above
+LOOP_LAG_HISTOGRAM = [0] * (len(LOOP_LAG_BUCKETS_MS) + 1)
+STORAGE_STATS = {"jobs": 0, "total_ms": 0.0, "max_ms": 0.0}
+loop_lag_max_ms = 0.0
+loop_lag_task = None
+
+async def run_storage(func, *args):
+    """Run a blocking storage call on the storage thread and await its result."""
+    started = time.perf_counter()
+    try:
+        if STORAGE_INLINE:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(STORAGE_EXECUTOR, functools.partial(func, *args))
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        STORAGE_STATS["jobs"] += 1
+        STORAGE_STATS["total_ms"] += elapsed_ms
+        STORAGE_STATS["max_ms"] = max(STORAGE_STATS["max_ms"], elapsed_ms)
+
+def record_loop_lag(lag_ms):
+    global loop_lag_max_ms
+    for i, bound in enumerate(LOOP_LAG_BUCKETS_MS):
+        if lag_ms <= bound:
+            LOOP_LAG_HISTOGRAM[i] += 1
+            break
+    else:
+        LOOP_LAG_HISTOGRAM[-1] += 1
+    loop_lag_max_ms = max(loop_lag_max_ms, lag_ms)
+
+def reset_loop_lag_stats():
+    global loop_lag_max_ms
+    for i in range(len(LOOP_LAG_HISTOGRAM)):
+        LOOP_LAG_HISTOGRAM[i] = 0
+    loop_lag_max_ms = 0.0
+    STORAGE_STATS.update(jobs=0, total_ms=0.0, max_ms=0.0)
+
+def loop_lag_percentile(fraction):
+    """Return the bucket upper bound (ms) that the given fraction of samples fall under, or None without samples."""
+    total = sum(LOOP_LAG_HISTOGRAM)
+    if not total:
+        return None
+    running = 0
+    for i, count in enumerate(LOOP_LAG_HISTOGRAM):
+        running += count
+        if running >= total * fraction:
+            return LOOP_LAG_BUCKETS_MS[i] if i < len(LOOP_LAG_BUCKETS_MS) else float("inf")
+    return float("inf")
+
+async def loop_lag_monitor():
+    """Sleep for a fixed interval and record how late the loop wakes us up. Lateness is time the loop spent blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        record_loop_lag(max(0.0, (loop.time() - started - LOOP_LAG_INTERVAL) * 1000))
+
+def load_storage():
+    """Load the database-backed hot stores, before bot.run.
+
+    Nothing is dispatched yet at that point, so no command or message can change a store and
+    then have the load overwrite it, and there is no event loop for the reads to block.
+    """
+    load_balances()
+    load_xp()
+    load_afk()
+    load_reminders()
+    load_message_activity()
+    load_activity_checkpoints()
+    load_history_scans()
+    load_scheduled_jobs()
+    load_runway_posts()
+    load_cooldowns()
+
+def start_loop_lag_monitor():
+    global loop_lag_task
+    if loop_lag_task is None or loop_lag_task.done():
+        loop_lag_task = bot.loop.create_task(loop_lag_monitor())
+
+# =========================
+# SQLite Storage
+# =========================
+
+DATABASE_FILE = "nova.db"
+GLOBAL_SCOPE = 0  # guild_id for data that follows a person across servers, and legacy rows not yet given a server
+
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS balances (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    balance INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_balances_rank ON balances (guild_id, balance DESC);
+CREATE TABLE IF NOT EXISTS economy_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS xp (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    xp INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS afk (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    since TEXT NOT NULL,
+    mentions TEXT NOT NULL DEFAULT '[]',
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS relationships (
+    guild_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    other_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, kind, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_relationships_other ON relationships (guild_id, kind, other_id);
+CREATE TABLE IF NOT EXISTS inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    item TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_inventory_user ON inventory (guild_id, user_id);
+CREATE TABLE IF NOT EXISTS thrift (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    seller_id INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    price INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_thrift_guild ON thrift (guild_id, id);
+CREATE TABLE IF NOT EXISTS pets (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    due_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_user ON reminders (guild_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (due_at);
+CREATE TABLE IF NOT EXISTS infractions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    reason TEXT,
+    date TEXT,
+    moderator TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_infractions_user ON infractions (guild_id, user_id);
+CREATE TABLE IF NOT EXISTS birthdays (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    about_me TEXT NOT NULL,
+    set_date TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS message_activity (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    lifetime INTEGER NOT NULL,
+    last_day INTEGER NOT NULL,
+    last_hour INTEGER NOT NULL,
+    daily BLOB NOT NULL,
+    hourly BLOB NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS activity_checkpoints (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    last_message_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, channel_id)
+);
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    due_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history_scans (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    after_id INTEGER NOT NULL,
+    stop_id INTEGER NOT NULL,
+    done INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, channel_id)
+);
+CREATE TABLE IF NOT EXISTS runway_posts (
+    source_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    runway_channel_id INTEGER NOT NULL,
+    runway_message_id INTEGER NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cooldowns (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, user_id, action)
+);
+"""
+
+db_conn = None
+
+def get_db():
+    """Open the shared SQLite connection on first use, creating the schema and running the JSON migration once."""
+    global db_conn
+    if db_conn is None:
+        db_conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
+        db_conn.row_factory = sqlite3.Row
+        db_conn.execute("PRAGMA journal_mode=WAL")
+        db_conn.execute("PRAGMA synchronous=NORMAL")
+        db_conn.executescript(DB_SCHEMA)
+        migrate_json_to_sqlite(db_conn)
+        migrate_activity_json(db_conn)
+        migrate_schema(db_conn)
+        migrate_legacy_server_rows(db_conn)
+    return db_conn
+
+# Data fixes for existing databases, applied in order; meta.schema_version counts how many have run
+SCHEMA_MIGRATIONS = [
+    # 1: older databases stored adoptions as parent -> child, which limited parents to one child
+    "UPDATE OR REPLACE relationships SET kind = 'parent', user_id = other_id, other_id = user_id WHERE kind = 'adopted'",
+    # 2: XP ranks come from in-memory RankBoards now, so the rank index only slows down writes
+    "DROP INDEX IF EXISTS idx_xp_rank",
+]
+
+def migrate_schema(conn):
+    """Run the SCHEMA_MIGRATIONS this database hasn't had yet, in one transaction."""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    version = int(row["value"]) if row else 0
+    if version >= len(SCHEMA_MIGRATIONS):
+        return
+    with conn:
+        for sql in SCHEMA_MIGRATIONS[version:]:
+            conn.execute(sql)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (str(len(SCHEMA_MIGRATIONS)),))
+
+def _db_execute(sql, params):
+    conn = get_db()
+    with conn:
+        return conn.execute(sql, params).lastrowid
+
+async def db_fetchone(sql, params=()):
+    """Run a query on the storage thread and return its first row."""
+    return await run_storage(lambda: get_db().execute(sql, params).fetchone())
+
+async def db_fetchall(sql, params=()):
+    """Run a query on the storage thread and return all rows."""
+    return await run_storage(lambda: get_db().execute(sql, params).fetchall())
+
+async def db_execute(sql, params=()):
+    """Run a single write in its own transaction on the storage thread and return the last row ID."""
+    return await run_storage(_db_execute, sql, params)
+
+def _read_legacy_json(path, default):
+    try:
+        with open(path, "r") as f:
+            content = f.read().strip()
+            return json.loads(content) if content else default
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Warning: Could not parse {path} during migration ({e}), skipping it")
+        return default
+
+def _legacy_ids(data):
+    """Yield (int_id, value) pairs from a JSON dict keyed by user ID strings, skipping malformed keys."""
+    for key, value in data.items():
+        if str(key).isdigit():
+            yield int(key), value
+
+def migrate_json_to_sqlite(conn):
+    """One-shot import of the legacy per-user JSON files. Recorded in the meta table so it never runs twice."""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+        return
+    print("📦 Migrating per-user JSON files into SQLite...")
+    with conn:
+        data = _read_legacy_json(DATA_FILE, {})
+        if data and isinstance(list(data.values())[0], (int, float)):
+            # Old global format - keep it under the global scope like load_balances used to
+            data = {"global": data}
+        for guild_key, guild_balances in data.items():
+            guild_id = GLOBAL_SCOPE if guild_key == "global" else int(guild_key)
+            conn.executemany(
+                "INSERT OR REPLACE INTO balances (guild_id, user_id, balance) VALUES (?, ?, ?)",
+                [(guild_id, user_id, balance) for user_id, balance in _legacy_ids(guild_balances)]
+            )
+        conn.executemany(
+            "INSERT OR REPLACE INTO xp (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?)",
+            [(GLOBAL_SCOPE, user_id, d.get("xp", 0), d.get("level", 1)) for user_id, d in _legacy_ids(_read_legacy_json(XP_FILE, {}))]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO afk (guild_id, user_id, reason, since, mentions) VALUES (?, ?, ?, ?, ?)",
+            [(GLOBAL_SCOPE, user_id, d["reason"], d["since"], json.dumps(d.get("mentions", [])))
+             for user_id, d in _legacy_ids(_read_legacy_json(AFK_FILE, {}))]
+        )
+        for key, other_id in _read_legacy_json(RELATIONSHIPS_FILE, {}).items():
+            kind, _, user_id = key.partition(":")
+            if not user_id.isdigit():
+                continue
+            edge = (GLOBAL_SCOPE, kind, int(user_id), int(other_id))
+            if kind == "adopted":
+                # Legacy "adopted:<parent>" keys held one child per parent; store the child -> parent edge instead
+                edge = (GLOBAL_SCOPE, "parent", int(other_id), int(user_id))
+            conn.execute(
+                "INSERT OR REPLACE INTO relationships (guild_id, kind, user_id, other_id) VALUES (?, ?, ?, ?)",
+                edge
+            )
+        for user_id, items in _legacy_ids(_read_legacy_json(INVENTORY_FILE, {})):
+            conn.executemany(
+                "INSERT INTO inventory (guild_id, user_id, item) VALUES (?, ?, ?)",
+                [(GLOBAL_SCOPE, user_id, item) for item in items]
+            )
+        conn.executemany(
+            "INSERT INTO thrift (guild_id, seller_id, item, price) VALUES (?, ?, ?, ?)",
+            [(GLOBAL_SCOPE, entry["seller"], entry["item"], entry["price"]) for entry in _read_legacy_json(THRIFT_FILE, [])]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO pets (guild_id, user_id, data) VALUES (?, ?, ?)",
+            [(GLOBAL_SCOPE, user_id, json.dumps(pet)) for user_id, pet in _legacy_ids(_read_legacy_json("pets.json", {}))]
+        )
+        # Legacy reminder times were event-loop clock values that mean nothing after a restart,
+        # so pending ones are imported as due now rather than silently dropped
+        now = datetime.now(dt_timezone.utc).timestamp()
+        for user_id, user_reminders in _legacy_ids(_read_legacy_json(REMINDERS_FILE, {})):
+            conn.executemany(
+                "INSERT INTO reminders (guild_id, user_id, message, due_at) VALUES (?, ?, ?, ?)",
+                [(GLOBAL_SCOPE, user_id, r["message"], now) for r in user_reminders.values()]
+            )
+        for user_id, infractions in _legacy_ids(_read_legacy_json("infractions.json", {})):
+            conn.executemany(
+                "INSERT INTO infractions (guild_id, user_id, type, reason, date, moderator) VALUES (?, ?, ?, ?, ?, ?)",
+                [(GLOBAL_SCOPE, user_id, inf.get("type", "unknown"), inf.get("reason"), inf.get("date"), inf.get("moderator"))
+                 for inf in infractions]
+            )
+        conn.executemany(
+            "INSERT OR REPLACE INTO birthdays (guild_id, user_id, date) VALUES (?, ?, ?)",
+            [(GLOBAL_SCOPE, user_id, date) for user_id, date in _legacy_ids(_read_legacy_json(BIRTHDAY_FILE, {}))]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO profiles (guild_id, user_id, about_me, set_date) VALUES (?, ?, ?, ?)",
+            [(GLOBAL_SCOPE, user_id, p["about_me"], p.get("set_date", datetime.now().isoformat()))
+             for user_id, p in _legacy_ids(_read_legacy_json(PROFILES_FILE, {})) if "about_me" in p]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+            (datetime.now(dt_timezone.utc).isoformat(),)
+        )
+    print("✅ JSON migration complete")
+
+def migrate_activity_json(conn):
+    """Import the old list-of-timestamps message_activity.json into the bucketed counters once."""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'activity_migrated'").fetchone():
+        return
+    data = _read_legacy_json(MESSAGE_ACTIVITY_FILE, {})
+    with conn:
+        for guild_id, guild_data in _legacy_ids(data):
+            for user_id, entries in _legacy_ids(guild_data):
+                counter = ActivityCounter()
+                for entry in sorted(entries, key=lambda e: e["timestamp"]):
+                    when = datetime.fromisoformat(entry["timestamp"])
+                    if when.tzinfo is None:
+                        when = when.replace(tzinfo=dt_timezone.utc)
+                    counter.add(when, entry["count"])
+                conn.execute(
+                    "INSERT OR REPLACE INTO message_activity (guild_id, user_id, lifetime, last_day, last_hour, daily, hourly) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (guild_id, user_id, counter.lifetime, counter.last_day, counter.last_hour, counter.daily.tobytes(), counter.hourly.tobytes())
+                )
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('activity_migrated', ?)",
+            (datetime.now(dt_timezone.utc).isoformat(),)
+        )
+
+def legacy_home_guilds(conn, user_ids):
+    """Map each of user_ids to their home server: the one with the most recorded messages, else the one
+    where they have the most XP. Members with neither are left out. One pass over each table."""
+    homes = {}
+    for table, rank in (("message_activity", "lifetime"), ("xp", "level, xp")):
+        ranked = {}
+        for row in conn.execute(f"SELECT user_id, guild_id FROM {table} WHERE guild_id != ? ORDER BY {rank}", (GLOBAL_SCOPE,)):
+            if row["user_id"] in user_ids and row["user_id"] not in homes:
+                ranked[row["user_id"]] = row["guild_id"]  # ascending, so the last row kept ranks highest
+        homes.update(ranked)
+    return homes
+
+LEGACY_SERVER_TABLES = {"infractions": "user_id", "inventory": "user_id", "thrift": "seller_id"}  # table: column naming the member
+
+def migrate_legacy_server_rows(conn):
+    """Move infractions, items and thrift listings from before they were per server into each member's home server.
+
+    As with XP, members with no home server yet keep their GLOBAL_SCOPE rows, which no server shows,
+    and are tried again next start.
+    """
+    user_ids = set()
+    for table, column in LEGACY_SERVER_TABLES.items():
+        user_ids.update(row[0] for row in conn.execute(f"SELECT DISTINCT {column} FROM {table} WHERE guild_id = ?", (GLOBAL_SCOPE,)))
+    if not user_ids:
+        return
+    homes = legacy_home_guilds(conn, user_ids)
+    with conn:
+        for table, column in LEGACY_SERVER_TABLES.items():
+            conn.executemany(
+                f"UPDATE {table} SET guild_id = ? WHERE guild_id = ? AND {column} = ?",
+                [(guild_id, GLOBAL_SCOPE, user_id) for user_id, guild_id in homes.items()]
+            )
+    print(f"📦 Moved pre-split infractions, items and listings for {len(homes)} members into their most active server ({len(user_ids) - len(homes)} with no server yet kept)")
+
+def _keys_to_write(conn, table, keys, all_keys):
+    """A None key means the caller didn't say which rows changed, so clear the table and rewrite every row."""
+    if None not in keys:
+        return keys
+    conn.execute(f"DELETE FROM {table}")
+    return list(all_keys())
+
 # =========================
 # Helper Functions
 # =========================
@@ -430,8 +1211,8 @@ def init_bot():
     # Update the bot's command prefix to use the dynamic prefix function
     bot.command_prefix = get_prefix
 
-def save_config():
-    """Save the current config dict to CONFIG_FILE."""
+def serialize_config():
+    """Copy the live config globals into the config dict for writing to CONFIG_FILE."""
     global SERVER_PREFIXES, CHAT_LOGS_CHANNEL_ID, RULES_CHANNEL_ID, WELCOME_CHANNEL_ID, FAREWELL_CHANNEL_ID, RUNWAY_CHANNEL_ID, TICKET_CATEGORY_ID, SUPPORT_ROLE_ID, TICKET_LOGS_CHANNEL_ID, JOIN_LEAVE_LOGS_CHANNEL_ID, SERVER_LOGS_CHANNEL_ID, MOD_LOGS_CHANNEL_ID, BCA_NOMINATIONS_CHANNEL_ID, BCA_NOMINATIONS_LOGS_CHANNEL_ID, BCA_VOTING_CHANNEL_ID, BCA_VOTING_LOGS_CHANNEL_ID, BCA_NOMINATION_DEADLINE, BCA_VOTING_DEADLINE
     # Save server prefixes (convert int keys to string for JSON)
     config["server_prefixes"] = {str(guild_id): prefix for guild_id, prefix in SERVER_PREFIXES.items()}
@@ -452,85 +1233,573 @@ def save_config():
     config["bca_voting_logs_channel_id"] = BCA_VOTING_LOGS_CHANNEL_ID
     config["bca_nomination_deadline"] = BCA_NOMINATION_DEADLINE.isoformat() if BCA_NOMINATION_DEADLINE else None
     config["bca_voting_deadline"] = BCA_VOTING_DEADLINE.isoformat() if BCA_VOTING_DEADLINE else None
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f)
+    return config
 
-def load_balances():
-    """Load user balances from DATA_FILE into the global balances dict."""
-    global balances
+def save_config():
+    """Schedule the config for the next background flush."""
+    mark_dirty("config")
+
+register_store("config", CONFIG_FILE, serialize_config)
+
+# =========================
+# Economy Ledger
+# =========================
+
+# Every balance change is a numbered transaction appended to LEDGER_JOURNAL_FILE before the
+# command that made it replies. The balances table is a snapshot as of the last journaled
+# transaction it records; on startup the journal entries after it are replayed on top, so a
+# crash loses nothing that was acknowledged and never applies half a transfer.
+LEDGER_JOURNAL_FILE = "economy_journal.jsonl"
+LEDGER_COMMIT_DELAY = 0.02  # seconds a commit waits so a burst of transactions shares one fsync
+LEDGER_COMPACT_ENTRIES = 5000  # journal entries that trigger trimming what the snapshot covers
+LEDGER_COMMIT_TIMEOUT = 10  # seconds a command waits for the journal before replying anyway
+LEDGER_STATS = {"transactions": 0, "rejected": 0, "commits": 0, "max_batch": 0}
+ledger_seq = 0  # last transaction applied in memory
+ledger_journaled_seq = 0  # last transaction fsynced to the journal
+ledger_pending = []  # (entry, future) not yet fsynced, oldest first; the writer removes them once they are
+ledger_replayed_keys = set()  # (guild_id, user_id) rebuilt from the journal at startup
+ledger_journal_entries = 0
+ledger_compact_at = LEDGER_COMPACT_ENTRIES
+ledger_wakeup = None
+ledger_task = None
+ledger_lock = asyncio.Lock()  # held to write a batch or rebuild balances, so a rebuild finds every transaction in the journal or in ledger_pending
+
+def read_ledger_journal(after_seq=0):
+    """Journal entries with a sequence above after_seq, oldest first. A torn last line from a crash is skipped."""
+    entries = []
     try:
-        with open(DATA_FILE, "r") as f:
-            data = json.load(f)
-            # Handle both old format (global) and new format (per-server)
-            if data and isinstance(list(data.values())[0], (int, float)):
-                # Old format - migrate to new format under a default guild
-                print("Migrating old balance format to server-specific format")
-                balances = {"global": data}
-            else:
-                # New format - per server, convert string keys to integers
-                balances = {}
-                for guild_id, guild_balances in data.items():
-                    balances[int(guild_id)] = guild_balances
+        with open(LEDGER_JOURNAL_FILE, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                # A write retried after a failed fsync can repeat entries; sequences only go up
+                if entry["seq"] > after_seq:
+                    entries.append(entry)
+                    after_seq = entry["seq"]
     except FileNotFoundError:
-        balances = {}
+        pass
+    return entries
+
+def read_ledger_snapshot(conn):
+    """Balances table as {guild_id: {user_id: balance}}, and the last transaction it includes."""
+    snapshot = {}
+    for row in conn.execute("SELECT guild_id, user_id, balance FROM balances"):
+        snapshot.setdefault(row["guild_id"], {})[str(row["user_id"])] = row["balance"]
+    row = conn.execute("SELECT value FROM economy_meta WHERE key = 'snapshot_seq'").fetchone()
+    return snapshot, row["value"] if row else 0
+
+def replay_ledger(snapshot, entries):
+    """Apply journal entries to a balances snapshot in place; returns the (guild_id, user_id) keys touched."""
+    touched = set()
+    for entry in entries:
+        guild_balances = snapshot.setdefault(entry["guild"], {})
+        for user_id, amount in entry["legs"]:
+            guild_balances[user_id] = guild_balances.get(user_id, 0) + amount
+            touched.add((entry["guild"], user_id))
+    return touched
+
+def rebuild_balances():
+    """Balances rebuilt from the snapshot plus the journal, and the last sequence seen. Runs on the storage thread."""
+    snapshot, snapshot_seq = read_ledger_snapshot(get_db())
+    entries = read_ledger_journal(snapshot_seq)
+    touched = replay_ledger(snapshot, entries)
+    return snapshot, max([snapshot_seq] + [entry["seq"] for entry in entries]), touched
+
+def load_balances():
+    """Load balances from the last snapshot and replay the journal written since."""
+    global balances, ledger_seq, ledger_journaled_seq, ledger_replayed_keys, ledger_journal_entries, ledger_compact_at
+    balances, ledger_seq, ledger_replayed_keys = rebuild_balances()
+    ledger_journaled_seq = ledger_seq
+    ledger_journal_entries = len(read_ledger_journal())
+    ledger_compact_at = ledger_journal_entries + LEDGER_COMPACT_ENTRIES
+    if ledger_replayed_keys:
+        print(f"💰 Replayed economy journal up to transaction {ledger_seq} ({len(ledger_replayed_keys)} balances)")
+
+def write_balance_rows(conn, keys):
+    """Upsert the balance row for each dirty (guild_id, user_id) key, and stamp the snapshot's sequence.
+
+    The snapshot is taken as of ledger_journaled_seq: legs of transactions still waiting for the
+    journal are backed out of the rows written, and those rows are queued again for the next flush.
+    """
+    keys = _keys_to_write(conn, "balances", keys, lambda: [
+        (guild_id, user_id) for guild_id, guild_balances in balances.items() for user_id in guild_balances
+    ])
+    unjournaled = {}
+    for entry, _ in ledger_pending:
+        for user_id, amount in entry["legs"]:
+            unjournaled[(entry["guild"], user_id)] = unjournaled.get((entry["guild"], user_id), 0) + amount
+    for guild_id, user_id in keys:
+        balance = balances.get(guild_id, {}).get(user_id)
+        if balance is not None and (guild_id, user_id) in unjournaled:
+            balance -= unjournaled[(guild_id, user_id)]
+            mark_dirty("balances", (guild_id, user_id))
+        if balance is None:
+            conn.execute("DELETE FROM balances WHERE guild_id = ? AND user_id = ?", (guild_id, int(user_id)))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO balances (guild_id, user_id, balance) VALUES (?, ?, ?)",
+                (guild_id, int(user_id), balance)
+            )
+    # Every journaled transaction marked its balances dirty, so they are all in this batch or an earlier one
+    conn.execute("INSERT OR REPLACE INTO economy_meta (key, value) VALUES ('snapshot_seq', ?)", (ledger_journaled_seq,))
 
 def save_balances():
-    """Save the current balances dict to DATA_FILE."""
-    with open(DATA_FILE, "w") as f:
-        # Convert integer keys to strings for JSON
-        data = {}
-        for guild_id, guild_balances in balances.items():
-            data[str(guild_id)] = guild_balances
-        json.dump(data, f)
+    """Schedule balances for the next background flush."""
+    mark_dirty("balances")
+
+register_table_store("balances", write_balance_rows)
 
 def get_balance(user_id, guild_id):
     """Get the balance for a user by their ID in a specific server."""
     guild_balances = balances.get(guild_id, {})
     return guild_balances.get(str(user_id), 0)
 
-def change_balance(user_id, amount, guild_id):
-    """Change a user's balance by a given amount in a specific server. Prevents negative balances."""
-    user_id = str(user_id)
-    
-    # Initialize guild balances if not exists
-    if guild_id not in balances:
-        balances[guild_id] = {}
-    
-    # Update balance
-    balances[guild_id][user_id] = balances[guild_id].get(user_id, 0) + amount
-    if balances[guild_id][user_id] < 0:
-        balances[guild_id][user_id] = 0
-    save_balances()
+def post_transaction(guild_id, legs, reason):
+    """Apply [(user_id, amount)] to one server's balances all at once and queue it for the journal.
+
+    Returns a future that completes once the transaction is on disk, or None if it would leave
+    anyone negative.
+    """
+    global ledger_seq
+    guild_balances = balances.setdefault(guild_id, {})
+    changes = {}
+    for user_id, amount in legs:
+        user_id = str(user_id)
+        changes[user_id] = changes.get(user_id, 0) + amount
+    for user_id, amount in changes.items():
+        if guild_balances.get(user_id, 0) + amount < 0:
+            LEDGER_STATS["rejected"] += 1
+            return None
+    for user_id, amount in changes.items():
+        guild_balances[user_id] = guild_balances.get(user_id, 0) + amount
+        mark_dirty("balances", (guild_id, user_id))
+    ledger_seq += 1
+    entry = {"seq": ledger_seq, "guild": guild_id, "legs": [[user_id, amount] for user_id, amount in changes.items()], "reason": reason, "at": time.time()}
+    future = asyncio.get_running_loop().create_future()
+    ledger_pending.append((entry, future))
+    LEDGER_STATS["transactions"] += 1
+    if ledger_wakeup is not None:
+        ledger_wakeup.set()
+    return future
+
+async def transfer(guild_id, legs, reason):
+    """Post a transaction and wait until it is journaled. Returns False if someone can't afford their part.
+
+    The transaction is already applied, so if the journal is stuck (a full or failing disk) the wait
+    gives up after LEDGER_COMMIT_TIMEOUT and the writer keeps retrying in the background.
+    """
+    future = post_transaction(guild_id, legs, reason)
+    if future is None:
+        return False
+    try:
+        await asyncio.wait_for(asyncio.shield(future), LEDGER_COMMIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"❌ Economy journal is over {LEDGER_COMMIT_TIMEOUT}s behind, replying to '{reason}' before it is on disk")
+    return True
+
+def append_ledger_journal(lines):
+    with open(LEDGER_JOURNAL_FILE, "a") as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+def compact_ledger_journal():
+    """Drop journal entries the stored snapshot already includes; returns how many remain. Runs on the storage thread."""
+    conn = get_db()
+    # WAL commits under synchronous=NORMAL aren't fsynced, so checkpoint first or a power cut could
+    # take the snapshot back to before entries this drops
+    busy, _, _ = conn.execute("PRAGMA wal_checkpoint(FULL)").fetchone()
+    if busy:
+        return len(read_ledger_journal())
+    _, snapshot_seq = read_ledger_snapshot(conn)
+    entries = read_ledger_journal(snapshot_seq)
+    atomic_write_text(LEDGER_JOURNAL_FILE, "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries))
+    return len(entries)
+
+def ledger_journal_lines(batch):
+    return "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry, _ in batch)
+
+def mark_ledger_journaled(batch):
+    """Drop a written batch from the front of ledger_pending and advance ledger_journaled_seq."""
+    global ledger_journaled_seq
+    del ledger_pending[:len(batch)]
+    ledger_journaled_seq = batch[-1][0]["seq"]
+
+async def ledger_writer():
+    """Group commit: write every transaction posted since the last commit with one fsync."""
+    global ledger_wakeup, ledger_journal_entries, ledger_compact_at
+    ledger_wakeup = asyncio.Event()
+    while True:
+        if not ledger_pending:
+            ledger_wakeup.clear()
+            await ledger_wakeup.wait()
+        await asyncio.sleep(LEDGER_COMMIT_DELAY)
+        async with ledger_lock:
+            # The batch stays in ledger_pending until it is on disk, so snapshots taken meanwhile leave it out
+            batch = ledger_pending[:]
+            try:
+                await run_storage(append_ledger_journal, ledger_journal_lines(batch))
+            except Exception as e:
+                print(f"❌ Error writing economy journal: {e}")
+                batch = None
+            else:
+                mark_ledger_journaled(batch)
+        if batch is None:
+            await asyncio.sleep(1)
+            continue
+        for _, future in batch:
+            if not future.done():
+                future.set_result(True)
+        LEDGER_STATS["commits"] += 1
+        LEDGER_STATS["max_batch"] = max(LEDGER_STATS["max_batch"], len(batch))
+        ledger_journal_entries += len(batch)
+        if ledger_journal_entries >= ledger_compact_at:
+            try:
+                ledger_journal_entries = await run_storage(compact_ledger_journal)
+            except Exception as e:
+                print(f"❌ Error compacting economy journal: {e}")
+            ledger_compact_at = ledger_journal_entries + LEDGER_COMPACT_ENTRIES
+
+def start_ledger():
+    global ledger_task
+    for key in ledger_replayed_keys:
+        mark_dirty("balances", key)
+    ledger_replayed_keys.clear()
+    if ledger_task is None or ledger_task.done():
+        ledger_task = bot.loop.create_task(ledger_writer())
+
+def flush_ledger_journal():
+    """Write any transactions still queued, blocking the caller (shutdown only)."""
+    batch = ledger_pending[:]
+    if batch:
+        append_ledger_journal(ledger_journal_lines(batch))
+        mark_ledger_journaled(batch)
+
+async def shutdown_flush():
+    """Journal every pending transaction and write every dirty store. Runs from bot.close()."""
+    if ledger_task is not None:
+        # A batch the writer had in flight stays pending and is written again below; replay skips repeats
+        ledger_task.cancel()
+    async with ledger_lock:
+        batch = ledger_pending[:]
+        if batch:
+            await run_storage(append_ledger_journal, ledger_journal_lines(batch))
+            mark_ledger_journaled(batch)
+    await flush_all_stores_async()
+
+async def ledger_sync():
+    """Wait until everything posted so far is journaled and snapshotted. Raises asyncio.TimeoutError if the journal is stuck."""
+    if ledger_pending:
+        await asyncio.wait_for(asyncio.gather(*(asyncio.shield(future) for _, future in ledger_pending)), LEDGER_COMMIT_TIMEOUT)
+    await flush_store_async("balances")
+
+@bot.command()
+async def ledger(ctx, action: str = None):
+    """Economy journal status, or check/rebuild balances from it (Owner only). Usage: ?ledger [verify|replay]"""
+    global balances
+    if ctx.author.id != OWNER_ID:
+        await ctx.send(embed=nova_embed("lEDGER", "oNLY tHE oWNER cAN dO tHIS!"))
+        return
+    if action in ("verify", "replay"):
+        try:
+            await ledger_sync()
+        except asyncio.TimeoutError:
+            await ctx.send(embed=nova_embed("lEDGER", "tHE jOURNAL cAN'T bE wRITTEN rIGHT nOW, tRY aGAIN lATER."))
+            return
+        async with ledger_lock:
+            rebuilt, rebuilt_seq, _ = await run_storage(rebuild_balances)
+            # Transactions posted while the rebuild ran can't have reached the journal, so they are still pending.
+            # Apply them and compare or swap without yielding, so nothing posted after this point is lost.
+            replay_ledger(rebuilt, [entry for entry, _ in ledger_pending if entry["seq"] > rebuilt_seq])
+            keys = {(guild_id, user_id) for source in (rebuilt, balances) for guild_id, users in source.items() for user_id in users}
+            mismatched = [key for key in keys if rebuilt.get(key[0], {}).get(key[1], 0) != balances.get(key[0], {}).get(key[1], 0)]
+            if action == "replay" and mismatched:
+                balances = rebuilt
+                for key in mismatched:
+                    mark_dirty("balances", key)
+        if action == "replay" and mismatched:
+            await ctx.send(embed=nova_embed("lEDGER", f"rEBUILT bALANCES fROM tHE jOURNAL, {len(mismatched)} cORRECTED."))
+            return
+        await ctx.send(embed=nova_embed("lEDGER", f"{len(keys)} bALANCES cHECKED, {len(mismatched)} mISMATCHED."))
+        return
+    embed = nova_embed("lEDGER", f"lAST tRANSACTION: #{ledger_seq}")
+    embed.add_field(name="Journal", value=f"{ledger_journal_entries} entries, {len(ledger_pending)} pending", inline=True)
+    embed.add_field(
+        name="Commits",
+        value=f"{LEDGER_STATS['transactions']} transactions in {LEDGER_STATS['commits']} fsyncs, largest batch {LEDGER_STATS['max_batch']}",
+        inline=True
+    )
+    embed.add_field(name="Rejected", value=str(LEDGER_STATS["rejected"]), inline=True)
+    await ctx.send(embed=embed)
+
+# =========================
+# Cooldowns
+# =========================
+
+COOLDOWNS = {}  # (guild_id, user_id, action): unix time the cooldown ends; only running cooldowns are kept
+COOLDOWN_EXPIRY = []  # heap of (expires_at, key); entries whose cooldown was replaced are skipped
+COOLDOWN_COMPACT_INTERVAL = 300  # seconds between sweeps of expired cooldowns nobody checked again
+COOLDOWN_STATS = {}  # action: {"used": n, "hit": n}
+cooldown_compactor_task = None
+
+def load_cooldowns():
+    """Load cooldowns from the database. Expired rows are dropped by the first compaction."""
+    global COOLDOWNS, COOLDOWN_EXPIRY
+    rows = get_db().execute("SELECT guild_id, user_id, action, expires_at FROM cooldowns")
+    COOLDOWNS = {(row["guild_id"], row["user_id"], row["action"]): row["expires_at"] for row in rows}
+    COOLDOWN_EXPIRY = [(expires_at, key) for key, expires_at in COOLDOWNS.items()]
+    heapq.heapify(COOLDOWN_EXPIRY)
+
+def write_cooldown_rows(conn, keys):
+    for key in _keys_to_write(conn, "cooldowns", keys, lambda: list(COOLDOWNS)):
+        expires_at = COOLDOWNS.get(key)
+        if expires_at is None:
+            conn.execute("DELETE FROM cooldowns WHERE guild_id = ? AND user_id = ? AND action = ?", key)
+        else:
+            conn.execute("INSERT OR REPLACE INTO cooldowns (guild_id, user_id, action, expires_at) VALUES (?, ?, ?, ?)", key + (expires_at,))
+
+register_table_store("cooldowns", write_cooldown_rows)
+
+def cooldown_remaining(guild_id, user_id, action):
+    """Seconds left on a cooldown, or 0. An expired entry is removed when it's found."""
+    key = (guild_id, user_id, action)
+    expires_at = COOLDOWNS.get(key)
+    if expires_at is None:
+        return 0
+    remaining = expires_at - time.time()
+    if remaining <= 0:
+        del COOLDOWNS[key]
+        mark_dirty("cooldowns", key)
+        return 0
+    return remaining
+
+def use_cooldown(guild_id, user_id, action, seconds):
+    """Start a cooldown unless one is running. Returns the seconds left if it is, or 0 once started."""
+    stats = COOLDOWN_STATS.setdefault(action, {"used": 0, "hit": 0})
+    remaining = cooldown_remaining(guild_id, user_id, action)
+    if remaining:
+        stats["hit"] += 1
+        return remaining
+    stats["used"] += 1
+    key = (guild_id, user_id, action)
+    expires_at = time.time() + seconds
+    COOLDOWNS[key] = expires_at
+    mark_dirty("cooldowns", key)
+    heapq.heappush(COOLDOWN_EXPIRY, (expires_at, key))
+    return 0
+
+def clear_cooldown(guild_id, user_id, action):
+    """End a cooldown early. Its heap entry is skipped by the compactor once it no longer matches."""
+    key = (guild_id, user_id, action)
+    if COOLDOWNS.pop(key, None) is not None:
+        mark_dirty("cooldowns", key)
+
+def compact_cooldowns():
+    """Drop every expired cooldown; returns how many were removed."""
+    now = time.time()
+    removed = 0
+    while COOLDOWN_EXPIRY and COOLDOWN_EXPIRY[0][0] <= now:
+        expires_at, key = heapq.heappop(COOLDOWN_EXPIRY)
+        if COOLDOWNS.get(key) == expires_at:
+            del COOLDOWNS[key]
+            mark_dirty("cooldowns", key)
+            removed += 1
+    return removed
+
+async def cooldown_compactor():
+    while True:
+        compact_cooldowns()
+        await asyncio.sleep(COOLDOWN_COMPACT_INTERVAL)
+
+def start_cooldown_compactor():
+    global cooldown_compactor_task
+    if cooldown_compactor_task is None or cooldown_compactor_task.done():
+        cooldown_compactor_task = bot.loop.create_task(cooldown_compactor())
+
+def format_cooldown(seconds):
+    seconds = int(-(-seconds // 1))  # round up so a running cooldown never shows as 0s
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+def cooldown(action, seconds, title, message):
+    """Per-server, per-user cooldown for a text or slash command.
+
+    Put it under @bot.command() or @bot.tree.command(). While the cooldown runs the command
+    isn't called and the user gets message, with {remaining} filled in. The cooldown starts
+    before the command runs, so a double invoke can't slip through, and is cleared again if
+    the command raises.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(target, *args, **kwargs):
+            user = target.user if isinstance(target, discord.Interaction) else target.author
+            guild_id = target.guild.id if target.guild else GLOBAL_SCOPE
+            remaining = use_cooldown(guild_id, user.id, action, seconds)
+            if remaining:
+                embed = nova_embed(title, f"{user.mention}, {message.format(remaining=format_cooldown(remaining))}")
+                if isinstance(target, discord.Interaction):
+                    await target.response.send_message(embed=embed, ephemeral=True)
+                else:
+                    await target.send(embed=embed)
+                return
+            try:
+                await func(target, *args, **kwargs)
+            except Exception:
+                clear_cooldown(guild_id, user.id, action)
+                raise
+        return wrapper
+    return decorator
+
+# =========================
+# XP
+# =========================
+
+XP_COOLDOWN = 60  # seconds between XP grants for one member in one server
+XP_LEVEL_STEP = 100  # going from level L to L + 1 takes L * XP_LEVEL_STEP XP
+XP_CURVE = [0, 0]  # XP_CURVE[level] = total XP needed to reach that level; index 0 is unused
+XP_BOARDS = {}  # guild_id: RankBoard of total XP
+XP_LAST_GRANT = {}  # (guild_id, user_id): monotonic time of the last grant
+
+def xp_for_level(level):
+    """Total XP needed to reach level, growing XP_CURVE past its precomputed levels if needed."""
+    while len(XP_CURVE) <= level:
+        XP_CURVE.append(XP_CURVE[-1] + (len(XP_CURVE) - 1) * XP_LEVEL_STEP)
+    return XP_CURVE[level]
+
+xp_for_level(1000)
+
+def xp_level(total):
+    """Level reached with total XP, read off the XP_CURVE table."""
+    while XP_CURVE[-1] <= total:
+        xp_for_level(len(XP_CURVE))
+    return bisect.bisect_right(XP_CURVE, total) - 1
+
+def migrate_legacy_xp(conn):
+    """Move XP from before it was per server (GLOBAL_SCOPE rows) into each member's most active server.
+
+    The home server is the one with the most recorded messages, else the one where the member has
+    the most XP. Members with neither keep their GLOBAL_SCOPE row and are tried again next start.
+    """
+    legacy = {
+        row["user_id"]: xp_for_level(row["level"]) + row["xp"]
+        for row in conn.execute("SELECT user_id, xp, level FROM xp WHERE guild_id = ?", (GLOBAL_SCOPE,))
+    }
+    if not legacy:
+        return
+    homes = legacy_home_guilds(conn, legacy)
+    with conn:
+        for user_id, home in homes.items():
+            row = conn.execute("SELECT xp, level FROM xp WHERE guild_id = ? AND user_id = ?", (home, user_id)).fetchone()
+            total = legacy[user_id] + (xp_for_level(row["level"]) + row["xp"] if row else 0)
+            level = xp_level(total)
+            conn.execute(
+                "INSERT OR REPLACE INTO xp (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?)",
+                (home, user_id, total - XP_CURVE[level], level)
+            )
+            conn.execute("DELETE FROM xp WHERE guild_id = ? AND user_id = ?", (GLOBAL_SCOPE, user_id))
+    print(f"📦 Moved pre-split XP for {len(homes)} members into their most active server ({len(legacy) - len(homes)} with no server yet kept)")
 
 def load_xp():
-    """Load user XP data from XP_FILE into the global user_xp dict."""
-    global user_xp
-    try:
-        with open(XP_FILE, "r") as f:
-            user_xp = json.load(f)
-    except FileNotFoundError:
-        user_xp = {}
+    """Load user XP data from the database into the global user_xp dict and rank boards.
+
+    Rows keep the old layout of level plus XP into that level; in memory each member has a single total.
+    """
+    global user_xp, XP_BOARDS
+    conn = get_db()
+    migrate_legacy_xp(conn)
+    user_xp = {}
+    for row in conn.execute("SELECT guild_id, user_id, xp, level FROM xp"):
+        user_xp.setdefault(row["guild_id"], {})[row["user_id"]] = xp_for_level(row["level"]) + row["xp"]
+    XP_BOARDS = {}
+    for guild_id, users in user_xp.items():
+        if guild_id != GLOBAL_SCOPE:
+            board = XP_BOARDS[guild_id] = RankBoard()
+            for user_id, total in users.items():
+                board.set(user_id, total)
+
+def write_xp_rows(conn, keys):
+    """Upsert the XP row for each dirty (guild_id, user_id)."""
+    all_keys = lambda: [(guild_id, user_id) for guild_id, users in user_xp.items() for user_id in users]
+    for guild_id, user_id in _keys_to_write(conn, "xp", keys, all_keys):
+        total = user_xp.get(guild_id, {}).get(user_id)
+        if total is None:
+            conn.execute("DELETE FROM xp WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+        else:
+            level = xp_level(total)
+            conn.execute(
+                "INSERT OR REPLACE INTO xp (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?)",
+                (guild_id, user_id, total - XP_CURVE[level], level)
+            )
 
 def save_xp():
-    """Save the current user_xp dict to XP_FILE."""
-    with open(XP_FILE, "w") as f:
-        json.dump(user_xp, f)
-
-def add_xp(user_id, amount):
-    """Add XP to a user and handle level-ups."""
-    user_id = str(user_id)
-    xp_data = user_xp.get(user_id, {"xp": 0, "level": 1})
-    xp_data["xp"] += amount
-    # Level up every 100 XP
-    if xp_data["xp"] >= xp_data["level"] * 100:
-        xp_data["xp"] = 0
-        xp_data["level"] += 1
-    user_xp[user_id] = xp_data
-    save_xp()
-
-def get_level(user_id):
-    """Get the level and XP for a user by their ID."""
-    return user_xp.get(str(user_id), {"xp": 0, "level": 1})
+    """Schedule XP data for the next background flush."""
+    mark_dirty("xp")
+
+register_table_store("xp", write_xp_rows)
+
+def get_xp_total(guild_id, user_id):
+    """A member's XP in a server."""
+    return user_xp.get(guild_id, {}).get(user_id, 0)
+
+def add_xp(guild_id, user_id, amount):
+    """Add XP to a member in one server, at most once per XP_COOLDOWN. Returns whether XP was granted."""
+    key = (guild_id, user_id)
+    now = time.monotonic()
+    if now - XP_LAST_GRANT.get(key, -XP_COOLDOWN) < XP_COOLDOWN:
+        return False
+    XP_LAST_GRANT[key] = now
+    total = get_xp_total(guild_id, user_id) + amount
+    user_xp.setdefault(guild_id, {})[user_id] = total
+    board = XP_BOARDS.get(guild_id)
+    if board is None:
+        board = XP_BOARDS[guild_id] = RankBoard()
+    board.set(user_id, total)
+    mark_dirty("xp", key)
+    return True
+
+def get_level(guild_id, user_id):
+    """Level, XP into the level, XP the level takes, and rank in the server for a member."""
+    total = get_xp_total(guild_id, user_id)
+    level = xp_level(total)
+    board = XP_BOARDS.get(guild_id)
+    return {
+        "level": level,
+        "xp": total - XP_CURVE[level],
+        "needed": level * XP_LEVEL_STEP,
+        "total": total,
+        "rank": board.rank(user_id) if board else None,
+        "ranked": len(board) if board else 0
+    }
+
+XP_PAGE_SIZE = 10
+
+def build_xp_leaderboard_page(guild, page):
+    """Embed text for one page of a server's XP leaderboard, straight from its rank board."""
+    board = XP_BOARDS.get(guild.id)
+    total_users = len(board) if board else 0
+    total_pages = max(1, -(-total_users // XP_PAGE_SIZE))
+    page = max(1, min(page, total_pages))
+    offset = (page - 1) * XP_PAGE_SIZE
+    lines = []
+    for rank, (user_id, total) in enumerate(board.page(offset, XP_PAGE_SIZE) if board else [], offset + 1):
+        member = guild.get_member(user_id)
+        name = f"**{member.display_name}**" if member else "*[User Left]*"
+        level = xp_level(total)
+        lines.append(f"{rank}. {name} - Level {level} ({total - XP_CURVE[level]}/{level * XP_LEVEL_STEP} XP)")
+    return "\n".join(lines) if lines else "nO dATA", page, total_pages
+
+def format_level(mention, data):
+    text = f"{mention}, you are level {data['level']} with {data['xp']}/{data['needed']} XP."
+    if data["rank"]:
+        text += f" (#{data['rank']} of {data['ranked']})"
+    return text
 
 def has_mod_or_admin(ctx):
     """Check if the user has mod or admin privileges, is the bot owner, or is the server owner."""
@@ -578,16 +1847,33 @@ def has_mod_or_admin(ctx):
     
     return False
 
-def load_birthdays():
-    try:
-        with open(BIRTHDAY_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+# Birthdays and profiles are per person, so they stay under GLOBAL_SCOPE. They are read from the
+# database when a command asks instead of being cached, so memory doesn't grow with everyone who set one.
+BIRTHDAY_LOOKUP_CHUNK = 500  # member IDs per query when listing a server's birthdays
+
+async def get_birthday(user_id):
+    """Return a user's birthday as a DD-MM string, or None."""
+    row = await db_fetchone("SELECT date FROM birthdays WHERE guild_id = ? AND user_id = ?", (GLOBAL_SCOPE, user_id))
+    return row["date"] if row else None
+
+async def set_birthday(user_id, date):
+    await db_execute("INSERT OR REPLACE INTO birthdays (guild_id, user_id, date) VALUES (?, ?, ?)", (GLOBAL_SCOPE, user_id, date))
+
+def _member_birthdays(member_ids):
+    conn = get_db()
+    birthdays = {}
+    for start in range(0, len(member_ids), BIRTHDAY_LOOKUP_CHUNK):
+        chunk = member_ids[start:start + BIRTHDAY_LOOKUP_CHUNK]
+        rows = conn.execute(
+            f"SELECT user_id, date FROM birthdays WHERE guild_id = ? AND user_id IN ({', '.join('?' * len(chunk))})",
+            (GLOBAL_SCOPE, *chunk)
+        )
+        birthdays.update((row["user_id"], row["date"]) for row in rows)
+    return birthdays
 
-def save_birthdays(birthdays):
-    with open(BIRTHDAY_FILE, "w") as f:
-        json.dump(birthdays, f)
+async def get_member_birthdays(guild):
+    """Return {user_id: date} for the guild's members who set one, looked up by primary key in chunks."""
+    return await run_storage(_member_birthdays, [member.id for member in guild.members])
 
 # Nova embed helper
 
@@ -616,126 +1902,509 @@ def format_birthday(date_str):
     except:
         return date_str  # Return original if parsing fails
 
-# AFK system persistence
+# AFK system persistence. AFK follows the person across servers (GLOBAL_SCOPE) and is checked on every
+# message, so it stays in memory; an entry is dropped when they come back, so only people away now are held.
 def load_afk():
-    """Load AFK status from AFK_FILE into the global AFK_STATUS dict."""
+    """Load AFK status from the database into the global AFK_STATUS dict."""
     global AFK_STATUS
-    try:
-        with open(AFK_FILE, "r") as f:
-            data = json.load(f)
-            # Convert string keys back to int and datetime strings back to datetime objects
-            AFK_STATUS = {}
-            for user_id_str, afk_data in data.items():
-                user_id = int(user_id_str)
-                AFK_STATUS[user_id] = {
-                    "reason": afk_data["reason"],
-                    "since": datetime.fromisoformat(afk_data["since"]),
-                    "mentions": set(afk_data.get("mentions", []))
-                }
-    except FileNotFoundError:
-        AFK_STATUS = {}
+    AFK_STATUS = {}
+    for row in get_db().execute("SELECT user_id, reason, since, mentions FROM afk WHERE guild_id = ?", (GLOBAL_SCOPE,)):
+        AFK_STATUS[row["user_id"]] = {
+            "reason": row["reason"],
+            "since": datetime.fromisoformat(row["since"]),
+            "mentions": set(json.loads(row["mentions"]))
+        }
+
+def write_afk_rows(conn, keys):
+    """Upsert or delete the AFK row for each dirty user ID."""
+    for user_id in _keys_to_write(conn, "afk", keys, lambda: list(AFK_STATUS)):
+        afk_data = AFK_STATUS.get(user_id)
+        if afk_data is None:
+            conn.execute("DELETE FROM afk WHERE guild_id = ? AND user_id = ?", (GLOBAL_SCOPE, user_id))
+        else:
+            # Datetimes become ISO strings and the mention set a JSON list
+            conn.execute(
+                "INSERT OR REPLACE INTO afk (guild_id, user_id, reason, since, mentions) VALUES (?, ?, ?, ?, ?)",
+                (GLOBAL_SCOPE, user_id, afk_data["reason"], afk_data["since"].isoformat(), json.dumps(list(afk_data["mentions"])))
+            )
 
 def save_afk():
-    """Save the current AFK_STATUS dict to AFK_FILE."""
-    # Convert datetime objects to ISO format strings and sets to lists for JSON serialization
-    data = {}
-    for user_id, afk_data in AFK_STATUS.items():
-        data[str(user_id)] = {
-            "reason": afk_data["reason"],
-            "since": afk_data["since"].isoformat(),
-            "mentions": list(afk_data["mentions"])
-        }
-    with open(AFK_FILE, "w") as f:
-        json.dump(data, f)
+    """Schedule AFK data for the next background flush."""
+    mark_dirty("afk")
 
-def load_profiles():
-    try:
-        with open(PROFILES_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+register_table_store("afk", write_afk_rows)
 
-def save_profiles(profiles):
-    with open(PROFILES_FILE, "w") as f:
-        json.dump(profiles, f, indent=2)
+async def get_profile(user_id):
+    """Return a user's profile dict (about_me, set_date), or None."""
+    row = await db_fetchone("SELECT about_me, set_date FROM profiles WHERE guild_id = ? AND user_id = ?", (GLOBAL_SCOPE, user_id))
+    return dict(row) if row else None
+
+async def set_profile(user_id, about_me):
+    await db_execute(
+        "INSERT OR REPLACE INTO profiles (guild_id, user_id, about_me, set_date) VALUES (?, ?, ?, ?)",
+        (GLOBAL_SCOPE, user_id, about_me, datetime.now().isoformat())
+    )
 
 # Message Activity Functions
+# Each (guild, user) keeps fixed rings of daily and hourly counters plus running totals for the
+# 30/90/365 day windows. Totals are adjusted as days roll out of each window, so period queries
+# never rescan history.
+ACTIVITY_DAYS = 366  # Daily ring size, must be longer than the longest window
+ACTIVITY_HOURS = 168  # Hourly ring covers the last 7 days
+ACTIVITY_WINDOWS = (30, 90, 365)
+ACTIVITY_PERIODS = [("lAST mONTH", 30), ("lAST 3 mONTHS", 90), ("lAST yEAR", 365), ("lIFETIME", None)]
+
+def activity_day(when):
+    """UTC day number for a datetime (or now)."""
+    return int((when or datetime.now(dt_timezone.utc)).timestamp() // 86400)
+
+class ActivityCounter:
+    """Message counts for one user in one guild, bucketed by day and hour in ring buffers."""
+    __slots__ = ("daily", "hourly", "last_day", "last_hour", "window_totals", "lifetime")
+
+    def __init__(self, lifetime=0, last_day=None, last_hour=None, daily=None, hourly=None):
+        self.daily = daily or array("I", bytes(4 * ACTIVITY_DAYS))
+        self.hourly = hourly or array("I", bytes(4 * ACTIVITY_HOURS))
+        self.last_day = last_day
+        self.last_hour = last_hour
+        self.lifetime = lifetime
+        self.window_totals = {window: 0 for window in ACTIVITY_WINDOWS}
+        if last_day is not None:
+            for window in ACTIVITY_WINDOWS:
+                self.window_totals[window] = sum(self.daily[day % ACTIVITY_DAYS] for day in range(last_day - window + 1, last_day + 1))
+
+    def advance(self, day, hour=None):
+        """Roll the rings forward to day (and hour), expiring whatever falls out of each window."""
+        if self.last_day is None:
+            self.last_day = day
+        elif day > self.last_day:
+            gap = day - self.last_day
+            for window in ACTIVITY_WINDOWS:
+                if gap >= window:
+                    self.window_totals[window] = 0
+                else:
+                    # Days last_day-window+1 .. day-window were inside the window and now are not
+                    for old_day in range(self.last_day - window + 1, day - window + 1):
+                        self.window_totals[window] -= self.daily[old_day % ACTIVITY_DAYS]
+            for new_day in range(self.last_day + 1, self.last_day + 1 + min(gap, ACTIVITY_DAYS)):
+                self.daily[new_day % ACTIVITY_DAYS] = 0
+            self.last_day = day
+        if hour is None:
+            return
+        if self.last_hour is None:
+            self.last_hour = hour
+        elif hour > self.last_hour:
+            for new_hour in range(self.last_hour + 1, self.last_hour + 1 + min(hour - self.last_hour, ACTIVITY_HOURS)):
+                self.hourly[new_hour % ACTIVITY_HOURS] = 0
+            self.last_hour = hour
+
+    def add(self, when, count=1):
+        """Count messages sent at when. Older timestamps (history scans) land in their own buckets."""
+        timestamp = when.timestamp()
+        day = int(timestamp // 86400)
+        hour = int(timestamp // 3600)
+        self.advance(day, hour)
+        self.lifetime += count
+        if day > self.last_day - ACTIVITY_DAYS:
+            self.daily[day % ACTIVITY_DAYS] += count
+            for window in ACTIVITY_WINDOWS:
+                if day > self.last_day - window:
+                    self.window_totals[window] += count
+        if hour > self.last_hour - ACTIVITY_HOURS:
+            self.hourly[hour % ACTIVITY_HOURS] += count
+
+    def total(self, window, today):
+        """Messages in the last window days (None for lifetime) as of today."""
+        if window is None:
+            return self.lifetime
+        self.advance(today)
+        return self.window_totals[window]
+
+class _RankNode:
+    __slots__ = ("key", "user_id", "score", "next", "width")
+
+    def __init__(self, key, user_id, score, height):
+        self.key = key
+        self.user_id = user_id
+        self.score = score
+        self.next = [None] * height
+        self.width = [1] * height  # entries each link jumps over, counting the one it lands on
+
+class RankBoard:
+    """Users ordered by score, for leaderboards that change one user at a time.
+
+    An indexable skip list ordered by (-score, tie-break): every link records how many users it
+    jumps, so a score change, a user's rank and the user at a rank are all O(log n), and a page
+    of K users costs O(log n + K). Ties keep the order users reached the score in.
+    """
+    __slots__ = ("scores", "head", "tail", "top", "sequence")
+    HEIGHT = 24  # enough levels for ~16M users per board
+
+    def __init__(self):
+        self.scores = {}  # user_id: (score, key)
+        self.tail = _RankNode((float("inf"),), None, None, 0)
+        self.head = _RankNode(None, None, None, self.HEIGHT)
+        self.head.next = [self.tail] * self.HEIGHT
+        self.top = 1  # levels in use; above it the head links straight to the tail
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.scores)
+
+    def _path(self, key):
+        """The last node before key on each level in use, and how far along the board each one is."""
+        chain = [self.head] * self.HEIGHT
+        positions = [0] * self.HEIGHT
+        node = self.head
+        position = 0
+        for level in reversed(range(self.top)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def _insert(self, key, user_id, score):
+        chain, positions = self._path(key)
+        height = 1
+        while height < self.HEIGHT and random.random() < 0.5:
+            height += 1
+        node = _RankNode(key, user_id, score, height)
+        for level in range(height):
+            previous = chain[level]
+            skipped = positions[0] - positions[level]  # users between previous and the new node
+            distance = previous.width[level] if level < self.top else len(self.scores) + 1
+            node.next[level] = previous.next[level]
+            node.width[level] = distance - skipped
+            previous.next[level] = node
+            previous.width[level] = skipped + 1
+        for level in range(height, self.top):
+            chain[level].width[level] += 1
+        self.top = max(self.top, height)
+
+    def _remove(self, key):
+        chain, _ = self._path(key)
+        node = chain[0].next[0]
+        for level in range(len(node.next)):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+        for level in range(len(node.next), self.top):
+            chain[level].width[level] -= 1
+
+    def _node_at(self, index):
+        """The node at 0-based position index."""
+        node = self.head
+        remaining = index + 1
+        for level in reversed(range(self.top)):
+            while node.width[level] <= remaining and node.next[level] is not self.tail:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def set(self, user_id, score):
+        """Set a user's score; a score of 0 or less removes them from the board."""
+        old = self.scores.get(user_id)
+        if old is not None:
+            if old[0] == score:
+                return
+            self._remove(old[1])
+            del self.scores[user_id]
+        if score > 0:
+            self.sequence += 1
+            key = (-score, self.sequence)
+            self._insert(key, user_id, score)
+            self.scores[user_id] = (score, key)
+
+    def page(self, offset=0, limit=10):
+        """Return [(user_id, score)] for ranks offset+1 .. offset+limit."""
+        if offset >= len(self.scores) or limit <= 0:
+            return []
+        node = self._node_at(offset)
+        results = []
+        while node is not self.tail and len(results) < limit:
+            results.append((node.user_id, node.score))
+            node = node.next[0]
+        return results
+
+    def rank(self, user_id):
+        """1-based rank of a user, or None if they aren't on the board."""
+        entry = self.scores.get(user_id)
+        if entry is None:
+            return None
+        _, positions = self._path(entry[1])
+        return positions[0] + 1
+
+ACTIVITY_BOARDS = {}  # guild_id: {window: RankBoard}, window None is lifetime
+activity_board_day = None  # UTC day the boards were last fully expired on
+
+def update_activity_boards(guild_id, user_id, counter):
+    boards = ACTIVITY_BOARDS.setdefault(guild_id, {window: RankBoard() for _, window in ACTIVITY_PERIODS})
+    for window, board in boards.items():
+        board.set(user_id, counter.lifetime if window is None else counter.window_totals[window])
+
+def rebuild_activity_boards():
+    """Advance every counter to today and rebuild the leaderboards from scratch."""
+    global ACTIVITY_BOARDS, activity_board_day
+    today = activity_day(None)
+    ACTIVITY_BOARDS = {}
+    for guild_id, guild_data in MESSAGE_ACTIVITY.items():
+        for user_id, counter in guild_data.items():
+            counter.advance(today)
+            update_activity_boards(guild_id, user_id, counter)
+    activity_board_day = today
+
 def load_message_activity():
-    """Load message activity data from MESSAGE_ACTIVITY_FILE."""
+    """Load message activity counters from the database into MESSAGE_ACTIVITY."""
     global MESSAGE_ACTIVITY
-    try:
-        with open(MESSAGE_ACTIVITY_FILE, "r") as f:
-            data = json.load(f)
-            MESSAGE_ACTIVITY = {}
-            for guild_id_str, guild_data in data.items():
-                guild_id = int(guild_id_str)
-                MESSAGE_ACTIVITY[guild_id] = {}
-                for user_id_str, user_messages in guild_data.items():
-                    user_id = int(user_id_str)
-                    MESSAGE_ACTIVITY[guild_id][user_id] = []
-                    for msg_data in user_messages:
-                        MESSAGE_ACTIVITY[guild_id][user_id].append({
-                            "timestamp": datetime.fromisoformat(msg_data["timestamp"]),
-                            "count": msg_data["count"]
-                        })
-    except FileNotFoundError:
-        MESSAGE_ACTIVITY = {}
-    except Exception as e:
-        print(f"Error loading message activity: {e}")
-        MESSAGE_ACTIVITY = {}
+    MESSAGE_ACTIVITY = {}
+    rows = get_db().execute("SELECT guild_id, user_id, lifetime, last_day, last_hour, daily, hourly FROM message_activity")
+    for row in rows:
+        daily = array("I")
+        daily.frombytes(row["daily"])
+        hourly = array("I")
+        hourly.frombytes(row["hourly"])
+        MESSAGE_ACTIVITY.setdefault(row["guild_id"], {})[row["user_id"]] = ActivityCounter(
+            row["lifetime"], row["last_day"], row["last_hour"], daily, hourly
+        )
+    rebuild_activity_boards()
+
+def write_message_activity_rows(conn, keys):
+    """Upsert the counter row for each dirty (guild_id, user_id) key."""
+    keys = _keys_to_write(conn, "message_activity", keys, lambda: [
+        (guild_id, user_id) for guild_id, guild_data in MESSAGE_ACTIVITY.items() for user_id in guild_data
+    ])
+    for guild_id, user_id in keys:
+        counter = MESSAGE_ACTIVITY.get(guild_id, {}).get(user_id)
+        if counter is None:
+            conn.execute("DELETE FROM message_activity WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO message_activity (guild_id, user_id, lifetime, last_day, last_hour, daily, hourly) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (guild_id, user_id, counter.lifetime, counter.last_day, counter.last_hour, counter.daily.tobytes(), counter.hourly.tobytes())
+            )
 
 def save_message_activity():
-    """Save message activity data to MESSAGE_ACTIVITY_FILE."""
-    try:
-        data = {}
-        for guild_id, guild_data in MESSAGE_ACTIVITY.items():
-            data[str(guild_id)] = {}
-            for user_id, user_messages in guild_data.items():
-                data[str(guild_id)][str(user_id)] = []
-                for msg_data in user_messages:
-                    data[str(guild_id)][str(user_id)].append({
-                        "timestamp": msg_data["timestamp"].isoformat(),
-                        "count": msg_data["count"]
-                    })
-        
-        with open(MESSAGE_ACTIVITY_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        print(f"Error saving message activity: {e}")
+    """Schedule message activity for the next background flush."""
+    mark_dirty("message_activity")
 
-def track_message(guild_id, user_id):
-    """Track a message for activity statistics."""
-    if guild_id not in MESSAGE_ACTIVITY:
-        MESSAGE_ACTIVITY[guild_id] = {}
-    
-    if user_id not in MESSAGE_ACTIVITY[guild_id]:
-        MESSAGE_ACTIVITY[guild_id][user_id] = []
-    
-    now = datetime.now(dt_timezone.utc)
-    user_messages = MESSAGE_ACTIVITY[guild_id][user_id]
-    
-    # Check if we have a recent entry (within the last hour) to batch messages
-    if user_messages and (now - user_messages[-1]["timestamp"]).total_seconds() < 3600:
-        # Update the most recent entry
-        user_messages[-1]["count"] += 1
-        user_messages[-1]["timestamp"] = now
+register_table_store("message_activity", write_message_activity_rows)
+
+ACTIVITY_CHECKPOINTS = {}  # (guild_id, channel_id): newest message ID counted in that channel
+
+def load_activity_checkpoints():
+    global ACTIVITY_CHECKPOINTS
+    rows = get_db().execute("SELECT guild_id, channel_id, last_message_id FROM activity_checkpoints")
+    ACTIVITY_CHECKPOINTS = {(row["guild_id"], row["channel_id"]): row["last_message_id"] for row in rows}
+
+def write_activity_checkpoint_rows(conn, keys):
+    keys = _keys_to_write(conn, "activity_checkpoints", keys, lambda: list(ACTIVITY_CHECKPOINTS))
+    for guild_id, channel_id in keys:
+        last_message_id = ACTIVITY_CHECKPOINTS.get((guild_id, channel_id))
+        if last_message_id is None:
+            conn.execute("DELETE FROM activity_checkpoints WHERE guild_id = ? AND channel_id = ?", (guild_id, channel_id))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO activity_checkpoints (guild_id, channel_id, last_message_id) VALUES (?, ?, ?)",
+                (guild_id, channel_id, last_message_id)
+            )
+
+register_table_store("activity_checkpoints", write_activity_checkpoint_rows)
+
+def advance_checkpoint(guild_id, channel_id, message_id):
+    key = (guild_id, channel_id)
+    if message_id > ACTIVITY_CHECKPOINTS.get(key, 0):
+        ACTIVITY_CHECKPOINTS[key] = message_id
+        mark_dirty("activity_checkpoints", key)
+
+def clear_guild_checkpoints(guild_id):
+    for key in [key for key in ACTIVITY_CHECKPOINTS if key[0] == guild_id]:
+        del ACTIVITY_CHECKPOINTS[key]
+        mark_dirty("activity_checkpoints", key)
+
+def track_message(guild_id, user_id, when=None, count=1, channel_id=None, message_id=None):
+    """Track a message for activity statistics.
+
+    Passing channel_id and message_id also moves that channel's checkpoint, which is where
+    reconciliation picks up after downtime.
+    """
+    guild_data = MESSAGE_ACTIVITY.setdefault(guild_id, {})
+    counter = guild_data.get(user_id)
+    if counter is None:
+        counter = guild_data[user_id] = ActivityCounter()
+    counter.add(when or datetime.now(dt_timezone.utc), count)
+    update_activity_boards(guild_id, user_id, counter)
+    mark_dirty("message_activity", (guild_id, user_id))
+    if channel_id is not None and message_id is not None:
+        advance_checkpoint(guild_id, channel_id, message_id)
+
+HISTORY_SCANS = {}  # (guild_id, channel_id): {"after": last scanned message ID, "stop": scan end snowflake, "done": bool}
+
+def load_history_scans():
+    global HISTORY_SCANS
+    rows = get_db().execute("SELECT guild_id, channel_id, after_id, stop_id, done FROM history_scans")
+    HISTORY_SCANS = {
+        (row["guild_id"], row["channel_id"]): {"after": row["after_id"], "stop": row["stop_id"], "done": bool(row["done"])}
+        for row in rows
+    }
+
+def write_history_scan_rows(conn, keys):
+    keys = _keys_to_write(conn, "history_scans", keys, lambda: list(HISTORY_SCANS))
+    for guild_id, channel_id in keys:
+        state = HISTORY_SCANS.get((guild_id, channel_id))
+        if state is None:
+            conn.execute("DELETE FROM history_scans WHERE guild_id = ? AND channel_id = ?", (guild_id, channel_id))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO history_scans (guild_id, channel_id, after_id, stop_id, done) VALUES (?, ?, ?, ?, ?)",
+                (guild_id, channel_id, state["after"], state["stop"], int(state["done"]))
+            )
+
+# A background flush commits scan cursors in the same transaction as the counts they cover, so a
+# crash can't leave a cursor past pages whose counts were never written.
+register_table_store("history_scans", write_history_scan_rows)
+
+def track_live_message(message):
+    """Count a message from on_message, noting the first live message per channel for reconciliation."""
+    key = (message.guild.id, message.channel.id)
+    if key not in LIVE_FLOORS:
+        LIVE_FLOORS[key] = message.id
+    track_message(message.guild.id, message.author.id, channel_id=message.channel.id, message_id=message.id)
+
+def get_activity_totals(guild_id, user_id):
+    """Return {window: count} for each ACTIVITY_PERIODS window (None is lifetime) for one user."""
+    counter = MESSAGE_ACTIVITY.get(guild_id, {}).get(user_id)
+    today = activity_day(None)
+    return {window: counter.total(window, today) if counter else 0 for _, window in ACTIVITY_PERIODS}
+
+def get_top_active(guild_id, window, count=3, offset=0):
+    """Return [(user_id, messages)] for ranks offset+1 .. offset+count in a window, straight from the leaderboard."""
+    board = ACTIVITY_BOARDS.get(guild_id, {}).get(window)
+    return board.page(offset, count) if board else []
+
+def get_active_user_count(guild_id, window):
+    board = ACTIVITY_BOARDS.get(guild_id, {}).get(window)
+    return len(board) if board else 0
+
+ACTIVITY_RECONCILE = os.getenv("NOVA_ACTIVITY_RECONCILE", "1") == "1"
+LIVE_FLOORS = {}  # (guild_id, channel_id): first message ID counted live since reconciliation started
+activity_reconcile_task = None
+
+async def reconcile_guild_activity(guild):
+    """Count messages sent while the bot was offline, channel by channel, from each channel's checkpoint.
+
+    Channels without a checkpoint are left to ?scanhistory. Anything at or past the first message
+    on_message counted in a channel is skipped, so nothing is counted twice.
+    """
+    counted = 0
+    for channel in guild.text_channels:
+        key = (guild.id, channel.id)
+        checkpoint = ACTIVITY_CHECKPOINTS.get(key)
+        if checkpoint is None or not channel.permissions_for(guild.me).read_message_history:
+            continue
+        if channel.last_message_id is not None and channel.last_message_id <= checkpoint:
+            continue
+        try:
+            async for message in channel.history(limit=None, after=discord.Object(id=checkpoint), oldest_first=True):
+                live_floor = LIVE_FLOORS.get(key)
+                if live_floor is not None and message.id >= live_floor:
+                    break
+                if not message.author.bot:
+                    track_message(guild.id, message.author.id, message.created_at, channel_id=channel.id, message_id=message.id)
+                    counted += 1
+                else:
+                    advance_checkpoint(guild.id, channel.id, message.id)
+        except discord.Forbidden:
+            continue
+        except Exception as e:
+            print(f"❌ Error reconciling activity in #{channel.name}: {e}")
+    return counted
+
+async def reconcile_activity():
+    LIVE_FLOORS.clear()
+    for guild in list(bot.guilds):
+        if not is_server_allowed(guild.id):
+            continue
+        counted = await reconcile_guild_activity(guild)
+        if counted:
+            print(f"📊 Reconciled {counted:,} missed messages in {guild.name}")
+
+def start_activity_reconcile():
+    """Catch the activity index up on messages missed while offline, in the background."""
+    global activity_reconcile_task
+    if not ACTIVITY_RECONCILE:
+        return
+    if activity_reconcile_task is None or activity_reconcile_task.done():
+        activity_reconcile_task = bot.loop.create_task(reconcile_activity())
+
+def build_messagecount_embed(guild, target):
+    """Per-period message counts for one member, read from the activity index."""
+    totals = get_activity_totals(guild.id, target.id)
+    lines = [f"**uSER:** {target.display_name}\n"]
+    for period_name, window in ACTIVITY_PERIODS:
+        count = totals[window]
+        board = ACTIVITY_BOARDS.get(guild.id, {}).get(window)
+        rank = board.rank(target.id) if board else None
+        rank_text = f", #{rank}" if rank else ""
+        if window is None:
+            lines.append(f"📅 **{period_name}:** {count:,} messages{rank_text}")
+        else:
+            daily_average = round(count / window, 1) if count > 0 else 0
+            lines.append(f"📅 **{period_name}:** {count:,} messages ({daily_average}/day avg{rank_text})")
+    if any(key[0] == guild.id for key in ACTIVITY_CHECKPOINTS):
+        lines.append(f"\n*cOUNTED fROM tHE aCTIVITY iNDEX fOR {guild.name}*")
     else:
-        # Create a new entry
-        user_messages.append({
-            "timestamp": now,
-            "count": 1
-        })
-    
-    # Clean up old entries (older than 1 year) to keep file size manageable
-    one_year_ago = now - timedelta(days=365)
-    MESSAGE_ACTIVITY[guild_id][user_id] = [
-        msg for msg in user_messages if msg["timestamp"] > one_year_ago
-    ]
-    
-    # Save periodically (every 10th message to avoid constant file writes)
-    import random
-    if random.randint(1, 10) == 1:
-        save_message_activity()
+        lines.append(f"\n*oNLY cOUNTS mESSAGES sINCE nOVA jOINED - aN aDMIN cAN rUN ?scanhistory fOR oLDER oNES*")
+    embed = nova_embed("📊 mESSAGE cOUNT sTATISTICS", "\n".join(lines))
+    if target.avatar:
+        embed.set_thumbnail(url=target.avatar.url)
+    return embed
+
+ACTIVITY_PERIOD_NAMES = {
+    "month": 30, "30d": 30,
+    "3months": 90, "90d": 90,
+    "year": 365, "365d": 365,
+    "lifetime": None, "all": None,
+}
+ACTIVITY_PAGE_SIZE = 10
+
+async def expire_activity_windows():
+    """Re-bucket every user once per UTC day so window leaderboards drop days that rolled out.
+
+    Works in chunks and yields between them so big guilds don't stall the loop.
+    """
+    global activity_board_day
+    today = activity_day(None)
+    if activity_board_day == today:
+        return
+    for guild_id, guild_data in list(MESSAGE_ACTIVITY.items()):
+        for position, (user_id, counter) in enumerate(list(guild_data.items()), 1):
+            counter.advance(today)
+            update_activity_boards(guild_id, user_id, counter)
+            if position % 1000 == 0:
+                await asyncio.sleep(0)
+    activity_board_day = today
+
+@tasks.loop(minutes=10)
+async def activity_expiry_task():
+    try:
+        await expire_activity_windows()
+    except Exception as e:
+        print(f"❌ Error expiring activity windows: {e}")
+
+def build_activity_page(guild, window, page):
+    """Embed text for one page of a single period's leaderboard."""
+    total_users = get_active_user_count(guild.id, window)
+    total_pages = max(1, -(-total_users // ACTIVITY_PAGE_SIZE))
+    page = max(1, min(page, total_pages))
+    offset = (page - 1) * ACTIVITY_PAGE_SIZE
+    lines = []
+    for rank, (user_id, count) in enumerate(get_top_active(guild.id, window, ACTIVITY_PAGE_SIZE, offset), offset + 1):
+        member = guild.get_member(user_id)
+        name = f"**{member.display_name}**" if member else "*[User Left]*"
+        lines.append(f"{rank}. {name} - {count:,}")
+    return "\n".join(lines) if lines else "nO dATA", page, total_pages
 
 # BCA System Data Functions
 def load_bca_categories():
@@ -745,9 +2414,10 @@ def load_bca_categories():
     except FileNotFoundError:
         return {}
 
-def save_bca_categories(categories):
-    with open(BCA_CATEGORIES_FILE, "w") as f:
-        json.dump(categories, f, indent=2)
+def save_bca_categories(categories=None):
+    mark_dirty("bca_categories")
+
+register_store("bca_categories", BCA_CATEGORIES_FILE, lambda: BCA_CATEGORIES, indent=2)
 
 def load_bca_nominations():
     try:
@@ -756,9 +2426,10 @@ def load_bca_nominations():
     except FileNotFoundError:
         return {}
 
-def save_bca_nominations(nominations):
-    with open(BCA_NOMINATIONS_FILE, "w") as f:
-        json.dump(nominations, f, indent=2)
+def save_bca_nominations(nominations=None):
+    mark_dirty("bca_nominations")
+
+register_store("bca_nominations", BCA_NOMINATIONS_FILE, lambda: BCA_NOMINATIONS, indent=2)
 
 def load_bca_votes():
     try:
@@ -767,9 +2438,10 @@ def load_bca_votes():
     except FileNotFoundError:
         return {}
 
-def save_bca_votes(votes):
-    with open(BCA_VOTES_FILE, "w") as f:
-        json.dump(votes, f, indent=2)
+def save_bca_votes(votes=None):
+    mark_dirty("bca_votes")
+
+register_store("bca_votes", BCA_VOTES_FILE, lambda: BCA_VOTES, indent=2)
 
 def load_bca_changes():
     try:
@@ -778,9 +2450,23 @@ def load_bca_changes():
     except FileNotFoundError:
         return {}
 
-def save_bca_changes(changes):
-    with open(BCA_CHANGES_FILE, "w") as f:
-        json.dump(changes, f, indent=2)
+def save_bca_changes(changes=None):
+    mark_dirty("bca_changes")
+
+register_store("bca_changes", BCA_CHANGES_FILE, lambda: BCA_CHANGES, indent=2)
+
+def load_bca_announcements():
+    try:
+        with open(BCA_ANNOUNCEMENTS_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_bca_announcements():
+    mark_dirty("bca_announcements")
+
+BCA_ANNOUNCEMENTS = load_bca_announcements()  # guild_id: {announcement: ISO deadline it was sent for}
+register_store("bca_announcements", BCA_ANNOUNCEMENTS_FILE, lambda: BCA_ANNOUNCEMENTS, indent=2)
 
 def load_bca_countdowns():
     try:
@@ -792,15 +2478,15 @@ def load_bca_countdowns():
             
             # Handle both old format (global) and new format (per-server)
             if data and isinstance(list(data.values())[0], dict) and "end_time" in list(data.values())[0]:
-                # Old format - migrate to new format under a default guild
+                # Old format - migrate to new format under the shared scope
                 print("Migrating old countdown format to server-specific format")
-                result["global"] = {}
+                result[GLOBAL_SCOPE] = {}
                 for event_name, event_data in data.items():
                     try:
                         end_time = datetime.fromisoformat(event_data["end_time"])
                         if end_time.tzinfo is None:
                             end_time = est.localize(end_time)
-                        result["global"][event_name] = {
+                        result[GLOBAL_SCOPE][event_name] = {
                             "end_time": end_time,
                             "description": event_data["description"]
                         }
@@ -810,26 +2496,26 @@ def load_bca_countdowns():
             else:
                 # New format - per server
                 for guild_id, guild_countdowns in data.items():
-                    # Handle both string guild IDs and 'global' key
+                    # Handle both string guild IDs and the legacy 'global' key
                     if guild_id == "global":
-                        result["global"] = {}
-                        guild_key = "global"
+                        guild_key = GLOBAL_SCOPE
                     else:
                         try:
                             guild_key = int(guild_id)
-                            result[guild_key] = {}
                         except ValueError:
                             print(f"Warning: Invalid guild_id '{guild_id}', skipping")
                             continue
+                    result[guild_key] = {}
                     
                     for event_name, event_data in guild_countdowns.items():
                         try:
                             end_time = datetime.fromisoformat(event_data["end_time"])
                             if end_time.tzinfo is None:
                                 end_time = est.localize(end_time)
-                            result[int(guild_id)][event_name] = {
+                            result[guild_key][event_name] = {
                                 "end_time": end_time,
-                                "description": event_data["description"]
+                                "description": event_data["description"],
+                                "messages": event_data.get("messages", [])
                             }
                         except (ValueError, TypeError) as e:
                             print(f"Warning: Could not parse countdown time for '{event_name}' in guild {guild_id}: {e}")
@@ -841,25 +2527,30 @@ def load_bca_countdowns():
         print(f"Error loading BCA countdowns: {e}")
         return {}
 
-def save_bca_countdowns(countdowns):
-    with open(BCA_COUNTDOWNS_FILE, "w") as f:
-        # Convert datetime objects to ISO strings for JSON serialization
-        data = {}
-        for guild_id, guild_countdowns in countdowns.items():
-            data[str(guild_id)] = {}
-            for event_name, event_data in guild_countdowns.items():
-                end_time = event_data["end_time"]
-                # Handle both timezone-aware and naive datetime objects
-                if hasattr(end_time, 'isoformat'):
-                    end_time_str = end_time.isoformat()
-                else:
-                    end_time_str = str(end_time)
-                
-                data[str(guild_id)][event_name] = {
-                    "end_time": end_time_str,
-                    "description": event_data["description"]
-                }
-        json.dump(data, f, indent=2)
+def serialize_bca_countdowns():
+    # Convert datetime objects to ISO strings for JSON serialization
+    data = {}
+    for guild_id, guild_countdowns in BCA_COUNTDOWNS.items():
+        data[str(guild_id)] = {}
+        for event_name, event_data in guild_countdowns.items():
+            end_time = event_data["end_time"]
+            # Handle both timezone-aware and naive datetime objects
+            if hasattr(end_time, 'isoformat'):
+                end_time_str = end_time.isoformat()
+            else:
+                end_time_str = str(end_time)
+            
+            data[str(guild_id)][event_name] = {
+                "end_time": end_time_str,
+                "description": event_data["description"],
+                "messages": event_data.get("messages", [])
+            }
+    return data
+
+def save_bca_countdowns(countdowns=None):
+    mark_dirty("bca_countdowns")
+
+register_store("bca_countdowns", BCA_COUNTDOWNS_FILE, serialize_bca_countdowns, indent=2)
 
 def load_server_configs():
     """Load server-specific configurations"""
@@ -877,17 +2568,18 @@ def load_server_configs():
         print(f"Error loading server configs: {e}")
         return {}
 
-def save_server_configs(configs):
-    """Save server-specific configurations"""
-    try:
-        with open(SERVER_CONFIGS_FILE, "w") as f:
-            # Convert integer keys to strings for JSON
-            data = {}
-            for guild_id, config in configs.items():
-                data[str(guild_id)] = config
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        print(f"Error saving server configs: {e}")
+def serialize_server_configs():
+    """Convert SERVER_CONFIGS to JSON-ready data (integer keys become strings)."""
+    data = {}
+    for guild_id, config in SERVER_CONFIGS.items():
+        data[str(guild_id)] = config
+    return data
+
+def save_server_configs(configs=None):
+    """Schedule server-specific configurations for the next background flush."""
+    mark_dirty("server_configs")
+
+register_store("server_configs", SERVER_CONFIGS_FILE, serialize_server_configs, indent=2)
 
 def get_server_config(guild_id, key, default=None):
     """Get a specific config value for a server"""
@@ -900,11 +2592,135 @@ def set_server_config(guild_id, key, value):
     if guild_id not in SERVER_CONFIGS:
         SERVER_CONFIGS[guild_id] = {}
     SERVER_CONFIGS[guild_id][key] = value
-    save_server_configs(SERVER_CONFIGS)
+    mark_dirty("server_configs", guild_id)
+
+# Example usage in commands:
+# await ctx.send(embed=nova_embed("TITLE", "description"))
+# await interaction.response.send_message(embed=nova_embed("TITLE", "description"))
+
+# =========================
+# Job Scheduler
+# =========================
+
+SCHEDULED_JOBS = {}  # job_id: {"kind": str, "due_at": unix time, "payload": dict}
+JOB_QUEUE = []  # heap of (due_at, job_id); cancelled jobs are skipped when they reach the top
+JOB_HANDLERS = {}  # kind: async fn(payload)
+JOB_BATCH_SIZE = 100  # most jobs started per wakeup
+JOB_MAX_SLEEP = 60  # re-check the clock at least this often so wall-clock jumps aren't missed
+JOB_RETRY_DELAY = 30  # seconds before the first retry of a failed job; doubles on each further failure
+JOB_MAX_ATTEMPTS = 8  # runs before a failing job is dropped
+next_job_id = 1
+job_wakeup = None
+job_dispatcher_task = None
+
+def load_scheduled_jobs():
+    """Load pending jobs from the database and rebuild the queue."""
+    global SCHEDULED_JOBS, JOB_QUEUE, next_job_id
+    rows = get_db().execute("SELECT id, kind, due_at, payload FROM scheduled_jobs")
+    SCHEDULED_JOBS = {row["id"]: {"kind": row["kind"], "due_at": row["due_at"], "payload": json.loads(row["payload"])} for row in rows}
+    JOB_QUEUE = [(job["due_at"], job_id) for job_id, job in SCHEDULED_JOBS.items()]
+    heapq.heapify(JOB_QUEUE)
+    next_job_id = max(SCHEDULED_JOBS, default=0) + 1
+
+def write_scheduled_job_rows(conn, keys):
+    for job_id in _keys_to_write(conn, "scheduled_jobs", keys, lambda: list(SCHEDULED_JOBS)):
+        job = SCHEDULED_JOBS.get(job_id)
+        if job is None:
+            conn.execute("DELETE FROM scheduled_jobs WHERE id = ?", (job_id,))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO scheduled_jobs (id, kind, due_at, payload) VALUES (?, ?, ?, ?)",
+                (job_id, job["kind"], job["due_at"], json.dumps(job["payload"]))
+            )
+
+register_table_store("scheduled_jobs", write_scheduled_job_rows)
+
+def schedule_job(kind, due_at, payload):
+    """Run JOB_HANDLERS[kind](payload) at due_at (unix time). Survives restarts; returns the job ID."""
+    global next_job_id
+    job_id = next_job_id
+    next_job_id += 1
+    SCHEDULED_JOBS[job_id] = {"kind": kind, "due_at": due_at, "payload": payload}
+    mark_dirty("scheduled_jobs", job_id)
+    heapq.heappush(JOB_QUEUE, (due_at, job_id))
+    if job_wakeup is not None and JOB_QUEUE[0][1] == job_id:
+        job_wakeup.set()
+    return job_id
+
+def cancel_job(job_id):
+    if SCHEDULED_JOBS.pop(job_id, None) is not None:
+        mark_dirty("scheduled_jobs", job_id)
+
+def get_jobs(kind):
+    return [(job_id, job) for job_id, job in SCHEDULED_JOBS.items() if job["kind"] == kind]
+
+async def run_job(job_id, job):
+    """Run one job, then drop it. A job is only removed once it has run, so a crash mid-run repeats it.
+
+    If the handler raises, the job is queued again with backoff until JOB_MAX_ATTEMPTS runs have failed.
+    """
+    handler = JOB_HANDLERS.get(job["kind"])
+    retry_at = None
+    try:
+        if handler is None:
+            print(f"❌ No handler for scheduled job kind '{job['kind']}'")
+        else:
+            await handler(job["payload"])
+    except Exception as e:
+        attempt = job["payload"].get("attempt", 0) + 1
+        if attempt < JOB_MAX_ATTEMPTS and job_id in SCHEDULED_JOBS:
+            delay = JOB_RETRY_DELAY * 2 ** (attempt - 1)
+            print(f"❌ Error running scheduled {job['kind']} job {job_id}, retrying in {delay}s: {e}")
+            retry_at = time.time() + delay
+        else:
+            print(f"❌ Giving up on scheduled {job['kind']} job {job_id} after {attempt} attempts: {e}")
+    finally:
+        cancel_job(job_id)
+    if retry_at is not None:
+        schedule_job(job["kind"], retry_at, dict(job["payload"], attempt=attempt))
+
+async def job_dispatcher():
+    """One task for every timed job: sleep until the earliest deadline, then start everything due."""
+    global job_wakeup
+    job_wakeup = asyncio.Event()
+    running = set()
+    while True:
+        try:
+            now = time.time()
+            batch = []
+            while JOB_QUEUE and JOB_QUEUE[0][0] <= now and len(batch) < JOB_BATCH_SIZE:
+                _, job_id = heapq.heappop(JOB_QUEUE)
+                job = SCHEDULED_JOBS.get(job_id)
+                if job is not None and job_id not in running:
+                    batch.append((job_id, job))
+            for job_id, job in batch:
+                running.add(job_id)
+                task = bot.loop.create_task(run_job(job_id, job))
+                task.add_done_callback(lambda _, job_id=job_id: running.discard(job_id))
+            if batch:
+                await asyncio.sleep(0)
+                continue
+            timeout = min(JOB_QUEUE[0][0] - now, JOB_MAX_SLEEP) if JOB_QUEUE else JOB_MAX_SLEEP
+            job_wakeup.clear()
+            try:
+                await asyncio.wait_for(job_wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+        except Exception as e:
+            print(f"❌ Error in job dispatcher: {e}")
+            await asyncio.sleep(1)
 
-# Example usage in commands:
-# await ctx.send(embed=nova_embed("TITLE", "description"))
-# await interaction.response.send_message(embed=nova_embed("TITLE", "description"))
+def start_scheduler():
+    """Start the dispatcher once, after queuing reminders saved before they had jobs."""
+    global job_dispatcher_task
+    if job_dispatcher_task is not None and not job_dispatcher_task.done():
+        return
+    scheduled = {job["payload"]["reminder_id"] for _, job in get_jobs("reminder")}
+    for reminder_id, reminder in REMINDERS.items():
+        if reminder_id not in scheduled:
+            schedule_job("reminder", reminder["due_at"], {"reminder_id": reminder_id})
+    restore_focus_sessions()
+    job_dispatcher_task = bot.loop.create_task(job_dispatcher())
 
 # =========================
 # Centralized Logging Functions
@@ -918,6 +2734,58 @@ def sanitize_server_name(server_name):
     sanitized = re.sub(r'\s+', '-', sanitized.strip())
     return sanitized.lower()[:50]  # Discord limit is 100, but keep it shorter
 
+CENTRAL_LOG_CHANNEL_TYPES = ('server-logs', 'join-leave', 'messages', 'mod-logs', 'tickets')
+CENTRAL_LOG_MISS_TTL = 600  # seconds to wait before rescanning for a server with no logging category
+
+def load_central_log_channels():
+    try:
+        with open(CENTRAL_LOG_CHANNELS_FILE, "r") as f:
+            return {int(guild_id): channels for guild_id, channels in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+CENTRAL_LOG_CHANNELS = load_central_log_channels()  # guild_id: {"category": id, channel_type: channel_id}
+CENTRAL_LOG_MISSES = {}  # guild_id: time.monotonic() of the last scan that found nothing
+register_store("central_log_channels", CENTRAL_LOG_CHANNELS_FILE, lambda: {str(guild_id): channels for guild_id, channels in CENTRAL_LOG_CHANNELS.items()}, indent=2)
+
+def remember_central_channels(guild_id, category, channels):
+    """Record a server's logging category and channels by ID so lookups survive renames."""
+    CENTRAL_LOG_CHANNELS[guild_id] = {"category": category.id}
+    CENTRAL_LOG_CHANNELS[guild_id].update({channel_type: channel.id for channel_type, channel in channels.items()})
+    CENTRAL_LOG_MISSES.pop(guild_id, None)
+    mark_dirty("central_log_channels")
+
+def forget_central_channels(guild_id):
+    if CENTRAL_LOG_CHANNELS.pop(guild_id, None) is not None:
+        mark_dirty("central_log_channels")
+
+def find_central_category(central_guild, guild_id):
+    """Find a server's logging category: by stored ID, else by name for categories made before the ID map."""
+    category_id = CENTRAL_LOG_CHANNELS.get(guild_id, {}).get("category")
+    category = central_guild.get_channel(category_id) if category_id else None
+    if category is None:
+        guild = bot.get_guild(guild_id)
+        if guild is not None:
+            category = discord.utils.get(central_guild.categories, name=f"{sanitize_server_name(guild.name)}-logs")
+    return category
+
+def heal_central_channels(central_guild, guild_id):
+    """Slow path for a map miss: rebuild the server's entry from its category, at most once per CENTRAL_LOG_MISS_TTL."""
+    missed_at = CENTRAL_LOG_MISSES.get(guild_id)
+    if missed_at is not None and time.monotonic() - missed_at < CENTRAL_LOG_MISS_TTL:
+        return False
+    category = find_central_category(central_guild, guild_id)
+    if category is None:
+        CENTRAL_LOG_MISSES[guild_id] = time.monotonic()
+        return False
+    channels = {}
+    for channel in category.channels:
+        for channel_type in CENTRAL_LOG_CHANNEL_TYPES:
+            if channel.name.endswith(f"-{channel_type}"):
+                channels[channel_type] = channel
+    remember_central_channels(guild_id, category, channels)
+    return True
+
 async def create_server_logging_category(guild_info):
     """Create a logging category and channels for a new server."""
     if not CENTRAL_LOG_GUILD_ID:
@@ -965,6 +2833,7 @@ async def create_server_logging_category(guild_info):
                 topic=f"Ticket system logs for {guild_info['name']}"
             )
         }
+        remember_central_channels(guild_info['id'], category, channels)
         
         return {
             'category': category,
@@ -987,8 +2856,7 @@ async def archive_server_logging_category(guild_info):
     
     try:
         # Find the server's category
-        category_name = f"{sanitize_server_name(guild_info['name'])}-logs"
-        server_category = discord.utils.get(central_guild.categories, name=category_name)
+        server_category = find_central_category(central_guild, guild_info['id'])
         
         if server_category:
             # Move all channels to archive category and rename them
@@ -1001,6 +2869,7 @@ async def archive_server_logging_category(guild_info):
             
             # Delete the empty category
             await server_category.delete(reason=f"Archived - Nova left {guild_info['name']}")
+            forget_central_channels(guild_info['id'])
             
     except Exception as e:
         print(f"Error archiving logging category for {guild_info['name']}: {e}")
@@ -1022,7 +2891,10 @@ async def log_to_central_overview(embed, guild_info=None):
             print(f"Error logging to central overview: {e}")
 
 async def get_central_logging_channel(guild_id, channel_type):
-    """Get the central logging channel for a specific server and channel type."""
+    """Get the central logging channel for a specific server and channel type.
+
+    A dict lookup by ID; a miss (new server, deleted channel, pre-map category) heals the entry once.
+    """
     if not CENTRAL_LOG_GUILD_ID:
         return None
     
@@ -1030,98 +2902,166 @@ async def get_central_logging_channel(guild_id, channel_type):
     if not central_guild:
         return None
     
-    # Find the server's logging category
-    guild = bot.get_guild(guild_id)
-    if not guild:
-        return None
-    
-    category_name = f"{sanitize_server_name(guild.name)}-logs"
-    server_category = discord.utils.get(central_guild.categories, name=category_name)
-    
-    if not server_category:
-        return None
-    
-    # Find the specific channel type within the category
-    channel_name = f"{sanitize_server_name(guild.name)}-{channel_type}"
-    for channel in server_category.channels:
-        if channel.name == channel_name:
-            return channel
-    
-    return None
+    channel_type = channel_type.replace("_", "-")
+    channel_id = CENTRAL_LOG_CHANNELS.get(guild_id, {}).get(channel_type)
+    channel = central_guild.get_channel(channel_id) if channel_id else None
+    if channel is None and heal_central_channels(central_guild, guild_id):
+        channel_id = CENTRAL_LOG_CHANNELS[guild_id].get(channel_type)
+        channel = central_guild.get_channel(channel_id) if channel_id else None
+        if channel is None:
+            CENTRAL_LOG_MISSES[guild_id] = time.monotonic()
+    return channel
 
 async def log_to_central_channel(guild_id, channel_type, embed):
-    """Log an embed to a specific central logging channel."""
+    """Queue an embed for a specific central logging channel. Returns False if the server has none."""
     channel = await get_central_logging_channel(guild_id, channel_type)
     if channel:
-        try:
-            await channel.send(embed=embed)
-            return True
-        except Exception as e:
-            print(f"Error logging to central {channel_type} channel: {e}")
+        ship_log(channel, embed, CENTRAL_LOG_PRIORITIES.get(channel_type.replace("_", "-"), LOG_PRIORITY_SERVER))
+        return True
     return False
 
 # =========================
-# Event Handlers
+# Log Shipper
 # =========================
 
-@bot.event
-async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
-    load_config()
-    load_balances()
-    load_xp()
-    load_birthdays()
-    load_afk()
-    
-    # Start the live countdown update loop using bot.loop
+LOG_PRIORITY_MOD = 0  # mod actions go out first
+LOG_PRIORITY_SERVER = 1  # joins, leaves, member/server updates
+LOG_PRIORITY_CHAT = 2  # deletes, edits, reactions
+LOG_BATCH_EMBEDS = 10  # Discord's limit of embeds per message
+LOG_BATCH_CHARS = 6000  # Discord's limit of embed text per message
+LOG_FLUSH_DELAY = 2.0  # seconds a partial batch waits for company
+LOG_QUEUE_LIMIT = 500  # embeds held per destination before the oldest are dropped
+LOG_SEND_RATE = 4.0  # log messages per second across all destinations, leaving room for replies
+LOG_DELAY_WARN = 15  # seconds queued before an embed counts as delayed
+LOG_RETRY_DELAY = 2  # seconds before a failed batch is retried, doubling per failure
+LOG_RETRY_MAX_DELAY = 60
+LOG_MAX_ATTEMPTS = 8  # sends of one batch before it is dropped
+CENTRAL_LOG_PRIORITIES = {"mod-logs": LOG_PRIORITY_MOD, "messages": LOG_PRIORITY_CHAT}
+LOG_QUEUES = {}  # channel_id: {"channel": channel, "priority": int, "items": deque of (embed, queued_at), "busy": bool, "failures": int, "retry_at": monotonic time}
+LOG_STATS = {"queued": 0, "sent": 0, "messages": 0, "dropped": 0, "delayed": 0}
+log_wakeup = None
+log_shipper_task = None
+
+def ship_log(channel, embed, priority=LOG_PRIORITY_CHAT):
+    """Queue a log embed for channel; the shipper packs queued embeds into as few messages as it can."""
+    queue = LOG_QUEUES.get(channel.id)
+    if queue is None:
+        queue = LOG_QUEUES[channel.id] = {"channel": channel, "priority": priority, "items": collections.deque(), "busy": False, "failures": 0, "retry_at": 0}
+    queue["priority"] = min(queue["priority"], priority)
+    if len(queue["items"]) >= LOG_QUEUE_LIMIT:
+        queue["items"].popleft()
+        LOG_STATS["dropped"] += 1
+    queue["items"].append((embed, time.monotonic()))
+    LOG_STATS["queued"] += 1
+    if log_wakeup is not None and (len(queue["items"]) >= LOG_BATCH_EMBEDS or len(queue["items"]) == 1):
+        log_wakeup.set()
+
+def take_log_batch(queue):
+    """Pop up to LOG_BATCH_EMBEDS (embed, queued_at) items that fit in one message."""
+    batch = []
+    chars = 0
+    items = queue["items"]
+    while items and len(batch) < LOG_BATCH_EMBEDS:
+        size = len(items[0][0])
+        if batch and chars + size > LOG_BATCH_CHARS:
+            break
+        item = items.popleft()
+        if queue["failures"] == 0 and time.monotonic() - item[1] > LOG_DELAY_WARN:
+            LOG_STATS["delayed"] += 1
+        batch.append(item)
+        chars += size
+    return batch
+
+async def send_log_batch(queue, batch):
+    """Send one batch. A failed batch goes back to the front of its queue and the queue backs off;
+    it is only dropped when the channel is gone or closed to the bot, or after LOG_MAX_ATTEMPTS."""
+    name = getattr(queue["channel"], "name", queue["channel"].id)
     try:
-        bot.loop.create_task(countdown_update_loop())
-        print("🚀 LIVE COUNTDOWN UPDATE LOOP STARTED SUCCESSFULLY!")
-        print("🔴 Countdown messages will now auto-edit every second!")
+        await queue["channel"].send(embeds=[embed for embed, _ in batch])
+        LOG_STATS["sent"] += len(batch)
+        LOG_STATS["messages"] += 1
+        queue["failures"] = 0
+    except (discord.Forbidden, discord.NotFound) as e:
+        LOG_STATS["dropped"] += len(batch)
+        queue["failures"] = 0
+        print(f"Dropped {len(batch)} logs for #{name}: {e}")
     except Exception as e:
-        print(f"❌ Error starting countdown update loop: {e}")
-        # Fallback method
+        queue["failures"] += 1
+        if queue["failures"] >= LOG_MAX_ATTEMPTS:
+            LOG_STATS["dropped"] += len(batch)
+            queue["failures"] = 0
+            print(f"Dropped {len(batch)} logs for #{name} after {LOG_MAX_ATTEMPTS} attempts: {e}")
+        else:
+            queue["items"].extendleft(reversed(batch))
+            while len(queue["items"]) > LOG_QUEUE_LIMIT:
+                queue["items"].popleft()
+                LOG_STATS["dropped"] += 1
+            delay = min(LOG_RETRY_DELAY * 2 ** (queue["failures"] - 1), LOG_RETRY_MAX_DELAY)
+            queue["retry_at"] = time.monotonic() + delay
+            print(f"Failed to ship {len(batch)} logs to #{name}, retrying in {delay}s: {e}")
+    finally:
+        queue["busy"] = False
+        if queue["items"] and log_wakeup is not None:
+            log_wakeup.set()
+
+async def log_shipper():
+    """Send queued logs: full batches and mod logs at once, partial ones after LOG_FLUSH_DELAY.
+
+    One send per destination is in flight at a time so each channel's logs stay in order, and all
+    sends share one RateBudget so a raid or purge can't crowd out command replies.
+    """
+    global log_wakeup
+    log_wakeup = asyncio.Event()
+    budget = RateBudget(LOG_SEND_RATE)
+    while True:
         try:
-            asyncio.ensure_future(countdown_update_loop())
-            print("🚀 FALLBACK: Live countdown loop started with ensure_future")
-        except Exception as e2:
-            print(f"❌ Fallback failed: {e2}")
-    
-    # Debug: Show loaded config values
-    print(f"DEBUG: CHAT_LOGS_CHANNEL_ID = {CHAT_LOGS_CHANNEL_ID}")
-    print(f"DEBUG: TICKET_LOGS_CHANNEL_ID = {TICKET_LOGS_CHANNEL_ID}")
-    print(f"DEBUG: Config loaded: {config}")
-    
-    # Validate channels exist and bot has permissions
-    for guild in bot.guilds:
-        if CHAT_LOGS_CHANNEL_ID:
-            chat_channel = guild.get_channel(CHAT_LOGS_CHANNEL_ID)
-            if chat_channel:
-                print(f"✅ Chat logs channel found: {chat_channel.name}")
-                try:
-                    print("✅ Chat logs channel found and accessible")
-                except Exception as e:
-                    print(f"❌ Chat logs permission error: {e}")
-            else:
-                print(f"❌ Chat logs channel not found with ID: {CHAT_LOGS_CHANNEL_ID}")
-        
-        if TICKET_LOGS_CHANNEL_ID:
-            ticket_channel = guild.get_channel(TICKET_LOGS_CHANNEL_ID)
-            if ticket_channel:
-                print(f"✅ Ticket logs channel found: {ticket_channel.name}")
-                try:
-                    print("✅ Ticket logs channel found and accessible")
-                except Exception as e:
-                    print(f"❌ Ticket logs permission error: {e}")
-            else:
-                print(f"❌ Ticket logs channel not found with ID: {TICKET_LOGS_CHANNEL_ID}")
-    
-    # Sync slash commands
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        print(f"Failed to sync commands: {e}")
+            now = time.monotonic()
+            ready = []
+            next_due = None
+            for channel_id, queue in list(LOG_QUEUES.items()):
+                if not queue["items"]:
+                    if not queue["busy"]:
+                        del LOG_QUEUES[channel_id]
+                    continue
+                if queue["busy"]:
+                    continue
+                if queue["retry_at"] > now:
+                    next_due = queue["retry_at"] if next_due is None else min(next_due, queue["retry_at"])
+                    continue
+                oldest = queue["items"][0][1]
+                delay = 0 if queue["priority"] == LOG_PRIORITY_MOD else LOG_FLUSH_DELAY
+                if len(queue["items"]) >= LOG_BATCH_EMBEDS or now - oldest >= delay:
+                    ready.append((queue["priority"], oldest, channel_id))
+                else:
+                    due = oldest + delay
+                    next_due = due if next_due is None else min(next_due, due)
+            if ready:
+                ready.sort()
+                _, _, channel_id = ready[0]
+                queue = LOG_QUEUES[channel_id]
+                await budget.acquire()
+                batch = take_log_batch(queue)
+                if batch:
+                    queue["busy"] = True
+                    bot.loop.create_task(send_log_batch(queue, batch))
+                continue
+            log_wakeup.clear()
+            try:
+                await asyncio.wait_for(log_wakeup.wait(), timeout=None if next_due is None else max(next_due - now, 0))
+            except asyncio.TimeoutError:
+                pass
+        except Exception as e:
+            print(f"❌ Error in log shipper: {e}")
+            await asyncio.sleep(1)
+
+def start_log_shipper():
+    global log_shipper_task
+    if log_shipper_task is None or log_shipper_task.done():
+        log_shipper_task = bot.loop.create_task(log_shipper())
+
+# =========================
+# Event Handlers
+# =========================
 
 def is_server_allowed(guild_id):
     """Check if the server is allowed to use Nova."""
@@ -1239,112 +3179,177 @@ async def on_guild_remove(guild):
     # Log to central overview
     await log_to_central_overview(embed, guild_info)
 
+# =========================
+# Message Pipeline
+# =========================
+
+MESSAGE_STAGES = ("gate", "afk", "activity", "filters", "owner", "commands")
+MESSAGE_STAGE_BUCKETS_US = (10, 50, 100, 250, 500, 1000, 5000, 25000)  # Upper bounds; the last bucket is everything above
+MESSAGE_STAGE_STATS = {stage: {"histogram": [0] * (len(MESSAGE_STAGE_BUCKETS_US) + 1), "max_us": 0.0} for stage in MESSAGE_STAGES}
+MESSAGE_SIDE_EFFECT_WORKERS = 2
+MESSAGE_SIDE_EFFECT_LIMIT = 1000  # queued replies/reactions before new ones are dropped
+MESSAGE_SIDE_EFFECT_STATS = {"done": 0, "dropped": 0, "failed": 0}
+message_side_effects = None  # asyncio.Queue of (coroutine function, args)
+message_side_effect_tasks = []
+
+def record_message_stage(stage, started):
+    """Add the time since started to a stage's histogram and return now, the next stage's start."""
+    now = time.perf_counter()
+    elapsed_us = (now - started) * 1000000
+    stats = MESSAGE_STAGE_STATS[stage]
+    stats["histogram"][bisect.bisect_left(MESSAGE_STAGE_BUCKETS_US, elapsed_us)] += 1
+    stats["max_us"] = max(stats["max_us"], elapsed_us)
+    return now
+
+def message_stage_percentile(stage, fraction):
+    """Return the bucket upper bound (us) that the given fraction of a stage's samples fall under, or None without samples."""
+    histogram = MESSAGE_STAGE_STATS[stage]["histogram"]
+    total = sum(histogram)
+    if not total:
+        return None
+    running = 0
+    for i, count in enumerate(histogram):
+        running += count
+        if running >= total * fraction:
+            return MESSAGE_STAGE_BUCKETS_US[i] if i < len(MESSAGE_STAGE_BUCKETS_US) else float("inf")
+    return float("inf")
+
+def reset_message_stage_stats():
+    for stats in MESSAGE_STAGE_STATS.values():
+        stats["histogram"] = [0] * (len(MESSAGE_STAGE_BUCKETS_US) + 1)
+        stats["max_us"] = 0.0
+    MESSAGE_SIDE_EFFECT_STATS.update(done=0, dropped=0, failed=0)
+
+def defer_side_effect(func, *args):
+    """Run await func(*args) on a background worker so on_message never waits on Discord for it."""
+    if message_side_effects is None:
+        bot.loop.create_task(func(*args))
+        return
+    try:
+        message_side_effects.put_nowait((func, args))
+    except asyncio.QueueFull:
+        MESSAGE_SIDE_EFFECT_STATS["dropped"] += 1
+
+async def message_side_effect_worker():
+    while True:
+        func, args = await message_side_effects.get()
+        try:
+            await func(*args)
+            MESSAGE_SIDE_EFFECT_STATS["done"] += 1
+        except discord.HTTPException:
+            MESSAGE_SIDE_EFFECT_STATS["failed"] += 1  # Missing emoji, deleted message, no permission
+        except Exception as e:
+            MESSAGE_SIDE_EFFECT_STATS["failed"] += 1
+            print(f"❌ Error in message side effect {getattr(func, '__name__', func)}: {e}")
+
+def start_message_workers():
+    global message_side_effects
+    if message_side_effects is None:
+        message_side_effects = asyncio.Queue(maxsize=MESSAGE_SIDE_EFFECT_LIMIT)
+    message_side_effect_tasks[:] = [task for task in message_side_effect_tasks if not task.done()]
+    while len(message_side_effect_tasks) < MESSAGE_SIDE_EFFECT_WORKERS:
+        message_side_effect_tasks.append(bot.loop.create_task(message_side_effect_worker()))
+
+def format_afk_duration(since):
+    total_seconds = int((datetime.now(dt_timezone.utc) - since).total_seconds())
+    days = total_seconds // 86400
+    hours = (total_seconds % 86400) // 3600
+    mins = (total_seconds % 3600) // 60
+    secs = total_seconds % 60
+    if days > 0:
+        return f"{days}d {hours}h {mins}m {secs}s"
+    if hours > 0:
+        return f"{hours}h {mins}m {secs}s"
+    if mins > 0:
+        return f"{mins}m {secs}s"
+    return f"{secs}s"
+
+async def send_afk_return(message, time_str):
+    view = MentionsView(message.author.id)
+    await message.channel.send(embed=nova_embed("aFK", f"wELCOME bACK, {message.author.display_name}! yOU wERE gONE fOR {time_str}."), view=view)
+
+async def send_afk_notice(channel, display_name, reason, time_str):
+    await channel.send(embed=nova_embed("aFK", f"{display_name} iS aFK: {reason} ({time_str})"))
+
+async def send_blacklist_warning(channel, mention):
+    # Deletes itself after 5 seconds
+    await channel.send(
+        embed=nova_embed(
+            "⚠️ mESSAGE dELETED",
+            f"{mention}, yOUR mESSAGE cONTAINED a bLACKLISTED wORD!"
+        ),
+        delete_after=5
+    )
+
 @bot.event
 async def on_message(message):
-    """Event: Called on every message. Adds XP and processes commands."""
-    if message.author.bot:
+    """Event: Called on every message. Adds XP and processes commands.
+
+    Each stage starts with an O(1) check so a plain message in a quiet server only pays for
+    the dictionary lookups; replies and reactions go to background workers, and persistence is
+    already write-behind. Stage timings are shown in ?looplag.
+    """
+    started = time.perf_counter()
+    if message.author.bot or message.guild is None:
         return
     
     # Check if server is allowed
     if not is_server_allowed(message.guild.id):
         return  # Ignore messages from unauthorized servers
-    # AFK return logic
-    if message.author.id in AFK_STATUS:
-        afk = AFK_STATUS.pop(message.author.id)
-        save_afk()  # Save AFK data after removing user
-        since = afk["since"]
-        delta = datetime.now(dt_timezone.utc) - since
-        total_seconds = int(delta.total_seconds())
-        days = total_seconds // 86400
-        hours = (total_seconds % 86400) // 3600
-        mins = (total_seconds % 3600) // 60
-        secs = total_seconds % 60
-        
-        if days > 0:
-            time_str = f"{days}d {hours}h {mins}m {secs}s"
-        elif hours > 0:
-            time_str = f"{hours}h {mins}m {secs}s"
-        elif mins > 0:
-            time_str = f"{mins}m {secs}s"
-        else:
-            time_str = f"{secs}s"
-        view = MentionsView(message.author.id)
-        await message.channel.send(embed=nova_embed("aFK", f"wELCOME bACK, {message.author.display_name}! yOU wERE gONE fOR {time_str}."), view=view)
-    # Notify if mentioning AFK users
-    mentioned_ids = [user.id for user in message.mentions]
-    for uid in mentioned_ids:
-        if uid in AFK_STATUS:
-            AFK_STATUS[uid]["mentions"].add(message.author.id)
-            save_afk()  # Save AFK data after adding mention
-            afk = AFK_STATUS[uid]
-            member = message.guild.get_member(uid)
+    started = record_message_stage("gate", started)
+    
+    # AFK return logic and notices for mentioned AFK users, skipped while nobody is AFK
+    if AFK_STATUS:
+        if message.author.id in AFK_STATUS:
+            afk = AFK_STATUS.pop(message.author.id)
+            mark_dirty("afk", message.author.id)
+            defer_side_effect(send_afk_return, message, format_afk_duration(afk["since"]))
+        for user in message.mentions:
+            afk = AFK_STATUS.get(user.id)
+            if afk is None:
+                continue
+            afk["mentions"].add(message.author.id)
+            mark_dirty("afk", user.id)
+            member = message.guild.get_member(user.id)
             if member:
-                since = afk["since"]
-                delta = datetime.now(dt_timezone.utc) - since
-                total_seconds = int(delta.total_seconds())
-                days = total_seconds // 86400
-                hours = (total_seconds % 86400) // 3600
-                mins = (total_seconds % 3600) // 60
-                secs = total_seconds % 60
-                
-                if days > 0:
-                    time_str = f"{days}d {hours}h {mins}m {secs}s"
-                elif hours > 0:
-                    time_str = f"{hours}h {mins}m {secs}s"
-                elif mins > 0:
-                    time_str = f"{mins}m {secs}s"
-                else:
-                    time_str = f"{secs}s"
-                await message.channel.send(embed=nova_embed("aFK", f"{member.display_name} iS aFK: {afk['reason']} ({time_str})"))
-    add_xp(message.author.id, random.randint(5, 15))
+                defer_side_effect(send_afk_notice, message.channel, member.display_name, afk["reason"], format_afk_duration(afk["since"]))
+    started = record_message_stage("afk", started)
     
-    # Track message activity for statistics
-    if message.guild:
-        track_message(message.guild.id, message.author.id)
+    # XP and activity live in memory; the write-behind flush persists them later
+    add_xp(message.guild.id, message.author.id, random.randint(5, 15))
+    track_live_message(message)
+    started = record_message_stage("activity", started)
     
-    # Check for blacklisted words and auto-delete
+    # One pass over the message per list, only for servers that have any configured
+    guild_id = str(message.guild.id)
     message_lower = message.content.lower()
-    for word in BLACKLIST_WORDS:
-        if word in message_lower:
-            try:
-                await message.delete()
-                # Send a warning message that deletes after 5 seconds
-                warning = await message.channel.send(
-                    embed=nova_embed(
-                        "⚠️ mESSAGE dELETED",
-                        f"{message.author.mention}, yOUR mESSAGE cONTAINED a bLACKLISTED wORD!"
-                    ),
-                    delete_after=5
-                )
-                return  # Don't process commands if message was deleted
-            except discord.errors.NotFound:
-                pass  # Message was already deleted
-            except discord.errors.Forbidden:
-                pass  # Bot doesn't have permission to delete
+    guild_blacklist = get_guild_blacklist(guild_id)
+    guild_reactions = AUTO_REACTIONS.get(guild_id)
+    
+    # Check for blacklisted words and auto-delete
+    if guild_blacklist and get_guild_matcher(guild_id).find(normalize_text(message.content)):
+        try:
+            await message.delete()
+            defer_side_effect(send_blacklist_warning, message.channel, message.author.mention)
+            record_message_stage("filters", started)
+            return  # Don't process commands if message was deleted
+        except discord.errors.NotFound:
+            pass  # Message was already deleted
+        except discord.errors.Forbidden:
+            pass  # Bot doesn't have permission to delete
     
     # Auto-reactions (server-specific)
-    guild_id = str(message.guild.id) if message.guild else None
-    if guild_id and guild_id in AUTO_REACTIONS:
-        for trigger_word, emoji in AUTO_REACTIONS[guild_id].items():
-            if trigger_word in message.content.lower():
-                try:
-                    await message.add_reaction(emoji)
-                except discord.HTTPException:
-                    pass  # Ignore failed reactions
+    if guild_reactions:
+        for trigger_word in get_reaction_matcher(guild_id).find(message_lower):
+            defer_side_effect(message.add_reaction, guild_reactions[trigger_word])
     
     # React with cute Nova emoji when someone mentions "Nova" (fallback)
-    nova_reaction_exists = False
-    if guild_id and guild_id in AUTO_REACTIONS:
-        nova_reaction_exists = "nova" in AUTO_REACTIONS[guild_id]
-    
-    if "nova" in message_lower and not nova_reaction_exists:
-        try:
-            await message.add_reaction("<:cute_nova:1398830405691637800>")
-        except discord.errors.HTTPException:
-            pass  # Emoji not found or other error
+    if "nova" in message_lower and not (guild_reactions and "nova" in guild_reactions):
+        defer_side_effect(message.add_reaction, "<:cute_nova:1398830405691637800>")
+    started = record_message_stage("filters", started)
     
     # Check if message starts with "nova:" to make Nova say the text
-    if message.content.lower().startswith("nova:"):
+    if message_lower.startswith("nova:"):
         # Only allow the owner to use this feature
         if message.author.id == OWNER_ID:
             content = message.content[5:].strip()  # Remove "nova:" and get the rest
@@ -1357,9 +3362,12 @@ async def on_message(message):
             # If someone else tries to use it, delete their message and warn them
             await message.delete()
             await message.channel.send(f"{message.author.mention}, only the owner can make Nova speak!", delete_after=3)
+    started = record_message_stage("owner", started)
+    
     # Check if command is disabled before processing
-    if message.content.startswith('?'):
-        command_name = message.content[1:].split()[0].lower()
+    if DISABLED_COMMANDS and message.content.startswith('?'):
+        words = message.content[1:].split()
+        command_name = words[0].lower() if words else ""
         if command_name in DISABLED_COMMANDS:
             await message.channel.send(embed=nova_embed(
                 "🚫 cOMMAND dISABLED",
@@ -1368,10 +3376,230 @@ async def on_message(message):
             return
     
     await bot.process_commands(message)
+    record_message_stage("commands", started)
+
+# =========================
+# Message Cache
+# =========================
+
+MESSAGE_CACHE_SIZE = 2000  # fetched messages kept
+MESSAGE_CACHE_TTL = 300  # seconds a fetched message is trusted
+MESSAGE_CACHE = collections.OrderedDict()  # message_id: {"message": Message, "expires": monotonic, "reactions": {emoji: delta}}
+MESSAGE_FETCHES = {}  # message_id: task fetching it, shared by everyone waiting
+MESSAGE_CACHE_STATS = {"gateway": 0, "hits": 0, "coalesced": 0, "fetches": 0}
+
+async def fetch_and_cache(channel, message_id):
+    try:
+        message = await channel.fetch_message(message_id)
+    finally:
+        MESSAGE_FETCHES.pop(message_id, None)
+    MESSAGE_CACHE[message_id] = {"message": message, "expires": time.monotonic() + MESSAGE_CACHE_TTL, "reactions": {}}
+    MESSAGE_CACHE.move_to_end(message_id)
+    while len(MESSAGE_CACHE) > MESSAGE_CACHE_SIZE:
+        MESSAGE_CACHE.popitem(last=False)
+    return message
+
+async def get_message(channel, message_id):
+    """A message from the gateway cache, the fetch cache, or one fetch shared by concurrent callers."""
+    message = bot._connection._get_message(message_id)
+    if message is not None:
+        MESSAGE_CACHE_STATS["gateway"] += 1
+        return message
+    entry = MESSAGE_CACHE.get(message_id)
+    if entry is not None:
+        if entry["expires"] > time.monotonic():
+            MESSAGE_CACHE.move_to_end(message_id)
+            MESSAGE_CACHE_STATS["hits"] += 1
+            return entry["message"]
+        del MESSAGE_CACHE[message_id]
+    task = MESSAGE_FETCHES.get(message_id)
+    if task is None:
+        MESSAGE_CACHE_STATS["fetches"] += 1
+        task = MESSAGE_FETCHES[message_id] = asyncio.ensure_future(fetch_and_cache(channel, message_id))
+    else:
+        MESSAGE_CACHE_STATS["coalesced"] += 1
+    return await asyncio.shield(task)
+
+def note_reaction(message_id, emoji, delta):
+    """Keep reaction counts on a fetched message current; the gateway only updates the messages it caches."""
+    entry = MESSAGE_CACHE.get(message_id)
+    if entry is not None:
+        entry["reactions"][emoji] = entry["reactions"].get(emoji, 0) + delta
+
+def reaction_count(message, emoji):
+    count = next((reaction.count for reaction in message.reactions if str(reaction.emoji) == emoji), 0)
+    entry = MESSAGE_CACHE.get(message.id)
+    if entry is not None and entry["message"] is message:
+        count += entry["reactions"].get(emoji, 0)
+    return count
+
+def message_jump_url(guild_id, channel_id, message_id):
+    return f"https://discord.com/channels/{guild_id}/{channel_id}/{message_id}"
+
+@bot.event
+async def on_raw_message_edit(payload):
+    MESSAGE_CACHE.pop(payload.message_id, None)
+
+@bot.event
+async def on_raw_message_delete(payload):
+    MESSAGE_CACHE.pop(payload.message_id, None)
+
+# =========================
+# Runway
+# =========================
+
+RUNWAY_EMOJI = "😭"
+RUNWAY_THRESHOLD = 4  # reactions before a message walks the runway
+RUNWAY_EDIT_DELAY = 5  # seconds to gather count changes into one edit of a runway post
+RUNWAY_COUNTS_SIZE = 10000  # messages whose reaction count is tracked in memory
+RUNWAY_POSTS = {}  # source message_id: {"guild", "channel", "runway_channel", "runway_message", "count"}
+RUNWAY_COUNTS = collections.OrderedDict()  # source message_id: current RUNWAY_EMOJI count
+RUNWAY_POSTING = set()  # source message IDs with a runway post being created
+RUNWAY_EDITS = set()  # source message IDs with an edit scheduled
+
+def load_runway_posts():
+    global RUNWAY_POSTS
+    rows = get_db().execute("SELECT source_id, guild_id, channel_id, runway_channel_id, runway_message_id, count FROM runway_posts")
+    RUNWAY_POSTS = {
+        row["source_id"]: {
+            "guild": row["guild_id"],
+            "channel": row["channel_id"],
+            "runway_channel": row["runway_channel_id"],
+            "runway_message": row["runway_message_id"],
+            "count": row["count"]
+        }
+        for row in rows
+    }
+
+def write_runway_post_rows(conn, keys):
+    keys = _keys_to_write(conn, "runway_posts", keys, lambda: list(RUNWAY_POSTS))
+    for source_id in keys:
+        post = RUNWAY_POSTS.get(source_id)
+        if post is None:
+            conn.execute("DELETE FROM runway_posts WHERE source_id = ?", (source_id,))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO runway_posts (source_id, guild_id, channel_id, runway_channel_id, runway_message_id, count) VALUES (?, ?, ?, ?, ?, ?)",
+                (source_id, post["guild"], post["channel"], post["runway_channel"], post["runway_message"], post["count"])
+            )
+
+register_table_store("runway_posts", write_runway_post_rows)
+
+def build_runway_embed(message):
+    """Runway card for a message; attachments are linked by URL rather than re-uploaded."""
+    embed = nova_embed(title=f"{RUNWAY_EMOJI} #{message.id}", description=message.content)
+    embed.set_author(name=message.author.display_name, icon_url=message.author.avatar.url if message.author.avatar else None)
+    embed.add_field(name="oRIGINAL cHANNEL", value=message.channel.mention, inline=True)
+    embed.add_field(name="jUMP tO mESSAGE", value=f"[Click here]({message.jump_url})", inline=True)
+    image = next((att for att in message.attachments if (att.content_type or "").startswith("image/")), None)
+    if image:
+        embed.set_image(url=image.url)
+    others = [att for att in message.attachments if att is not image]
+    if others:
+        embed.add_field(name="aTTACHMENTS", value="\n".join(f"[{att.filename}]({att.url})" for att in others)[:1024], inline=False)
+    embed.set_footer(text=f"Message ID: {message.id}")
+    return embed
+
+def runway_header(count, channel_id):
+    return f"{RUNWAY_EMOJI} **{count}** | <#{channel_id}>"
+
+async def post_to_runway(message, runway_channel, count):
+    """Send a message to the runway and index it so it is never posted twice."""
+    post = await runway_channel.send(content=runway_header(count, message.channel.id), embed=build_runway_embed(message))
+    RUNWAY_POSTS[message.id] = {
+        "guild": message.guild.id,
+        "channel": message.channel.id,
+        "runway_channel": runway_channel.id,
+        "runway_message": post.id,
+        "count": count
+    }
+    mark_dirty("runway_posts", message.id)
+    return post
+
+async def edit_runway_post(source_id):
+    """Bring a runway post's count up to date, once per RUNWAY_EDIT_DELAY however many reactions arrive."""
+    await asyncio.sleep(RUNWAY_EDIT_DELAY)
+    RUNWAY_EDITS.discard(source_id)
+    post = RUNWAY_POSTS.get(source_id)
+    count = RUNWAY_COUNTS.get(source_id)
+    if post is None or count is None or count == post["count"]:
+        return
+    channel = bot.get_channel(post["runway_channel"])
+    if channel is None:
+        return
+    try:
+        await channel.get_partial_message(post["runway_message"]).edit(content=runway_header(count, post["channel"]))
+    except discord.NotFound:
+        # The runway post was deleted; forget it so the message can walk again
+        del RUNWAY_POSTS[source_id]
+        mark_dirty("runway_posts", source_id)
+        return
+    except Exception as e:
+        print(f"Failed to update runway post for {source_id}: {e}")
+        return
+    post["count"] = count
+    mark_dirty("runway_posts", source_id)
+
+def set_runway_count(source_id, count):
+    RUNWAY_COUNTS[source_id] = max(count, 0)
+    RUNWAY_COUNTS.move_to_end(source_id)
+    while len(RUNWAY_COUNTS) > RUNWAY_COUNTS_SIZE:
+        RUNWAY_COUNTS.popitem(last=False)
+    if source_id in RUNWAY_POSTS and source_id not in RUNWAY_EDITS:
+        RUNWAY_EDITS.add(source_id)
+        bot.loop.create_task(edit_runway_post(source_id))
+
+async def runway_reaction(payload, delta):
+    """Track RUNWAY_EMOJI counts from raw events, posting a message once it crosses RUNWAY_THRESHOLD.
+
+    A message's count is read from Discord once, the first time it is reacted to; after that
+    every add and remove is applied locally.
+    """
+    source_id = payload.message_id
+    if source_id in RUNWAY_COUNTS:
+        set_runway_count(source_id, RUNWAY_COUNTS[source_id] + delta)
+    elif source_id in RUNWAY_POSTS:
+        set_runway_count(source_id, RUNWAY_POSTS[source_id]["count"] + delta)
+    elif delta > 0:
+        channel = bot.get_channel(payload.channel_id)
+        if channel is None:
+            return
+        try:
+            message = await get_message(channel, source_id)
+        except Exception:
+            return
+        set_runway_count(source_id, reaction_count(message, RUNWAY_EMOJI))
+    count = RUNWAY_COUNTS.get(source_id, 0)
+    if count < RUNWAY_THRESHOLD or source_id in RUNWAY_POSTS or source_id in RUNWAY_POSTING or not RUNWAY_CHANNEL_ID:
+        return
+    guild = bot.get_guild(payload.guild_id)
+    runway_channel = guild.get_channel(RUNWAY_CHANNEL_ID) if guild else None
+    channel = guild.get_channel_or_thread(payload.channel_id) if guild else None
+    if runway_channel is None or channel is None or channel.id == runway_channel.id:
+        return
+    RUNWAY_POSTING.add(source_id)
+    try:
+        message = await get_message(channel, source_id)
+        await post_to_runway(message, runway_channel, RUNWAY_COUNTS.get(source_id, count))
+    except Exception as e:
+        print(f"Failed to post {source_id} to the runway: {e}")
+    finally:
+        RUNWAY_POSTING.discard(source_id)
+
+@bot.event
+async def on_raw_reaction_clear(payload):
+    if payload.message_id in RUNWAY_COUNTS or payload.message_id in RUNWAY_POSTS:
+        set_runway_count(payload.message_id, 0)
+
+@bot.event
+async def on_raw_reaction_clear_emoji(payload):
+    if str(payload.emoji) == RUNWAY_EMOJI and (payload.message_id in RUNWAY_COUNTS or payload.message_id in RUNWAY_POSTS):
+        set_runway_count(payload.message_id, 0)
 
 @bot.event
 async def on_raw_reaction_add(payload):
     """Event: Called when a reaction is added. Handles role assignment, runway emoji forwarding, and chat logs."""
+    note_reaction(payload.message_id, str(payload.emoji), 1)
     # --- Chat logs for reactions ---
     if payload.guild_id and CHAT_LOGS_CHANNEL_ID:
         guild = bot.get_guild(payload.guild_id)
@@ -1382,7 +3610,7 @@ async def on_raw_reaction_add(payload):
                 chat_logs_channel = guild.get_channel(CHAT_LOGS_CHANNEL_ID)
                 if channel and chat_logs_channel:
                     try:
-                        message = await channel.fetch_message(payload.message_id)
+                        message = await get_message(channel, payload.message_id)
                         embed = discord.Embed(
                             title="➕ Reaction Added",
                             color=0x00ff00,
@@ -1399,45 +3627,14 @@ async def on_raw_reaction_add(payload):
                             embed.add_field(name="Message Content", value=f"```{content_preview}```", inline=False)
                         
                         embed.set_thumbnail(url=user.avatar.url if user.avatar else None)
-                        await chat_logs_channel.send(embed=embed)
+                        ship_log(chat_logs_channel, embed, LOG_PRIORITY_CHAT)
                     except Exception as e:
                         print(f"ERROR logging reaction add: {e}")
     
     # --- Runway emoji forwarding ---
     # Only act on server messages
-    if payload.guild_id and str(payload.emoji) == "😭":
-        guild = bot.get_guild(payload.guild_id)
-        if guild and RUNWAY_CHANNEL_ID:
-            channel = guild.get_channel(payload.channel_id)
-            if channel:
-                try:
-                    message = await channel.fetch_message(payload.message_id)
-                    # Count loudly crying emoji reactions
-                    for reaction in message.reactions:
-                        if (str(reaction.emoji) == "😭") and (reaction.count >= 4):
-                            # Only forward if not already forwarded (avoid spam)
-                            # Optionally, you could keep a set of forwarded message IDs
-                            runway_channel = guild.get_channel(RUNWAY_CHANNEL_ID)
-                            if runway_channel:
-                                embed = nova_embed(
-                                    title=f"😭 #{message.id}",
-                                    description=message.content
-                                )
-                                embed.set_author(name=message.author.display_name, icon_url=message.author.avatar.url if message.author.avatar else None)
-                                embed.add_field(name="oRIGINAL cHANNEL", value=channel.mention, inline=True)
-                                embed.add_field(name="jUMP tO mESSAGE", value=f"[Click here]({message.jump_url})", inline=True)
-                                embed.set_footer(text=f"Message ID: {message.id}")
-                                files = []
-                                for attachment in message.attachments:
-                                    try:
-                                        file_data = await attachment.read()
-                                        files.append(discord.File(io.BytesIO(file_data), filename=attachment.filename))
-                                    except Exception:
-                                        continue
-                                await runway_channel.send(embed=embed, files=files)
-                            break  # Only forward once per event
-                except Exception:
-                    pass  # Silently ignore errors for this feature
+    if payload.guild_id and str(payload.emoji) == RUNWAY_EMOJI:
+        await runway_reaction(payload, 1)
     # --- Role assignment (existing logic) ---
     if payload.message_id != ROLE_MESSAGE_ID:
         return
@@ -1455,95 +3652,6 @@ async def on_raw_reaction_add(payload):
         except discord.Forbidden:
             print(f"Missing permission to add role {role_name} to {member}")
 
-@bot.event
-async def on_raw_reaction_remove(payload):
-    """Event: Called when a reaction is removed. Handles role removal, rsnipe storage, and chat logs."""
-    # --- Chat logs for reaction removal ---
-    if payload.guild_id and CHAT_LOGS_CHANNEL_ID:
-        guild = bot.get_guild(payload.guild_id)
-        if guild:
-            user = guild.get_member(payload.user_id)
-            if user and not user.bot:  # Don't log bot reactions
-                channel = guild.get_channel(payload.channel_id)
-                chat_logs_channel = guild.get_channel(CHAT_LOGS_CHANNEL_ID)
-                if channel and chat_logs_channel:
-                    try:
-                        message = await channel.fetch_message(payload.message_id)
-                        embed = discord.Embed(
-                            title="➖ Reaction Removed",
-                            color=0xff0000,
-                            timestamp=datetime.now()
-                        )
-                        embed.add_field(name="User", value=f"{user.mention}\n`{user.id}`", inline=True)
-                        embed.add_field(name="Channel", value=f"{channel.mention}\n`{channel.id}`", inline=True)
-                        embed.add_field(name="Emoji", value=str(payload.emoji), inline=True)
-                        embed.add_field(name="Message", value=f"[Jump to Message]({message.jump_url})\n`{message.id}`", inline=False)
-                        
-                        # Show message content preview (truncated)
-                        if message.content:
-                            content_preview = message.content[:100] + "..." if len(message.content) > 100 else message.content
-                            embed.add_field(name="Message Content", value=f"```{content_preview}```", inline=False)
-                        
-                        embed.set_thumbnail(url=user.avatar.url if user.avatar else None)
-                        await chat_logs_channel.send(embed=embed)
-                    except Exception as e:
-                        print(f"ERROR logging reaction removal: {e}")
-    
-    # Store the last removed reaction for rsnipe - Enhanced debugging
-    print(f"DEBUG: Reaction removed - Emoji: {payload.emoji}, User ID: {payload.user_id}, Guild ID: {payload.guild_id}")
-    
-    if payload.guild_id:
-        guild = bot.get_guild(payload.guild_id)
-        print(f"DEBUG: Guild found: {guild}")
-        if guild:
-            user = guild.get_member(payload.user_id)
-            print(f"DEBUG: User found: {user}, Is bot: {user.bot if user else 'None'}")
-            if user and not user.bot:
-                channel = guild.get_channel(payload.channel_id)
-                print(f"DEBUG: Channel found: {channel}")
-                if channel:
-                    try:
-                        message = await channel.fetch_message(payload.message_id)
-                        jump_url = message.jump_url
-                        print(f"DEBUG: Message fetched successfully, jump_url: {jump_url}")
-                    except Exception as e:
-                        jump_url = None
-                        print(f"DEBUG: Failed to fetch message: {e}")
-                    
-                    rsnipes[payload.channel_id] = {
-                        'emoji': str(payload.emoji),
-                        'user': str(user),
-                        'message_id': payload.message_id,
-                        'jump_url': jump_url,
-                        'time': datetime.now(dt_timezone.utc)
-                    }
-                    print(f"DEBUG: RSnipe data stored for channel {payload.channel_id}: {rsnipes[payload.channel_id]}")
-                else:
-                    print(f"DEBUG: Channel not found with ID: {payload.channel_id}")
-            else:
-                print(f"DEBUG: User is bot or not found, skipping rsnipe storage")
-        else:
-            print(f"DEBUG: Guild not found with ID: {payload.guild_id}")
-    else:
-        print("DEBUG: No guild_id in payload, skipping rsnipe storage")
-    
-    # Handle role removal (existing logic)
-    if payload.message_id != ROLE_MESSAGE_ID:
-        return
-    guild = bot.get_guild(payload.guild_id)
-    if not guild:
-        return
-    role_name = EMOJI_TO_ROLE.get(str(payload.emoji))
-    if not role_name:
-        return
-    role = discord.utils.get(guild.roles, name=role_name)
-    member = guild.get_member(payload.user_id)
-    if role and member:
-        try:
-            await member.remove_roles(role)
-        except discord.Forbidden:
-            print(f"Missing permission to remove role {role_name} from {member}")
-
 # =========================
 # Text Commands
 # =========================
@@ -1712,7 +3820,8 @@ HELP_CATEGORIES = {
         ("?adopt @user", "Adopt someone as your child", "Add them to your family tree"),
         ("?emancipate @user", "Remove someone from your family", "End parent-child relationship"),
         ("?getemancipated", "Leave your current family", "Remove yourself from family tree"),
-        ("?familytree @user", "View family relationships", "See spouse, parents, and children")
+        ("?familytree @user", "View family relationships", "See spouse, parents, and children"),
+        ("?lineage @user [generations]", "View a whole family line", "See every generation above and below someone")
     ],
     "🎮 Fun & Interactive": [
         ("?kiss @user", "Give someone a kiss", "Show affection with a cute message"),
@@ -1738,7 +3847,7 @@ HELP_CATEGORIES = {
     "📱 Social & Profiles": [
         ("?aboutme @user", "View someone's profile description", "See their custom about me text"),
         ("?level @user", "Check someone's server level", "View their XP and level progress"),
-        ("?leaderboard", "Show the server leaderboard", "Top users by level and XP"),
+        ("?leaderboard [page]", "Show the server leaderboard", "Top users by level and XP, 10 per page"),
         ("?avatar @user", "Show someone's avatar", "Display user's profile picture in full size"),
         ("?afk [reason]", "Set yourself as away", "Let others know you're not available"),
         ("?nick @user <nickname>", "Change someone's nickname (Mod+)", "Set or change user nicknames")
@@ -2057,69 +4166,37 @@ async def balance_slash(interaction: discord.Interaction):
     await interaction.response.send_message(embed=nova_embed("bALANCE", f"{interaction.user.mention}, yOU hAVE {bal} {CURRENCY_NAME} iN tHIS sERVER."))
 
 @bot.command()
+@cooldown("beg", 600, "bEG", "yOU cAN bEG aGAIN iN {remaining}.")
 async def beg(ctx):
-    now = datetime.now(dt_timezone.utc)
     user_id = ctx.author.id
     guild_id = ctx.guild.id
-    last = beg_cooldowns.get(user_id)
-    if last and now - last < timedelta(minutes=10):
-        rem = timedelta(minutes=10) - (now - last)
-        await ctx.send(embed=nova_embed("bEG", f"{ctx.author.mention}, yOU cAN bEG aGAIN iN {str(rem).split('.')[0]}."))
-        return
-    beg_cooldowns[user_id] = now
     if random.random() < 0.5:
         await ctx.send(embed=nova_embed("bEG", f"{ctx.author.mention}, nO oNE gAVE yOU aNYTHING tHIS tIME."))
     else:
         amount = random.randint(1, 20)
-        change_balance(user_id, amount, guild_id)
+        await transfer(guild_id, [(user_id, amount)], "beg")
         await ctx.send(embed=nova_embed("bEG", f"{ctx.author.mention}, yOU bEGGED aND gOT {amount} {CURRENCY_NAME}!"))
 
 @bot.command()
+@cooldown("daily", 86400, "dAILY", "yOU aLREADY cLAIMED yOUR dAILY! tRY aGAIN iN {remaining}.")
 async def daily(ctx):
-    user_id = str(ctx.author.id)
-    guild_id = ctx.guild.id
-    now = datetime.utcnow()
-    last = daily_cooldowns.get(user_id)
-    if last and (now - last).total_seconds() < 86400:
-        remaining = 86400 - (now - last).total_seconds()
-        hours = int(remaining // 3600)
-        mins = int((remaining % 3600) // 60)
-        await ctx.send(embed=nova_embed("dAILY", f"yOU aLREADY cLAIMED yOUR dAILY! tRY aGAIN iN {hours}h {mins}m."))
-        return
-    daily_cooldowns[user_id] = now
-    change_balance(ctx.author.id, 100, guild_id)
+    await transfer(ctx.guild.id, [(ctx.author.id, 100)], "daily")
     await ctx.send(embed=nova_embed("dAILY", f"yOU cLAIMED yOUR dAILY 100 {CURRENCY_NAME}!"))
 
 @bot.tree.command(name="daily", description="Claim daily reward (24h cooldown)")
+@cooldown("daily", 86400, "dAILY", "yOU aLREADY cLAIMED yOUR dAILY! tRY aGAIN iN {remaining}.")
 async def daily_slash(interaction: discord.Interaction):
-    user_id = str(interaction.user.id)
-    guild_id = interaction.guild.id
-    now = datetime.utcnow()
-    last = daily_cooldowns.get(user_id)
-    if last and (now - last).total_seconds() < 86400:
-        remaining = 86400 - (now - last).total_seconds()
-        hours = int(remaining // 3600)
-        mins = int((remaining % 3600) // 60)
-        await interaction.response.send_message(embed=nova_embed("dAILY", f"yOU aLREADY cLAIMED yOUR dAILY! tRY aGAIN iN {hours}h {mins}m."), ephemeral=True)
-        return
-    daily_cooldowns[user_id] = now
-    change_balance(interaction.user.id, 100, guild_id)
+    await transfer(interaction.guild.id, [(interaction.user.id, 100)], "daily")
     await interaction.response.send_message(embed=nova_embed("dAILY", f"yOU cLAIMED yOUR dAILY 100 {CURRENCY_NAME}!"))
 
 @bot.command()
+@cooldown("work", 1200, "wORK", "yOU cAN wORK aGAIN iN {remaining}.")
 async def work(ctx):
-    now = datetime.now(dt_timezone.utc)
     user_id = ctx.author.id
-    last = work_cooldowns.get(user_id)
-    if last and now - last < timedelta(minutes=20):
-        rem = timedelta(minutes=20) - (now - last)
-        await ctx.send(f"{ctx.author.mention}, you can work again in {str(rem).split('.')[0]}.")
-        return
-    work_cooldowns[user_id] = now
     jobs = ["chef", "barista", "programmer", "driver", "artist", "bjs"]
     job = random.choice(jobs)
     amount = random.randint(10, 50)
-    change_balance(user_id, amount)
+    await transfer(ctx.guild.id, [(user_id, amount)], "work")
     await ctx.send(f"{ctx.author.mention}, you worked as a {job} and earned {amount} {CURRENCY_NAME}!")
 
 @bot.command()
@@ -2134,11 +4211,9 @@ async def impregnate(ctx, partner: discord.Member):
     child_support = 50
     payer = ctx.author if payer_is_author else partner
     receiver = partner if payer_is_author else ctx.author
-    if get_balance(payer.id) < child_support:
+    if not await transfer(ctx.guild.id, [(payer.id, -child_support), (receiver.id, child_support)], "child support"):
         await ctx.send(f"{payer.mention} does not have enough {CURRENCY_NAME} to pay child support!")
         return
-    change_balance(payer.id, -child_support)
-    change_balance(receiver.id, child_support)
     await ctx.send(f"{ctx.author.mention} impregnated {partner.mention}!\n{payer.mention} pays {child_support} {CURRENCY_NAME} as child support to {receiver.mention}.")
 
 class NukeConfirmView(discord.ui.View):
@@ -2156,50 +4231,41 @@ class NukeConfirmView(discord.ui.View):
         self.value = True
         self.stop()
         
-        # Fetch messages before deleting to log them
-        messages_to_delete = []
-        async for message in self.ctx.channel.history(limit=1000):
-            messages_to_delete.append(message)
-        
-        # Create a document of nuked messages
-        if messages_to_delete:
-            nuked_messages_log = f"Nuked Messages Log - {self.ctx.channel.name}\n"
-            nuked_messages_log += f"Nuked by: {self.ctx.author} ({self.ctx.author.id})\n"
-            nuked_messages_log += f"Nuked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            nuked_messages_log += f"Channel: #{self.ctx.channel.name} ({self.ctx.channel.id})\n"
-            nuked_messages_log += "=" * 50 + "\n\n"
-            
-            for i, msg in enumerate(reversed(messages_to_delete), 1):
-                timestamp = msg.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                content = msg.content or "[No text content]"
-                attachments = ", ".join([att.filename for att in msg.attachments]) if msg.attachments else "None"
-                
-                nuked_messages_log += f"Message {i}:\n"
-                nuked_messages_log += f"Author: {msg.author} ({msg.author.id})\n"
-                nuked_messages_log += f"Timestamp: {timestamp}\n"
-                nuked_messages_log += f"Content: {content}\n"
-                nuked_messages_log += f"Attachments: {attachments}\n"
-                nuked_messages_log += "-" * 30 + "\n\n"
+        # Write the messages into a transcript before deleting them
+        transcript = Transcript(
+            f"Nuked Messages Log - {self.ctx.channel.name}",
+            [
+                f"Nuked by: {self.ctx.author} ({self.ctx.author.id})",
+                f"Nuked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                f"Channel: #{self.ctx.channel.name} ({self.ctx.channel.id})",
+                "Newest message first"
+            ],
+            record_ids=True
+        )
+        try:
+            await transcript.stream(self.ctx.channel.history(limit=1000))
+            transcript.finish()
             
             # Send the log as a file to the mod logs channel (server-specific)
             mod_logs_channel_id = get_server_config(self.ctx.guild.id, "mod_logs_channel_id")
-            if mod_logs_channel_id:
+            if transcript.count and mod_logs_channel_id:
                 mod_logs_channel = self.ctx.guild.get_channel(mod_logs_channel_id)
                 if mod_logs_channel:
-                    file_content = nuked_messages_log.encode('utf-8')
-                    filename = f"nuked_messages_{self.ctx.channel.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                    file = discord.File(io.BytesIO(file_content), filename=filename)
-                    
                     embed = discord.Embed(
                         title="💥 Channel Nuked",
-                        description=f"**Channel:** {self.ctx.channel.mention}\n**Moderator:** {self.ctx.author.mention}\n**Messages Deleted:** {len(messages_to_delete)}",
+                        description=f"**Channel:** {self.ctx.channel.mention}\n**Moderator:** {self.ctx.author.mention}\n**Messages Deleted:** {transcript.count}",
                         color=0xff0000,
                         timestamp=datetime.now()
                     )
-                    await mod_logs_channel.send(embed=embed, file=file)
+                    await mod_logs_channel.send(
+                        embed=embed,
+                        file=transcript.upload(f"nuked_messages_{self.ctx.channel.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+                    )
+        finally:
+            transcript.close()
         
         # Now nuke the channel (delete all messages)
-        deleted = await self.ctx.channel.purge(limit=1000)
+        deleted = await bot_purge(self.ctx.channel, 1000, transcript.message_ids)
         await self.ctx.send("💥 **BOOM!** Channel has been nuked!", delete_after=5)
         
         # Log the mod action
@@ -2302,50 +4368,41 @@ async def clear(ctx, amount: int = None):
         await ctx.send("Usage: ?clear [amount] - Deletes a number of messages. Only mods/admins can use this.")
         return
     
-    # Fetch messages before deleting to log them
-    messages_to_delete = []
-    async for message in ctx.channel.history(limit=amount):
-        messages_to_delete.append(message)
-    
-    # Create a document of deleted messages
-    if messages_to_delete:
-        deleted_messages_log = f"Deleted Messages Log - {ctx.channel.name}\n"
-        deleted_messages_log += f"Deleted by: {ctx.author} ({ctx.author.id})\n"
-        deleted_messages_log += f"Deleted at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        deleted_messages_log += f"Channel: #{ctx.channel.name} ({ctx.channel.id})\n"
-        deleted_messages_log += "=" * 50 + "\n\n"
-        
-        for i, msg in enumerate(reversed(messages_to_delete), 1):
-            timestamp = msg.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            content = msg.content or "[No text content]"
-            attachments = ", ".join([att.filename for att in msg.attachments]) if msg.attachments else "None"
-            
-            deleted_messages_log += f"Message {i}:\n"
-            deleted_messages_log += f"Author: {msg.author} ({msg.author.id})\n"
-            deleted_messages_log += f"Timestamp: {timestamp}\n"
-            deleted_messages_log += f"Content: {content}\n"
-            deleted_messages_log += f"Attachments: {attachments}\n"
-            deleted_messages_log += "-" * 30 + "\n\n"
+    # Write the messages into a transcript before deleting them
+    transcript = Transcript(
+        f"Deleted Messages Log - {ctx.channel.name}",
+        [
+            f"Deleted by: {ctx.author} ({ctx.author.id})",
+            f"Deleted at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Channel: #{ctx.channel.name} ({ctx.channel.id})",
+            "Newest message first"
+        ],
+        record_ids=True
+    )
+    try:
+        await transcript.stream(ctx.channel.history(limit=amount))
+        transcript.finish()
         
         # Send the log as a file to the mod logs channel
         mod_logs_channel_id = get_server_config(ctx.guild.id, "mod_logs_channel_id")
-        if mod_logs_channel_id:
+        if transcript.count and mod_logs_channel_id:
             mod_logs_channel = ctx.guild.get_channel(mod_logs_channel_id)
             if mod_logs_channel:
-                file_content = deleted_messages_log.encode('utf-8')
-                filename = f"deleted_messages_{ctx.channel.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                file = discord.File(io.BytesIO(file_content), filename=filename)
-                
                 embed = discord.Embed(
                     title="🗑️ Messages Cleared",
-                    description=f"**Channel:** {ctx.channel.mention}\n**Moderator:** {ctx.author.mention}\n**Messages Deleted:** {len(messages_to_delete)}",
+                    description=f"**Channel:** {ctx.channel.mention}\n**Moderator:** {ctx.author.mention}\n**Messages Deleted:** {transcript.count}",
                     color=0xff0000,
                     timestamp=datetime.now()
                 )
-                await mod_logs_channel.send(embed=embed, file=file)
+                await mod_logs_channel.send(
+                    embed=embed,
+                    file=transcript.upload(f"deleted_messages_{ctx.channel.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+                )
+    finally:
+        transcript.close()
     
     # Now delete the messages
-    deleted = await ctx.channel.purge(limit=amount)
+    deleted = await bot_purge(ctx.channel, amount, transcript.message_ids)
     await ctx.send(f"Cleared {len(deleted)} messages", delete_after=3)
     
     # Log the mod action
@@ -2388,18 +4445,16 @@ async def nicki(ctx):
 
 @bot.command()
 async def level(ctx):
-    data = get_level(ctx.author.id)
-    await ctx.send(f"{ctx.author.mention}, you are level {data['level']} with {data['xp']} XP.")
+    data = get_level(ctx.guild.id, ctx.author.id)
+    await ctx.send(format_level(ctx.author.mention, data))
 
 @bot.command()
-async def leaderboard(ctx):
-    sorted_users = sorted(user_xp.items(), key=lambda x: x[1]['level'] * 100 + x[1]['xp'], reverse=True)
-    top = "Top 5 users:\n"
-    for i, (user_id, data) in enumerate(sorted_users[:5]):
-        member = ctx.guild.get_member(int(user_id))
-        if member:
-            top += f"{i+1}. {member.display_name} - Level {data['level']}\n"
-    await ctx.send(top)
+async def leaderboard(ctx, page: int = 1):
+    """Show the server's XP leaderboard, 10 per page. Usage: ?leaderboard [page]"""
+    text, page, total_pages = build_xp_leaderboard_page(ctx.guild, page)
+    embed = nova_embed("🏆 lEADERBOARD", text)
+    embed.set_footer(text=f"pAGE {page}/{total_pages}")
+    await ctx.send(embed=embed)
 
 @bot.command()
 async def spotify(ctx, member: discord.Member = None):
@@ -2436,37 +4491,25 @@ if not TOKEN:
 
 # Slash command version of beg
 @bot.tree.command(name="beg", description="Beg for money (10 min cooldown)")
+@cooldown("beg", 600, "bEG", "yOU cAN bEG aGAIN iN {remaining}.")
 async def beg_slash(interaction: discord.Interaction):
-    now = datetime.now(dt_timezone.utc)
     user_id = interaction.user.id
-    last = beg_cooldowns.get(user_id)
-    if last and now - last < timedelta(minutes=10):
-        rem = timedelta(minutes=10) - (now - last)
-        await interaction.response.send_message(f"{interaction.user.mention}, you can beg again in {str(rem).split('.')[0]}", ephemeral=True)
-        return
-    beg_cooldowns[user_id] = now
     if random.random() < 0.5:
         await interaction.response.send_message(f"{interaction.user.mention}, no one gave you anything this time.")
     else:
         amount = random.randint(1, 20)
-        change_balance(user_id, amount)
+        await transfer(interaction.guild.id, [(user_id, amount)], "beg")
         await interaction.response.send_message(f"{interaction.user.mention}, you begged and got {amount} {CURRENCY_NAME}!")
 
 # Slash command version of work
 @bot.tree.command(name="work", description="Work a job to earn money (20 min cooldown)")
+@cooldown("work", 1200, "wORK", "yOU cAN wORK aGAIN iN {remaining}.")
 async def work_slash(interaction: discord.Interaction):
-    now = datetime.now(dt_timezone.utc)
     user_id = interaction.user.id
-    last = work_cooldowns.get(user_id)
-    if last and now - last < timedelta(minutes=20):
-        rem = timedelta(minutes=20) - (now - last)
-        await interaction.response.send_message(f"{interaction.user.mention}, you can work again in {str(rem).split('.')[0]}", ephemeral=True)
-        return
-    work_cooldowns[user_id] = now
     jobs = ["chef", "barista", "programmer", "driver", "artist", "bjs"]
     job = random.choice(jobs)
     amount = random.randint(10, 50)
-    change_balance(user_id, amount)
+    await transfer(interaction.guild.id, [(user_id, amount)], "work")
     await interaction.response.send_message(f"{interaction.user.mention}, you worked as a {job} and earned {amount} {CURRENCY_NAME}!")
 
 # Slash command version of impregnate
@@ -2483,11 +4526,9 @@ async def impregnate_slash(interaction: discord.Interaction, partner: discord.Me
     child_support = 50
     payer = interaction.user if payer_is_author else partner
     receiver = partner if payer_is_author else interaction.user
-    if get_balance(payer.id) < child_support:
+    if not await transfer(interaction.guild.id, [(payer.id, -child_support), (receiver.id, child_support)], "child support"):
         await interaction.response.send_message(f"{payer.mention} does not have enough {CURRENCY_NAME} to pay child support!", ephemeral=True)
         return
-    change_balance(payer.id, -child_support)
-    change_balance(receiver.id, child_support)
     await interaction.response.send_message(f"{interaction.user.mention} impregnated {partner.mention}!\n{payer.mention} pays {child_support} {CURRENCY_NAME} as child support to {receiver.mention}.")
 
 # Slash command version of nuke
@@ -2497,8 +4538,9 @@ async def nuke_slash(interaction: discord.Interaction):
     if not has_mod_or_admin(ctx):
         await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
         return
-    await interaction.channel.purge(limit=1000)
+    deleted = await bot_purge(interaction.channel, 1000)
     await interaction.response.send_message("boom")
+    await log_mod_action(interaction.guild, "nuke", interaction.user, None, f"Nuked all messages in {interaction.channel.mention} ({len(deleted)} messages)")
     await interaction.followup.send("Usage: /nuke - Deletes all messages in the channel. Only mods/admins can use this.", ephemeral=True)
 
 # Slash command version of kick
@@ -2563,20 +4605,20 @@ async def nicki_slash(interaction: discord.Interaction):
 # Slash command version of level
 @bot.tree.command(name="level", description="Show your level and XP")
 async def level_slash(interaction: discord.Interaction):
-    data = get_level(interaction.user.id)
-    await interaction.response.send_message(f"{interaction.user.mention}, you are level {data['level']} with {data['xp']} XP.")
+    data = get_level(interaction.guild_id, interaction.user.id)
+    await interaction.response.send_message(format_level(interaction.user.mention, data))
 
 # Slash command version of leaderboard
-@bot.tree.command(name="leaderboard", description="Show top 5 users by level")
-async def leaderboard_slash(interaction: discord.Interaction):
-    sorted_users = sorted(user_xp.items(), key=lambda x: x[1]['level'] * 100 + x[1]['xp'], reverse=True)
-    top = "Top 5 users:\n"
-    for i, (user_id, data) in enumerate(sorted_users[:5]):
-        guild = interaction.guild
-        member = guild.get_member(int(user_id)) if guild else None
-        if member:
-            top += f"{i+1}. {member.display_name} - Level {data['level']}\n"
-    await interaction.response.send_message(top)
+@bot.tree.command(name="leaderboard", description="Show the server's XP leaderboard")
+@app_commands.describe(page="Page of the leaderboard")
+async def leaderboard_slash(interaction: discord.Interaction, page: int = 1):
+    if interaction.guild is None:
+        await interaction.response.send_message(embed=nova_embed("🏆 lEADERBOARD", "tHIS cOMMAND cAN oNLY bE uSED iN sERVERS!"), ephemeral=True)
+        return
+    text, page, total_pages = build_xp_leaderboard_page(interaction.guild, page)
+    embed = nova_embed("🏆 lEADERBOARD", text)
+    embed.set_footer(text=f"pAGE {page}/{total_pages}")
+    await interaction.response.send_message(embed=embed)
 
 # Slash command version of spotify
 @bot.tree.command(name="spotify", description="Show Spotify status for a user (or yourself)")
@@ -2630,38 +4672,95 @@ async def about(ctx):
         description="i'M nOVA, yOUR aLL-iN-oNE dISCORD bOT. sASS, hELP, aND cHAOS iN oNE pACKAGE!",
         color=0xff69b4
     )
-    embed.set_footer(text="cREATED bY mOTHER 💅")
+    embed.set_footer(text="cREATED bY mOTHER 💅")
+    await ctx.send(embed=embed)
+
+@bot.command()
+async def uptime(ctx):
+    """Shows how long Nova has been running."""
+    up = int(time.time() - start_time)
+    hours, remainder = divmod(up, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    await ctx.send(f"Uptime: {hours}h {minutes}m {seconds}s")
+
+@bot.command()
+async def looplag(ctx, action: str = None):
+    """Show the event loop blocking histogram (Owner only). Usage: ?looplag [reset]"""
+    if ctx.author.id != OWNER_ID:
+        await ctx.send(embed=nova_embed("lOOP lAG", "oNLY tHE oWNER cAN dO tHIS!"))
+        return
+    if action == "reset":
+        reset_loop_lag_stats()
+        reset_message_stage_stats()
+        COOLDOWN_STATS.clear()
+        await ctx.send(embed=nova_embed("lOOP lAG", "sTATS rESET!"))
+        return
+    total = sum(LOOP_LAG_HISTOGRAM)
+    lines = []
+    lower = 0
+    for i, count in enumerate(LOOP_LAG_HISTOGRAM):
+        label = f"{lower}-{LOOP_LAG_BUCKETS_MS[i]}ms" if i < len(LOOP_LAG_BUCKETS_MS) else f">{lower}ms"
+        share = count / total * 100 if total else 0
+        lines.append(f"`{label:>12}` {count} ({share:.1f}%)")
+        if i < len(LOOP_LAG_BUCKETS_MS):
+            lower = LOOP_LAG_BUCKETS_MS[i]
+    embed = nova_embed("lOOP lAG", "\n".join(lines))
+    embed.add_field(name="Storage Mode", value="inline (blocking)" if STORAGE_INLINE else "storage thread", inline=True)
+    embed.add_field(name="Samples", value=str(total), inline=True)
+    embed.add_field(name="p50 / p99 / max", value=f"≤{loop_lag_percentile(0.5)} / ≤{loop_lag_percentile(0.99)} / {loop_lag_max_ms:.1f}ms", inline=True)
+    jobs = STORAGE_STATS["jobs"]
+    avg_ms = STORAGE_STATS["total_ms"] / jobs if jobs else 0
+    embed.add_field(name="Storage Jobs", value=f"{jobs} jobs, avg {avg_ms:.1f}ms, max {STORAGE_STATS['max_ms']:.1f}ms", inline=False)
+    embed.add_field(
+        name="Message Cache",
+        value=f"{len(MESSAGE_CACHE)} cached, {MESSAGE_CACHE_STATS['gateway']} gateway / {MESSAGE_CACHE_STATS['hits']} cache hits, "
+              f"{MESSAGE_CACHE_STATS['fetches']} fetches, {MESSAGE_CACHE_STATS['coalesced']} coalesced",
+        inline=False
+    )
+    stage_lines = []
+    for stage in MESSAGE_STAGES:
+        samples = sum(MESSAGE_STAGE_STATS[stage]["histogram"])
+        if samples:
+            stage_lines.append(
+                f"`{stage:>8}` p50 ≤{message_stage_percentile(stage, 0.5)} / p99 ≤{message_stage_percentile(stage, 0.99)} / "
+                f"max {MESSAGE_STAGE_STATS[stage]['max_us']:.0f}µs ({samples})"
+            )
+    queued = message_side_effects.qsize() if message_side_effects is not None else 0
+    stage_lines.append(
+        f"side effects: {MESSAGE_SIDE_EFFECT_STATS['done']} done, {queued} queued, "
+        f"{MESSAGE_SIDE_EFFECT_STATS['failed']} failed, {MESSAGE_SIDE_EFFECT_STATS['dropped']} dropped"
+    )
+    embed.add_field(name="on_message Stages", value="\n".join(stage_lines), inline=False)
+    backlog = sum(len(queue["items"]) for queue in LOG_QUEUES.values())
+    embed.add_field(
+        name="Log Shipper",
+        value=f"{LOG_STATS['sent']} logs in {LOG_STATS['messages']} messages, {backlog} queued, "
+              f"{LOG_STATS['delayed']} delayed >{LOG_DELAY_WARN}s, {LOG_STATS['dropped']} dropped",
+        inline=False
+    )
+    cooldown_lines = [
+        f"`{action:>8}` {stats['used']} used, {stats['hit']} hit ({stats['hit'] / (stats['used'] + stats['hit']) * 100:.1f}%)"
+        for action, stats in sorted(COOLDOWN_STATS.items())
+    ]
+    cooldown_lines.append(f"{len(COOLDOWNS)} running")
+    embed.add_field(name="Cooldowns", value="\n".join(cooldown_lines), inline=False)
     await ctx.send(embed=embed)
 
-@bot.command()
-async def uptime(ctx):
-    """Shows how long Nova has been running."""
-    up = int(time.time() - start_time)
-    hours, remainder = divmod(up, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    await ctx.send(f"Uptime: {hours}h {minutes}m {seconds}s")
-
 # Relationship/Roleplay
 @bot.command()
 async def divorce(ctx, user: discord.Member):
-    relationships = load_relationships()
-    key = f"married:{ctx.author.id}"
-    if key not in relationships or relationships[key] != user.id:
+    if await get_spouse(ctx.author.id) != user.id:
         await ctx.send(embed=nova_embed("dIVORCE", "yOU'RE nOT mARRIED tO tHAT pERSON!"))
         return
-    del relationships[key]
-    save_relationships(relationships)
+    await remove_spouse(ctx.author.id)
     await ctx.send(embed=nova_embed("dIVORCE", f"💔 {ctx.author.display_name} dIVORCED {user.display_name}!"))
 
 @bot.tree.command(name="divorce", description="End your marriage with a user")
 async def divorce_slash(interaction: discord.Interaction, user: discord.Member):
-    relationships = load_relationships()
-    key = f"married:{interaction.user.id}"
-    if key not in relationships or relationships[key] != user.id:
+    if await get_spouse(interaction.user.id) != user.id:
         await interaction.response.send_message(embed=nova_embed("dIVORCE", "yOU'RE nOT mARRIED tO tHAT pERSON!"))
         return
-    del relationships[key]
-    save_relationships(relationships)
+    await remove_spouse(interaction.user.id)
     await interaction.response.send_message(embed=nova_embed("dIVORCE", f"💔 {interaction.user.display_name} dIVORCED {user.display_name}!"))
 
 @bot.command()
@@ -2669,9 +4768,7 @@ async def marry(ctx, user: discord.Member):
     if user.id == ctx.author.id:
         await ctx.send(embed=nova_embed("mARRY", "yOU cAN'T mARRY yOURSELF, bABY!"))
         return
-    relationships = load_relationships()
-    key = f"married:{ctx.author.id}"
-    if key in relationships:
+    if await get_spouse(ctx.author.id) is not None:
         await ctx.send(embed=nova_embed("mARRY", "yOU'RE aLREADY mARRIED!"))
         return
     if user.id in pending_marriages:
@@ -2692,9 +4789,7 @@ async def marry_slash(interaction: discord.Interaction, user: discord.Member):
     if user.id == interaction.user.id:
         await interaction.response.send_message(embed=nova_embed("mARRY", "yOU cAN'T mARRY yOURSELF, bABY!"))
         return
-    relationships = load_relationships()
-    key = f"married:{interaction.user.id}"
-    if key in relationships:
+    if await get_spouse(interaction.user.id) is not None:
         await interaction.response.send_message(embed=nova_embed("mARRY", "yOU'RE aLREADY mARRIED!"))
         return
     if user.id in pending_marriages:
@@ -2714,16 +4809,17 @@ async def adopt(ctx, user: discord.Member):
     if user.id == ctx.author.id:
         await ctx.send(embed=nova_embed("aDOPT", "yOU cAN'T aDOPT yOURSELF!"))
         return
-    relationships = load_relationships()
-    
     # Check if user is already adopted by someone
-    for key, value in relationships.items():
-        if key.startswith("adopted:") and value == user.id:
-            adopter_id = int(key.split(":")[1])
-            adopter = ctx.guild.get_member(adopter_id)
-            if adopter:
-                await ctx.send(embed=nova_embed("aDOPT", f"{user.display_name} iS aLREADY aDOPTED bY {adopter.display_name}!"))
-                return
+    adopter_id = await get_parent(user.id)
+    if adopter_id is not None:
+        adopter = ctx.guild.get_member(adopter_id)
+        if adopter:
+            await ctx.send(embed=nova_embed("aDOPT", f"{user.display_name} iS aLREADY aDOPTED bY {adopter.display_name}!"))
+            return
+    # Adopting your own parent or grandparent would loop the family tree
+    if await is_ancestor(user.id, ctx.author.id):
+        await ctx.send(embed=nova_embed("aDOPT", f"{user.display_name} iS aLREADY yOUR aNCESTOR!"))
+        return
     
     if user.id in pending_adoptions:
         await ctx.send(embed=nova_embed("aDOPT", "tHAT uSER aLREADY hAS a pENDING aDOPTION!"))
@@ -2738,16 +4834,17 @@ async def adopt_slash(interaction: discord.Interaction, user: discord.Member):
     if user.id == interaction.user.id:
         await interaction.response.send_message(embed=nova_embed("aDOPT", "yOU cAN'T aDOPT yOURSELF!"))
         return
-    relationships = load_relationships()
-    
     # Check if user is already adopted by someone
-    for key, value in relationships.items():
-        if key.startswith("adopted:") and value == user.id:
-            adopter_id = int(key.split(":")[1])
-            adopter = interaction.guild.get_member(adopter_id)
-            if adopter:
-                await interaction.response.send_message(embed=nova_embed("aDOPT", f"{user.display_name} iS aLREADY aDOPTED bY {adopter.display_name}!"))
-                return
+    adopter_id = await get_parent(user.id)
+    if adopter_id is not None:
+        adopter = interaction.guild.get_member(adopter_id)
+        if adopter:
+            await interaction.response.send_message(embed=nova_embed("aDOPT", f"{user.display_name} iS aLREADY aDOPTED bY {adopter.display_name}!"))
+            return
+    # Adopting your own parent or grandparent would loop the family tree
+    if await is_ancestor(user.id, interaction.user.id):
+        await interaction.response.send_message(embed=nova_embed("aDOPT", f"{user.display_name} iS aLREADY yOUR aNCESTOR!"))
+        return
     
     if user.id in pending_adoptions:
         await interaction.response.send_message(embed=nova_embed("aDOPT", "tHAT uSER aLREADY hAS a pENDING aDOPTION!"))
@@ -2777,12 +4874,12 @@ class AdoptionView(View):
             await interaction.response.send_message(embed=nova_embed("aDOPTION", "aDOPTER nOT fOUND!"), ephemeral=True)
             return
         
-        relationships = load_relationships()
-        key = f"adopted:{self.adopter_id}"
-        relationships[key] = self.adoptee_id
-        save_relationships(relationships)
+        if await is_ancestor(self.adoptee_id, self.adopter_id):
+            await interaction.response.send_message(embed=nova_embed("aDOPTION", "yOU cAN'T aDOPT yOUR oWN pARENT!"), ephemeral=True)
+            return
         
         del pending_adoptions[self.adoptee_id]
+        await set_relationship("parent", self.adoptee_id, self.adopter_id)
         
         # Disable all buttons
         for child in self.children:
@@ -2819,190 +4916,107 @@ class AdoptionView(View):
 
 @bot.command()
 async def emancipate(ctx, user: discord.Member):
-    relationships = load_relationships()
-    key = f"adopted:{ctx.author.id}"
-    if key not in relationships or relationships[key] != user.id:
+    if await get_parent(user.id) != ctx.author.id:
         await ctx.send(embed=nova_embed("eMANCIPATE", "yOU hAVEN'T aDOPTED tHAT pERSON!"))
         return
-    del relationships[key]
-    save_relationships(relationships)
+    await delete_relationship("parent", user.id)
     await ctx.send(embed=nova_embed("eMANCIPATE", f"{user.display_name} hAS bEEN eMANCIPATED bY {ctx.author.display_name}!"))
 
 @bot.tree.command(name="emancipate", description="Free a previously adopted user")
 async def emancipate_slash(interaction: discord.Interaction, user: discord.Member):
-    relationships = load_relationships()
-    key = f"adopted:{interaction.user.id}"
-    if key not in relationships or relationships[key] != user.id:
+    if await get_parent(user.id) != interaction.user.id:
         await interaction.response.send_message(embed=nova_embed("eMANCIPATE", "yOU hAVEN'T aDOPTED tHAT pERSON!"))
         return
-    del relationships[key]
-    save_relationships(relationships)
+    await delete_relationship("parent", user.id)
     await interaction.response.send_message(embed=nova_embed("eMANCIPATE", f"{user.display_name} hAS bEEN eMANCIPATED bY {interaction.user.display_name}!"))
 
 @bot.command()
 async def getemancipated(ctx):
-    relationships = load_relationships()
-    
     # Find if user is adopted by someone
     adopted_by = None
-    for key, value in relationships.items():
-        if key.startswith("adopted:") and value == ctx.author.id:
-            adopter_id = int(key.split(":")[1])
-            adopted_by = ctx.guild.get_member(adopter_id)
-            break
+    adopter_id = await get_parent(ctx.author.id)
+    if adopter_id is not None:
+        adopted_by = ctx.guild.get_member(adopter_id)
     
     if not adopted_by:
         await ctx.send(embed=nova_embed("gET eMANCIPATED", "yOU aREN'T aDOPTED bY aNYONE!"))
         return
     
     # Remove the adoption
-    for key, value in relationships.items():
-        if key.startswith("adopted:") and value == ctx.author.id:
-            del relationships[key]
-            break
-    
-    save_relationships(relationships)
+    await delete_relationship("parent", ctx.author.id)
     await ctx.send(embed=nova_embed("gET eMANCIPATED", f"🏛️ {ctx.author.display_name} hAS bEEN eMANCIPATED fROM {adopted_by.display_name}! yOU aRE nOW fREE!"))
 
 @bot.tree.command(name="getemancipated", description="Emancipate yourself from your adoptive parent")
 async def getemancipated_slash(interaction: discord.Interaction):
-    relationships = load_relationships()
-    
     # Find if user is adopted by someone
     adopted_by = None
-    for key, value in relationships.items():
-        if key.startswith("adopted:") and value == interaction.user.id:
-            adopter_id = int(key.split(":")[1])
-            adopted_by = interaction.guild.get_member(adopter_id)
-            break
+    adopter_id = await get_parent(interaction.user.id)
+    if adopter_id is not None:
+        adopted_by = interaction.guild.get_member(adopter_id)
     
     if not adopted_by:
         await interaction.response.send_message(embed=nova_embed("gET eMANCIPATED", "yOU aREN'T aDOPTED bY aNYONE!"), ephemeral=True)
         return
     
     # Remove the adoption
-    for key, value in relationships.items():
-        if key.startswith("adopted:") and value == interaction.user.id:
-            del relationships[key]
-            break
-    
-    save_relationships(relationships)
+    await delete_relationship("parent", interaction.user.id)
     await interaction.response.send_message(embed=nova_embed("gET eMANCIPATED", f"🏛️ {interaction.user.display_name} hAS bEEN eMANCIPATED fROM {adopted_by.display_name}! yOU aRE nOW fREE!"))
 
+def format_family_members(guild, member_ids):
+    """Display names for the members still in this guild, or nONE."""
+    names = [member.display_name for member in (guild.get_member(member_id) for member_id in member_ids) if member]
+    return ", ".join(names) if names else "nONE"
+
+async def build_family_tree(guild, user):
+    spouse_id = await get_spouse(user.id)
+    ancestors = await get_ancestors(user.id, max_depth=2)
+    descendants = await get_descendants(user.id, max_depth=2)
+    
+    tree = f"**fAMILY tREE fOR {user.display_name}**\n\n"
+    tree += f"💍 **sPOUSE:** {format_family_members(guild, [spouse_id] if spouse_id else [])}\n"
+    tree += f"👴 **gRANDPARENTS:** {format_family_members(guild, [m for gen, m in ancestors if gen == 2])}\n"
+    tree += f"👨‍👩‍👧‍👦 **pARENTS:** {format_family_members(guild, [m for gen, m in ancestors if gen == 1])}\n"
+    tree += f"👶 **cHILDREN:** {format_family_members(guild, [m for gen, m in descendants if gen == 1])}\n"
+    tree += f"🍼 **gRANDCHILDREN:** {format_family_members(guild, [m for gen, m in descendants if gen == 2])}\n"
+    return tree
+
+async def build_lineage(guild, user, depth):
+    """One line per generation, oldest ancestors first and descendants down to depth levels."""
+    lines = []
+    for generation, member_id in reversed(await get_ancestors(user.id, max_depth=depth)):
+        lines.append(f"⬆️ {generation}: {format_family_members(guild, [member_id])}")
+    lines.append(f"⭐ **{user.display_name}**")
+    by_generation = {}
+    for generation, member_id in await get_descendants(user.id, max_depth=depth):
+        by_generation.setdefault(generation, []).append(member_id)
+    for generation, member_ids in by_generation.items():
+        lines.append(f"⬇️ {generation}: {format_family_members(guild, member_ids)}")
+    return "\n".join(lines)
+
 @bot.command()
 async def familytree(ctx, user: discord.Member = None):
     user = user or ctx.author
-    relationships = load_relationships()
-    
-    # Find spouse
-    spouse = None
-    for key, value in relationships.items():
-        if key.startswith("married:"):
-            user_id = int(key.split(":")[1])
-            if user_id == user.id:
-                spouse = ctx.guild.get_member(value)
-                break
-            elif value == user.id:
-                spouse = ctx.guild.get_member(user_id)
-                break
-    
-    # Find children (people this user has adopted)
-    children = []
-    for key, value in relationships.items():
-        if key.startswith("adopted:"):
-            adopter_id = int(key.split(":")[1])
-            if adopter_id == user.id:
-                child = ctx.guild.get_member(value)
-                if child:
-                    children.append(child)
-    
-    # Find parents (people who adopted this user)
-    parents = []
-    for key, value in relationships.items():
-        if key.startswith("adopted:"):
-            if value == user.id:
-                adopter_id = int(key.split(":")[1])
-                parent = ctx.guild.get_member(adopter_id)
-                if parent:
-                    parents.append(parent)
-    
-    # Build family tree
-    tree = f"**fAMILY tREE fOR {user.display_name}**\n\n"
-    
-    if spouse:
-        tree += f"💍 **sPOUSE:** {spouse.display_name}\n"
-    else:
-        tree += "💍 **sPOUSE:** nONE\n"
-    
-    if children:
-        tree += f"👶 **cHILDREN:** {', '.join([child.display_name for child in children])}\n"
-    else:
-        tree += "👶 **cHILDREN:** nONE\n"
-    
-    if parents:
-        tree += f"👨‍👩‍👧‍👦 **pARENTS:** {', '.join([parent.display_name for parent in parents])}\n"
-    else:
-        tree += "👨‍👩‍👧‍👦 **pARENTS:** nONE\n"
-    
-    await ctx.send(embed=nova_embed("fAMILY tREE", tree))
+    await ctx.send(embed=nova_embed("fAMILY tREE", await build_family_tree(ctx.guild, user)))
 
 @bot.tree.command(name="familytree", description="Show family tree for a user")
 @app_commands.describe(user="The user to check (optional - shows your own)")
 async def familytree_slash(interaction: discord.Interaction, user: discord.Member = None):
     user = user or interaction.user
-    relationships = load_relationships()
-    
-    # Find spouse
-    spouse = None
-    for key, value in relationships.items():
-        if key.startswith("married:"):
-            user_id = int(key.split(":")[1])
-            if user_id == user.id:
-                spouse = interaction.guild.get_member(value)
-                break
-            elif value == user.id:
-                spouse = interaction.guild.get_member(user_id)
-                break
-    
-    # Find children (people this user has adopted)
-    children = []
-    for key, value in relationships.items():
-        if key.startswith("adopted:"):
-            adopter_id = int(key.split(":")[1])
-            if adopter_id == user.id:
-                child = interaction.guild.get_member(value)
-                if child:
-                    children.append(child)
-    
-    # Find parents (people who adopted this user)
-    parents = []
-    for key, value in relationships.items():
-        if key.startswith("adopted:"):
-            if value == user.id:
-                adopter_id = int(key.split(":")[1])
-                parent = interaction.guild.get_member(adopter_id)
-                if parent:
-                    parents.append(parent)
-    
-    # Build family tree
-    tree = f"**fAMILY tREE fOR {user.display_name}**\n\n"
-    
-    if spouse:
-        tree += f"💍 **sPOUSE:** {spouse.display_name}\n"
-    else:
-        tree += "💍 **sPOUSE:** nONE\n"
-    
-    if children:
-        tree += f"👶 **cHILDREN:** {', '.join([child.display_name for child in children])}\n"
-    else:
-        tree += "👶 **cHILDREN:** nONE\n"
-    
-    if parents:
-        tree += f"👨‍👩‍👧‍👦 **pARENTS:** {', '.join([parent.display_name for parent in parents])}\n"
-    else:
-        tree += "👨‍👩‍👧‍👦 **pARENTS:** nONE\n"
-    
-    await interaction.response.send_message(embed=nova_embed("fAMILY tREE", tree))
+    await interaction.response.send_message(embed=nova_embed("fAMILY tREE", await build_family_tree(interaction.guild, user)))
+
+@bot.command()
+async def lineage(ctx, user: discord.Member = None, depth: int = 5):
+    """Show a user's whole lineage up and down. Usage: ?lineage [@user] [generations]"""
+    user = user or ctx.author
+    depth = max(1, min(depth, MAX_LINEAGE_DEPTH))
+    await ctx.send(embed=nova_embed("lINEAGE", await build_lineage(ctx.guild, user, depth)))
+
+@bot.tree.command(name="lineage", description="Show a user's ancestors and descendants across generations")
+@app_commands.describe(user="The user to check (optional - shows your own)", depth="How many generations to walk (1-10)")
+async def lineage_slash(interaction: discord.Interaction, user: discord.Member = None, depth: int = 5):
+    user = user or interaction.user
+    depth = max(1, min(depth, MAX_LINEAGE_DEPTH))
+    await interaction.response.send_message(embed=nova_embed("lINEAGE", await build_lineage(interaction.guild, user, depth)))
 
 @bot.command()
 async def kiss(ctx, user: discord.Member):
@@ -3227,14 +5241,14 @@ pending_adoptions = {}  # user_id: adopter_id
 @bot.command()
 async def afk(ctx, *, reason: str = "aFK"):
     AFK_STATUS[ctx.author.id] = {"reason": reason, "since": datetime.now(dt_timezone.utc), "mentions": set()}
-    save_afk()  # Save AFK data after setting status
+    mark_dirty("afk", ctx.author.id)
     await ctx.send(embed=nova_embed("aFK", f"{ctx.author.display_name} iS nOW aFK: {reason}"))
 
 @bot.tree.command(name="afk", description="Set your AFK status")
 @app_commands.describe(reason="Reason for being AFK")
 async def afk_slash(interaction: discord.Interaction, reason: str = "aFK"):
     AFK_STATUS[interaction.user.id] = {"reason": reason, "since": datetime.now(dt_timezone.utc), "mentions": set()}
-    save_afk()  # Save AFK data after setting status
+    mark_dirty("afk", interaction.user.id)
     await interaction.response.send_message(embed=nova_embed("aFK", f"{interaction.user.display_name} iS nOW aFK: {reason}"))
 
 @bot.command()
@@ -3264,10 +5278,10 @@ async def reactionadd(ctx, trigger_word: str = None, emoji: str = None):
         AUTO_REACTIONS[guild_id] = {}
     
     AUTO_REACTIONS[guild_id][trigger_word] = emoji
+    invalidate_matchers(guild_id)
     
     # Save to persistence
-    with open("auto_reactions.json", "w") as f:
-        json.dump(AUTO_REACTIONS, f, indent=2)
+    save_auto_reactions()
     
     await ctx.send(embed=nova_embed(
         "✅ rEACTION aDDED!",
@@ -3295,10 +5309,10 @@ async def reactionremove(ctx, trigger_word: str = None):
         # Clean up empty guild entries
         if not AUTO_REACTIONS[guild_id]:
             del AUTO_REACTIONS[guild_id]
+        invalidate_matchers(guild_id)
         
         # Save to persistence
-        with open("auto_reactions.json", "w") as f:
-            json.dump(AUTO_REACTIONS, f, indent=2)
+        save_auto_reactions()
         
         await ctx.send(embed=nova_embed(
             "✅ rEACTION rEMOVED!",
@@ -3316,8 +5330,14 @@ async def reactionremove_slash(interaction: discord.Interaction, trigger_word: s
         return
     
     trigger_word = trigger_word.lower()
-    if trigger_word in AUTO_REACTIONS:
-        removed_emoji = AUTO_REACTIONS.pop(trigger_word)
+    guild_id = str(interaction.guild.id)
+    guild_reactions = AUTO_REACTIONS.get(guild_id, {})
+    if trigger_word in guild_reactions:
+        removed_emoji = guild_reactions.pop(trigger_word)
+        if not guild_reactions:
+            del AUTO_REACTIONS[guild_id]
+        invalidate_matchers(guild_id)
+        save_auto_reactions()
         await interaction.response.send_message(embed=nova_embed(
             "🗑️ rEACTION rEMOVED!",
             f"nOVA wILL nO lONGER rEACT tO '{trigger_word}' (wAS {removed_emoji})"
@@ -3332,11 +5352,12 @@ async def reactionlist(ctx):
         await ctx.send(embed=nova_embed("rEACTION lIST", "yOU dON'T hAVE pERMISSION!"))
         return
     
-    if not AUTO_REACTIONS:
+    guild_reactions = AUTO_REACTIONS.get(str(ctx.guild.id), {})
+    if not guild_reactions:
         await ctx.send(embed=nova_embed("rEACTION lIST", "nO aUTO-rEACTIONS sET uP!"))
         return
     
-    reaction_list = "\n".join([f"**{word}** → {emoji}" for word, emoji in AUTO_REACTIONS.items()])
+    reaction_list = "\n".join([f"**{word}** → {emoji}" for word, emoji in guild_reactions.items()])
     await ctx.send(embed=nova_embed(
         "🎭 aUTO-rEACTIONS",
         f"cURRENT aUTO-rEACTIONS:\n\n{reaction_list}"
@@ -3345,166 +5366,20 @@ async def reactionlist(ctx):
 @bot.command()
 async def messagecount(ctx, member: discord.Member = None):
     """Show message count statistics for a user"""
+    if not ctx.guild:
+        await ctx.send(embed=nova_embed("mESSAGE cOUNT", "tHIS cOMMAND cAN oNLY bE uSED iN sERVERS!"))
+        return
     target = member or ctx.author
-    
-    # Calculate time periods
-    now = datetime.now(dt_timezone.utc)
-    one_month_ago = now - timedelta(days=30)
-    three_months_ago = now - timedelta(days=90)
-    one_year_ago = now - timedelta(days=365)
-    
-    # Initialize counters
-    last_month = 0
-    last_3_months = 0
-    last_year = 0
-    lifetime = 0
-    
-    # Count messages in all text channels the bot can see
-    embed = nova_embed(
-        "📊 mESSAGE cOUNT aNALYSIS",
-        f"aNALYZING mESSAGES fOR {target.display_name}...\n\n⏳ tHIS mAY tAKE a mOMENT..."
-    )
-    status_msg = await ctx.send(embed=embed)
-    
-    try:
-        for channel in ctx.guild.text_channels:
-            if not channel.permissions_for(ctx.guild.me).read_message_history:
-                continue
-            
-            try:
-                async for message in channel.history(limit=None, oldest_first=False):
-                    if message.author.id != target.id:
-                        continue
-                    
-                    lifetime += 1
-                    
-                    if message.created_at >= one_year_ago:
-                        last_year += 1
-                    
-                    if message.created_at >= three_months_ago:
-                        last_3_months += 1
-                    
-                    if message.created_at >= one_month_ago:
-                        last_month += 1
-                    
-                    # Stop if we've gone past a year
-                    if message.created_at < one_year_ago:
-                        break
-                        
-            except discord.Forbidden:
-                continue  # Skip channels we can't read
-            except Exception:
-                continue  # Skip channels with errors
-        
-        # Calculate daily averages
-        daily_last_month = round(last_month / 30, 1) if last_month > 0 else 0
-        daily_last_3_months = round(last_3_months / 90, 1) if last_3_months > 0 else 0
-        daily_last_year = round(last_year / 365, 1) if last_year > 0 else 0
-        
-        # Create final embed
-        embed = nova_embed(
-            "📊 mESSAGE cOUNT sTATISTICS",
-            f"**uSER:** {target.display_name}\n\n"
-            f"📅 **lAST mONTH:** {last_month:,} messages ({daily_last_month}/day avg)\n"
-            f"📅 **lAST 3 mONTHS:** {last_3_months:,} messages ({daily_last_3_months}/day avg)\n"
-            f"📅 **lAST yEAR:** {last_year:,} messages ({daily_last_year}/day avg)\n"
-            f"📅 **lIFETIME:** {lifetime:,} messages\n\n"
-            f"*aNALYZED aLL vISIBLE cHANNELS iN {ctx.guild.name}*"
-        )
-        
-        if target.avatar:
-            embed.set_thumbnail(url=target.avatar.url)
-        
-        await status_msg.edit(embed=embed)
-        
-    except Exception as e:
-        error_embed = nova_embed(
-            "❌ eRROR",
-            f"cOULD nOT aNALYZE mESSAGE cOUNT: {str(e)}"
-        )
-        await status_msg.edit(embed=error_embed)
+    await ctx.send(embed=build_messagecount_embed(ctx.guild, target))
 
 @bot.tree.command(name="messagecount", description="Show message count statistics for a user")
 @app_commands.describe(member="The member to analyze (defaults to yourself)")
 async def messagecount_slash(interaction: discord.Interaction, member: discord.Member = None):
+    if not interaction.guild:
+        await interaction.response.send_message(embed=nova_embed("mESSAGE cOUNT", "tHIS cOMMAND cAN oNLY bE uSED iN sERVERS!"), ephemeral=True)
+        return
     target = member or interaction.user
-    
-    # Calculate time periods
-    now = datetime.now(dt_timezone.utc)
-    one_month_ago = now - timedelta(days=30)
-    three_months_ago = now - timedelta(days=90)
-    one_year_ago = now - timedelta(days=365)
-    
-    # Initialize counters
-    last_month = 0
-    last_3_months = 0
-    last_year = 0
-    lifetime = 0
-    
-    # Count messages in all text channels the bot can see
-    embed = nova_embed(
-        "📊 mESSAGE cOUNT aNALYSIS",
-        f"aNALYZING mESSAGES fOR {target.display_name}...\n\n⏳ tHIS mAY tAKE a mOMENT..."
-    )
-    await interaction.response.send_message(embed=embed)
-    
-    try:
-        for channel in interaction.guild.text_channels:
-            if not channel.permissions_for(interaction.guild.me).read_message_history:
-                continue
-            
-            try:
-                async for message in channel.history(limit=None, oldest_first=False):
-                    if message.author.id != target.id:
-                        continue
-                    
-                    lifetime += 1
-                    
-                    if message.created_at >= one_year_ago:
-                        last_year += 1
-                    
-                    if message.created_at >= three_months_ago:
-                        last_3_months += 1
-                    
-                    if message.created_at >= one_month_ago:
-                        last_month += 1
-                    
-                    # Stop if we've gone past a year
-                    if message.created_at < one_year_ago:
-                        break
-                        
-            except discord.Forbidden:
-                continue  # Skip channels we can't read
-            except Exception:
-                continue  # Skip channels with errors
-        
-        # Calculate daily averages
-        daily_last_month = round(last_month / 30, 1) if last_month > 0 else 0
-        daily_last_3_months = round(last_3_months / 90, 1) if last_3_months > 0 else 0
-        daily_last_year = round(last_year / 365, 1) if last_year > 0 else 0
-        
-        # Create final embed
-        embed = nova_embed(
-            "📊 mESSAGE cOUNT sTATISTICS",
-            f"**uSER:** {target.display_name}\n\n"
-            f"📅 **lAST mONTH:** {last_month:,} messages ({daily_last_month}/day avg)\n"
-            f"📅 **lAST 3 mONTHS:** {last_3_months:,} messages ({daily_last_3_months}/day avg)\n"
-            f"📅 **lAST yEAR:** {last_year:,} messages ({daily_last_year}/day avg)\n"
-            f"📅 **lIFETIME:** {lifetime:,} messages\n\n"
-            f"*aNALYZED aLL vISIBLE cHANNELS iN {interaction.guild.name}*"
-        )
-        
-        if target.avatar:
-            embed.set_thumbnail(url=target.avatar.url)
-        
-        await interaction.edit_original_response(embed=embed)
-        
-    except Exception as e:
-        error_embed = nova_embed(
-            "❌ eRROR",
-            f"cOULD nOT aNALYZE mESSAGE cOUNT: {str(e)}"
-        )
-        await interaction.edit_original_response(embed=error_embed)
+    await interaction.response.send_message(embed=build_messagecount_embed(interaction.guild, target))
 
 @bot.command()
 async def disable(ctx, command_name: str = None):
@@ -3698,9 +5573,9 @@ async def case(ctx, member: discord.Member = None):
         await ctx.send(embed=nova_embed("cASE", "pLEASE sPECIFY a mEMBER!"))
         return
     
-    user_id = str(member.id)
+    infractions = await get_infractions(ctx.guild.id, member.id)
     
-    if user_id not in INFRACTIONS or not INFRACTIONS[user_id]:
+    if not infractions:
         embed = nova_embed(
             f"📋 cASE fILE: {member.display_name}",
             "nO iNFRACTIONS oN rECORD! 🎉"
@@ -3709,7 +5584,6 @@ async def case(ctx, member: discord.Member = None):
         await ctx.send(embed=embed)
         return
     
-    infractions = INFRACTIONS[user_id]
     infraction_list = []
     
     for i, infraction in enumerate(infractions[-10:], 1):  # Show last 10
@@ -3816,11 +5690,9 @@ async def pay(ctx, user: discord.Member, amount: int):
     if amount <= 0:
         await ctx.send(embed=nova_embed("pAY", "aMOUNT mUST bE pOSITIVE!"))
         return
-    if get_balance(ctx.author.id) < amount:
+    if not await transfer(ctx.guild.id, [(ctx.author.id, -amount), (user.id, amount)], "pay"):
         await ctx.send(embed=nova_embed("pAY", "nOT eNOUGH dOLLARIANAS!"))
         return
-    change_balance(ctx.author.id, -amount)
-    change_balance(user.id, amount)
     await ctx.send(embed=nova_embed("pAY", f"{ctx.author.display_name} sENT {amount} {CURRENCY_NAME} tO {user.display_name}!"))
 
 @bot.tree.command(name="pay", description="Send currency to another user")
@@ -3829,11 +5701,9 @@ async def pay_slash(interaction: discord.Interaction, user: discord.Member, amou
     if amount <= 0:
         await interaction.response.send_message(embed=nova_embed("pAY", "aMOUNT mUST bE pOSITIVE!"), ephemeral=True)
         return
-    if get_balance(interaction.user.id) < amount:
+    if not await transfer(interaction.guild.id, [(interaction.user.id, -amount), (user.id, amount)], "pay"):
         await interaction.response.send_message(embed=nova_embed("pAY", "nOT eNOUGH dOLLARIANAS!"), ephemeral=True)
         return
-    change_balance(interaction.user.id, -amount)
-    change_balance(user.id, amount)
     await interaction.response.send_message(embed=nova_embed("pAY", f"{interaction.user.display_name} sENT {amount} {CURRENCY_NAME} tO {user.display_name}!"))
 
 @bot.command()
@@ -3854,15 +5724,10 @@ async def buy(ctx, *, item: str):
         await ctx.send(embed=nova_embed("bUY", "iTEM nOT fOUND iN tHE sHOP!"))
         return
     price = SHOP_ITEMS[matched]
-    if get_balance(ctx.author.id) < price:
+    if not await transfer(ctx.guild.id, [(ctx.author.id, -price)], f"buy {matched}"):
         await ctx.send(embed=nova_embed("bUY", "nOT eNOUGH dOLLARIANAS!"))
         return
-    change_balance(ctx.author.id, -price)
-    inventory = load_inventory()
-    user_inv = inventory.get(str(ctx.author.id), [])
-    user_inv.append(matched)
-    inventory[str(ctx.author.id)] = user_inv
-    save_inventory(inventory)
+    await add_inventory_item(ctx.guild.id, ctx.author.id, matched)
     await ctx.send(embed=nova_embed("bUY", f"yOU bOUGHT: {matched} fOR {price} {CURRENCY_NAME}!"))
 
 @bot.tree.command(name="buy", description="Purchase an item from the shop")
@@ -3874,21 +5739,15 @@ async def buy_slash(interaction: discord.Interaction, item: str):
         await interaction.response.send_message(embed=nova_embed("bUY", "iTEM nOT fOUND iN tHE sHOP!"), ephemeral=True)
         return
     price = SHOP_ITEMS[matched]
-    if get_balance(interaction.user.id) < price:
+    if not await transfer(interaction.guild.id, [(interaction.user.id, -price)], f"buy {matched}"):
         await interaction.response.send_message(embed=nova_embed("bUY", "nOT eNOUGH dOLLARIANAS!"), ephemeral=True)
         return
-    change_balance(interaction.user.id, -price)
-    inventory = load_inventory()
-    user_inv = inventory.get(str(interaction.user.id), [])
-    user_inv.append(matched)
-    inventory[str(interaction.user.id)] = user_inv
-    save_inventory(inventory)
+    await add_inventory_item(interaction.guild.id, interaction.user.id, matched)
     await interaction.response.send_message(embed=nova_embed("bUY", f"yOU bOUGHT: {matched} fOR {price} {CURRENCY_NAME}!"))
 
 @bot.command()
 async def inventory(ctx):
-    inventory = load_inventory()
-    user_inv = inventory.get(str(ctx.author.id), [])
+    user_inv = await get_inventory(ctx.guild.id, ctx.author.id)
     if not user_inv:
         await ctx.send(embed=nova_embed("iNVENTORY", "yOU dON'T oWN aNY iTEMS!"))
         return
@@ -3897,8 +5756,7 @@ async def inventory(ctx):
 
 @bot.tree.command(name="inventory", description="Show items you own")
 async def inventory_slash(interaction: discord.Interaction):
-    inventory = load_inventory()
-    user_inv = inventory.get(str(interaction.user.id), [])
+    user_inv = await get_inventory(interaction.guild.id, interaction.user.id)
     if not user_inv:
         await interaction.response.send_message(embed=nova_embed("iNVENTORY", "yOU dON'T oWN aNY iTEMS!"), ephemeral=True)
         return
@@ -3933,20 +5791,7 @@ async def votekick(ctx, user: discord.Member):
     msg = await ctx.send(embed=embed)
     await msg.add_reaction("✅")
     await msg.add_reaction("❌")
-    await asyncio.sleep(15)
-    msg = await ctx.channel.fetch_message(msg.id)
-    yes = 0
-    no = 0
-    for reaction in msg.reactions:
-        if str(reaction.emoji) == "✅":
-            yes = reaction.count - 1  # exclude bot
-        elif str(reaction.emoji) == "❌":
-            no = reaction.count - 1
-    if yes > no:
-        result = f"{user.mention} wAS (nOT rEALLY) kICKED! "
-    else:
-        result = f"{user.mention} sTAYS... fOR nOW! "
-    await ctx.send(embed=nova_embed("vOTEKICK rESULT", result))
+    schedule_job("votekick", time.time() + 15, {"channel_id": ctx.channel.id, "message_id": msg.id, "user_id": user.id})
 
 @bot.tree.command(name="votekick", description="Start a fake vote to kick someone (fun only)")
 @app_commands.describe(user="The user to (fake) kick")
@@ -3956,20 +5801,29 @@ async def votekick_slash(interaction: discord.Interaction, user: discord.Member)
     await msg.add_reaction("✅")
     await msg.add_reaction("❌")
     await interaction.response.send_message(embed=nova_embed("vOTEKICK", f"vOTE sTARTED fOR {user.mention}!"), ephemeral=True)
-    await asyncio.sleep(15)
-    msg = await interaction.channel.fetch_message(msg.id)
+    schedule_job("votekick", time.time() + 15, {"channel_id": interaction.channel.id, "message_id": msg.id, "user_id": user.id})
+
+async def finish_votekick(payload):
+    """Count the votes on a votekick message and announce the (fake) result."""
+    channel = bot.get_channel(payload["channel_id"])
+    if channel is None:
+        return
+    msg = await channel.fetch_message(payload["message_id"])
     yes = 0
     no = 0
     for reaction in msg.reactions:
         if str(reaction.emoji) == "✅":
-            yes = reaction.count - 1
+            yes = reaction.count - 1  # exclude bot
         elif str(reaction.emoji) == "❌":
             no = reaction.count - 1
+    mention = f"<@{payload['user_id']}>"
     if yes > no:
-        result = f"{user.mention} wAS (nOT rEALLY) kICKED! "
+        result = f"{mention} wAS (nOT rEALLY) kICKED! "
     else:
-        result = f"{user.mention} sTAYS... fOR nOW! "
-    await interaction.channel.send(embed=nova_embed("vOTEKICK rESULT", result))
+        result = f"{mention} sTAYS... fOR nOW! "
+    await channel.send(embed=nova_embed("vOTEKICK rESULT", result))
+
+JOB_HANDLERS["votekick"] = finish_votekick
 
 @bot.command()
 async def explode(ctx):
@@ -4012,8 +5866,7 @@ async def settimezone(ctx, *, timezone: str):
 async def birthday(ctx, user: discord.Member = None):
     """Show a user's birthday. Usage: ?birthday [@user]"""
     user = user or ctx.author
-    birthdays = load_birthdays()
-    bday = birthdays.get(str(user.id))
+    bday = await get_birthday(user.id)
     if bday:
         formatted_bday = format_birthday(bday)
         await ctx.send(embed=nova_embed("🎂 bIRTHDAY", f"{user.display_name}'s birthday is {formatted_bday}!"))
@@ -4043,9 +5896,7 @@ async def setbday(ctx, date: str = None):
     except Exception:
         await ctx.send(embed=nova_embed("🎂 sET bIRTHDAY", "Please use the format DD-MM, e.g. 15-04 for April 15th."))
         return
-    birthdays = load_birthdays()
-    birthdays[str(ctx.author.id)] = date
-    save_birthdays(birthdays)
+    await set_birthday(ctx.author.id, date)
     formatted_date = format_birthday(date)
     await ctx.send(embed=nova_embed("🎂 sET bIRTHDAY", f"Birthday set to {formatted_date}!"))
 
@@ -4063,13 +5914,10 @@ async def setbirthday(ctx, date: str = None):
 @bot.command()
 async def birthdays(ctx):
     """List all birthdays in the server."""
-    birthdays = load_birthdays()
-    if not birthdays:
-        await ctx.send(embed=nova_embed("🎂 bIRTHDAYS", "No birthdays set yet!"))
-        return
+    birthdays = await get_member_birthdays(ctx.guild)
     lines = []
     for user_id, date in birthdays.items():
-        member = ctx.guild.get_member(int(user_id))
+        member = ctx.guild.get_member(user_id)
         if member:
             formatted_date = format_birthday(date)
             lines.append(f"{member.display_name}: {formatted_date}")
@@ -4083,8 +5931,7 @@ async def birthdays(ctx):
 @app_commands.describe(user="The user to check (optional)")
 async def birthday_slash(interaction: discord.Interaction, user: discord.Member = None):
     user = user or interaction.user
-    birthdays = load_birthdays()
-    bday = birthdays.get(str(user.id))
+    bday = await get_birthday(user.id)
     if bday:
         formatted_bday = format_birthday(bday)
         await interaction.response.send_message(embed=nova_embed("🎂 bIRTHDAY", f"{user.display_name}'s birthday is {formatted_bday}!"))
@@ -4103,9 +5950,7 @@ async def setbirthday_slash(interaction: discord.Interaction, date: str):
     except Exception:
         await interaction.response.send_message(embed=nova_embed("🎂 sET bIRTHDAY", "Please use the format DD-MM, e.g. 15-04 for April 15th."), ephemeral=True)
         return
-    birthdays = load_birthdays()
-    birthdays[str(interaction.user.id)] = date
-    save_birthdays(birthdays)
+    await set_birthday(interaction.user.id, date)
     await interaction.response.send_message(embed=nova_embed("🎂 sET bIRTHDAY", f"Birthday set to {date}!"))
 
 @bot.command()
@@ -4141,17 +5986,11 @@ async def setaboutme_slash(interaction: discord.Interaction, description: str):
         await interaction.response.send_message(embed=nova_embed("📝 sET aBOUT mE", "Description too long! Maximum 500 characters."), ephemeral=True)
         return
     
-    profiles = load_profiles()
-    
     # Get old about me for logging
-    old_profile = profiles.get(str(interaction.user.id))
+    old_profile = await get_profile(interaction.user.id)
     old_about_me = old_profile.get("about_me", "None") if old_profile else "None"
     
-    profiles[str(interaction.user.id)] = {
-        "about_me": description,
-        "set_date": datetime.now().isoformat()
-    }
-    save_profiles(profiles)
+    await set_profile(interaction.user.id, description)
     
     # Log to server logs channel
     print(f"DEBUG: About me logging - SERVER_LOGS_CHANNEL_ID = {SERVER_LOGS_CHANNEL_ID}")
@@ -4184,9 +6023,7 @@ async def setaboutme_slash(interaction: discord.Interaction, description: str):
 @app_commands.describe(user="The user to check (optional)")
 async def aboutme_slash(interaction: discord.Interaction, user: discord.Member = None):
     target_user = user or interaction.user
-    profiles = load_profiles()
-    
-    user_profile = profiles.get(str(target_user.id))
+    user_profile = await get_profile(target_user.id)
     if not user_profile or "about_me" not in user_profile:
         if target_user == interaction.user:
             await interaction.response.send_message(embed=nova_embed("📝 aBOUT mE", "You haven't set an about me yet! Use /setaboutme to set one."), ephemeral=True)
@@ -4327,14 +6164,10 @@ async def remindme(ctx, time: str, *, message: str):
     if seconds is None or seconds <= 0:
         await ctx.send(embed=nova_embed("rEMINDER", "iNVALID tIME! uSE s, m, h, oR d (e.g. 10m, 2h)"))
         return
-    reminders = load_reminders()
-    user_reminders = reminders.get(str(ctx.author.id), {})
-    reminder_id = str(len(user_reminders) + 1)
-    user_reminders[reminder_id] = {"message": message, "time": int(asyncio.get_event_loop().time()) + seconds}
-    reminders[str(ctx.author.id)] = user_reminders
-    save_reminders(reminders)
+    due_at = datetime.now(dt_timezone.utc).timestamp() + seconds
+    reminder_id = add_reminder(ctx.author.id, message, due_at)
     await ctx.send(embed=nova_embed("rEMINDER sET", f"i'LL rEMIND yOU iN {time}: {message}"))
-    bot.loop.create_task(reminder_task(ctx.author.id, reminder_id, seconds, message))
+    schedule_job("reminder", due_at, {"reminder_id": reminder_id})
 
 @bot.tree.command(name="remindme", description="Set a reminder to ping you later")
 @app_commands.describe(time="Time (e.g. 10m, 2h, 1d)", message="Reminder message")
@@ -4343,26 +6176,21 @@ async def remindme_slash(interaction: discord.Interaction, time: str, message: s
     if seconds is None or seconds <= 0:
         await interaction.response.send_message(embed=nova_embed("rEMINDER", "iNVALID tIME! uSE s, m, h, oR d (e.g. 10m, 2h)"), ephemeral=True)
         return
-    reminders = load_reminders()
-    user_reminders = reminders.get(str(interaction.user.id), {})
-    reminder_id = str(len(user_reminders) + 1)
-    user_reminders[reminder_id] = {"message": message, "time": int(asyncio.get_event_loop().time()) + seconds}
-    reminders[str(interaction.user.id)] = user_reminders
-    save_reminders(reminders)
+    due_at = datetime.now(dt_timezone.utc).timestamp() + seconds
+    reminder_id = add_reminder(interaction.user.id, message, due_at)
     await interaction.response.send_message(embed=nova_embed("rEMINDER sET", f"i'LL rEMIND yOU iN {time}: {message}"), ephemeral=True)
-    bot.loop.create_task(reminder_task(interaction.user.id, reminder_id, seconds, message))
+    schedule_job("reminder", due_at, {"reminder_id": reminder_id})
 
 @bot.command()
 async def reminderlist(ctx):
-    reminders = load_reminders()
-    user_reminders = reminders.get(str(ctx.author.id), {})
+    user_reminders = get_reminders(ctx.author.id)
     if not user_reminders:
         await ctx.send(embed=nova_embed("rEMINDERS", "nO aCTIVE rEMINDERS!"))
         return
     lines = []
-    now = int(asyncio.get_event_loop().time())
-    for rid, data in user_reminders.items():
-        left = max(0, data["time"] - now)
+    now = datetime.now(dt_timezone.utc).timestamp()
+    for data in user_reminders:
+        left = max(0, data["due_at"] - now)
         mins, secs = divmod(left, 60)
         hours, mins = divmod(mins, 60)
         if hours:
@@ -4376,15 +6204,14 @@ async def reminderlist(ctx):
 
 @bot.tree.command(name="reminderlist", description="List your active reminders")
 async def reminderlist_slash(interaction: discord.Interaction):
-    reminders = load_reminders()
-    user_reminders = reminders.get(str(interaction.user.id), {})
+    user_reminders = get_reminders(interaction.user.id)
     if not user_reminders:
         await interaction.response.send_message(embed=nova_embed("rEMINDERS", "nO aCTIVE rEMINDERS!"), ephemeral=True)
         return
     lines = []
-    now = int(asyncio.get_event_loop().time())
-    for rid, data in user_reminders.items():
-        left = max(0, data["time"] - now)
+    now = datetime.now(dt_timezone.utc).timestamp()
+    for data in user_reminders:
+        left = max(0, data["due_at"] - now)
         mins, secs = divmod(left, 60)
         hours, mins = divmod(mins, 60)
         if hours:
@@ -4749,23 +6576,11 @@ async def runway(ctx, message_id: int = None):
         if not runway_channel:
             await ctx.send(embed=nova_embed("rUNWAY", "cOULD nOT fIND tHE rUNWAY cHANNEL!"))
             return
+        if message.id in RUNWAY_POSTS:
+            await ctx.send(embed=nova_embed("rUNWAY", "tHAT mESSAGE iS aLREADY oN tHE rUNWAY!"))
+            return
         
-        # Create runway embed with crying emoji and message number
-        embed = nova_embed("😢 #" + str(message.id), message.content)
-        embed.set_author(name=message.author.display_name, icon_url=message.author.avatar.url if message.author.avatar else None)
-        embed.add_field(name="oRIGINAL cHANNEL", value=ctx.channel.mention, inline=True)
-        embed.set_footer(text=f"Message ID: {message.id}")
-        
-        # Send attachments separately if any
-        files = []
-        for attachment in message.attachments:
-            try:
-                file_data = await attachment.read()
-                files.append(discord.File(io.BytesIO(file_data), filename=attachment.filename))
-            except Exception:
-                continue
-        
-        await runway_channel.send(embed=embed, files=files)
+        await post_to_runway(message, runway_channel, reaction_count(message, RUNWAY_EMOJI))
         await ctx.send(embed=nova_embed("rUNWAY", f"mESSAGE tRANSFERRED tO {runway_channel.mention}!"))
         
     except Exception as e:
@@ -4805,23 +6620,11 @@ async def runway_slash(interaction: discord.Interaction, message_id: int = None)
         if not runway_channel:
             await interaction.response.send_message(embed=nova_embed("rUNWAY", "cOULD nOT fIND tHE rUNWAY cHANNEL!"), ephemeral=True)
             return
+        if message.id in RUNWAY_POSTS:
+            await interaction.response.send_message(embed=nova_embed("rUNWAY", "tHAT mESSAGE iS aLREADY oN tHE rUNWAY!"), ephemeral=True)
+            return
         
-        # Create runway embed with crying emoji and message number
-        embed = nova_embed("😢 #" + str(message.id), message.content)
-        embed.set_author(name=message.author.display_name, icon_url=message.author.avatar.url if message.author.avatar else None)
-        embed.add_field(name="oRIGINAL cHANNEL", value=interaction.channel.mention, inline=True)
-        embed.set_footer(text=f"Message ID: {message.id}")
-        
-        # Send attachments separately if any
-        files = []
-        for attachment in message.attachments:
-            try:
-                file_data = await attachment.read()
-                files.append(discord.File(io.BytesIO(file_data), filename=attachment.filename))
-            except Exception:
-                continue
-        
-        await runway_channel.send(embed=embed, files=files)
+        await post_to_runway(message, runway_channel, reaction_count(message, RUNWAY_EMOJI))
         await interaction.response.send_message(embed=nova_embed("rUNWAY", f"mESSAGE tRANSFERRED tO {runway_channel.mention}!"), ephemeral=True)
         
     except Exception as e:
@@ -4850,27 +6653,158 @@ async def generate(ctx, *, prompt: str):
 
 # Helper functions for relationships
 
-def load_relationships():
-    try:
-        with open(RELATIONSHIPS_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+# Relationship graph. Each user has at most one outgoing edge per kind:
+#   ("married", proposer) -> spouse
+#   ("parent", child) -> parent
+# Edges live only in the relationships table. Its primary key answers spouse and parent lookups and
+# idx_relationships_other the reverse ones (children, the spouse who was proposed to). Relationships
+# follow the person across servers, so they stay under GLOBAL_SCOPE.
+MAX_LINEAGE_DEPTH = 10  # Hard cap on generations walked by lineage queries
+
+def _relationship(conn, kind, user_id):
+    row = conn.execute(
+        "SELECT other_id FROM relationships WHERE guild_id = ? AND kind = ? AND user_id = ?",
+        (GLOBAL_SCOPE, kind, user_id)
+    ).fetchone()
+    return row["other_id"] if row else None
+
+def _relationship_sources(conn, kind, other_id):
+    rows = conn.execute(
+        "SELECT user_id FROM relationships WHERE guild_id = ? AND kind = ? AND other_id = ? ORDER BY user_id",
+        (GLOBAL_SCOPE, kind, other_id)
+    )
+    return [row["user_id"] for row in rows]
+
+def _spouse(conn, user_id):
+    spouse_id = _relationship(conn, "married", user_id)
+    if spouse_id is None:
+        proposers = _relationship_sources(conn, "married", user_id)
+        spouse_id = proposers[0] if proposers else None
+    return spouse_id
+
+def _remove_spouse(user_id):
+    conn = get_db()
+    with conn:
+        spouse_id = _spouse(conn, user_id)
+        if spouse_id is not None:
+            conn.execute(
+                "DELETE FROM relationships WHERE guild_id = ? AND kind = 'married' AND user_id IN (?, ?)",
+                (GLOBAL_SCOPE, user_id, spouse_id)
+            )
+    return spouse_id
+
+def _ancestors(user_id, max_depth):
+    conn = get_db()
+    ancestors = []
+    seen = {user_id}
+    current = user_id
+    for generation in range(1, max_depth + 1):
+        current = _relationship(conn, "parent", current)
+        if current is None or current in seen:
+            break
+        seen.add(current)
+        ancestors.append((generation, current))
+    return ancestors
+
+def _descendants(user_id, max_depth):
+    conn = get_db()
+    descendants = []
+    seen = {user_id}
+    frontier = [user_id]
+    for generation in range(1, max_depth + 1):
+        next_frontier = []
+        for member_id in frontier:
+            for child_id in _relationship_sources(conn, "parent", member_id):
+                if child_id not in seen:
+                    seen.add(child_id)
+                    next_frontier.append(child_id)
+                    descendants.append((generation, child_id))
+        if not next_frontier:
+            break
+        frontier = next_frontier
+    return descendants
+
+async def set_relationship(kind, user_id, other_id):
+    await db_execute(
+        "INSERT OR REPLACE INTO relationships (guild_id, kind, user_id, other_id) VALUES (?, ?, ?, ?)",
+        (GLOBAL_SCOPE, kind, user_id, other_id)
+    )
+
+async def delete_relationship(kind, user_id):
+    await db_execute(
+        "DELETE FROM relationships WHERE guild_id = ? AND kind = ? AND user_id = ?",
+        (GLOBAL_SCOPE, kind, user_id)
+    )
+
+async def get_spouse(user_id):
+    """Return the spouse's user ID whichever side proposed, or None."""
+    return await run_storage(lambda: _spouse(get_db(), user_id))
+
+async def remove_spouse(user_id):
+    return await run_storage(_remove_spouse, user_id)
+
+async def get_parent(user_id):
+    return await run_storage(lambda: _relationship(get_db(), "parent", user_id))
+
+async def get_ancestors(user_id, max_depth=MAX_LINEAGE_DEPTH):
+    """Return [(generation, user_id)] walking up from parent to grandparent and so on.
+
+    Stops at max_depth or on reaching someone already seen, so a corrupt cycle can't loop forever.
+    The whole walk is one job on the storage thread, one primary key lookup per generation.
+    """
+    return await run_storage(_ancestors, user_id, max_depth)
 
-def save_relationships(relationships):
-    with open(RELATIONSHIPS_FILE, "w") as f:
-        json.dump(relationships, f)
+async def get_descendants(user_id, max_depth=MAX_LINEAGE_DEPTH):
+    """Return [(generation, user_id)] breadth first: children, then grandchildren, down to max_depth."""
+    return await run_storage(_descendants, user_id, max_depth)
+
+async def is_ancestor(ancestor_id, user_id):
+    """True if ancestor_id appears anywhere above user_id in the family tree."""
+    return any(member_id == ancestor_id for _, member_id in await get_ancestors(user_id))
+
+REMINDERS = {}  # reminder_id: {"user_id": int, "message": str, "due_at": unix time}; only pending ones, each is deleted once sent
+next_reminder_id = 1
 
 def load_reminders():
-    try:
-        with open(REMINDERS_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+    """Load pending reminders from the database into the REMINDERS cache."""
+    global REMINDERS, next_reminder_id
+    rows = get_db().execute("SELECT id, user_id, message, due_at FROM reminders WHERE guild_id = ?", (GLOBAL_SCOPE,))
+    REMINDERS = {row["id"]: {"user_id": row["user_id"], "message": row["message"], "due_at": row["due_at"]} for row in rows}
+    next_reminder_id = max(REMINDERS, default=0) + 1
+
+def write_reminder_rows(conn, keys):
+    for reminder_id in _keys_to_write(conn, "reminders", keys, lambda: list(REMINDERS)):
+        reminder = REMINDERS.get(reminder_id)
+        if reminder is None:
+            conn.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO reminders (id, guild_id, user_id, message, due_at) VALUES (?, ?, ?, ?, ?)",
+                (reminder_id, GLOBAL_SCOPE, reminder["user_id"], reminder["message"], reminder["due_at"])
+            )
 
-def save_reminders(reminders):
-    with open(REMINDERS_FILE, "w") as f:
-        json.dump(reminders, f)
+register_table_store("reminders", write_reminder_rows)
+
+def get_reminders(user_id):
+    """Return a user's pending reminders as dicts with id, message and due_at (unix time)."""
+    user_reminders = [
+        {"id": reminder_id, "message": r["message"], "due_at": r["due_at"]}
+        for reminder_id, r in REMINDERS.items() if r["user_id"] == user_id
+    ]
+    return sorted(user_reminders, key=lambda r: r["due_at"])
+
+def add_reminder(user_id, message, due_at):
+    """Store a reminder and return its ID."""
+    global next_reminder_id
+    reminder_id = next_reminder_id
+    next_reminder_id += 1
+    REMINDERS[reminder_id] = {"user_id": user_id, "message": message, "due_at": due_at}
+    mark_dirty("reminders", reminder_id)
+    return reminder_id
+
+def delete_reminder(reminder_id):
+    if REMINDERS.pop(reminder_id, None) is not None:
+        mark_dirty("reminders", reminder_id)
 
 def parse_time(timestr):
     match = re.match(r"(\d+)([smhd])", timestr.lower())
@@ -4883,20 +6817,24 @@ def parse_time(timestr):
     if unit == 'd': return num * 86400
     return None
 
-async def reminder_task(user_id, reminder_id, seconds, message):
-    await asyncio.sleep(seconds)
-    user = await bot.fetch_user(int(user_id))
-    embed = nova_embed("rEMINDER!", f"⏰ {message}")
+async def send_reminder(payload):
+    reminder = REMINDERS.get(payload["reminder_id"])
+    if reminder is None:
+        return
+    try:
+        user = await bot.fetch_user(int(reminder["user_id"]))
+    except discord.NotFound:
+        # The account is gone, so retrying can't help
+        delete_reminder(payload["reminder_id"])
+        return
+    embed = nova_embed("rEMINDER!", f"⏰ {reminder['message']}")
     try:
         await user.send(embed=embed)
-    except Exception:
-        pass
-    reminders = load_reminders()
-    user_reminders = reminders.get(str(user_id), {})
-    if reminder_id in user_reminders:
-        del user_reminders[reminder_id]
-        reminders[str(user_id)] = user_reminders
-        save_reminders(reminders)
+    except discord.Forbidden:
+        pass  # DMs are closed; retrying can't help
+    delete_reminder(payload["reminder_id"])
+
+JOB_HANDLERS["reminder"] = send_reminder
 
 CONFESS_CHANNEL_ID = 1391874227774165132
 
@@ -4946,29 +6884,70 @@ SHOP_ITEMS = {
     "rING a uSER": 2000,
     "cUSTOMIZE nOVA'S bIO (24h)": 10000
 }
-INVENTORY_FILE = "inventory.json"
-
-def load_inventory():
-    try:
-        with open(INVENTORY_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-
-def save_inventory(inventory):
-    with open(INVENTORY_FILE, "w") as f:
-        json.dump(inventory, f)
-
-def load_thrift():
-    try:
-        with open(THRIFT_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+# Items are bought with a server's balance, so inventories and thrift listings are per server like
+# balances. Both are read from the database per command through their (guild_id, ...) indexes.
+
+async def get_inventory(guild_id, user_id):
+    """Return the items a user owns in a server, oldest first."""
+    rows = await db_fetchall("SELECT item FROM inventory WHERE guild_id = ? AND user_id = ? ORDER BY id", (guild_id, user_id))
+    return [row["item"] for row in rows]
+
+async def add_inventory_item(guild_id, user_id, item):
+    await db_execute("INSERT INTO inventory (guild_id, user_id, item) VALUES (?, ?, ?)", (guild_id, user_id, item))
+
+async def get_thrift_listings(guild_id):
+    """Return a server's thrift listings in listing order as dicts with id, item, price and seller."""
+    rows = await db_fetchall(
+        "SELECT id, item, price, seller_id AS seller FROM thrift WHERE guild_id = ? ORDER BY id",
+        (guild_id,)
+    )
+    return [dict(row) for row in rows]
 
-def save_thrift(thrift):
-    with open(THRIFT_FILE, "w") as f:
-        json.dump(thrift, f)
+async def get_thrift_listing(guild_id, position):
+    """Return the listing shown at a 1-based position in a server's thrift store, or None."""
+    if position < 1:
+        return None
+    row = await db_fetchone(
+        "SELECT id, item, price, seller_id AS seller FROM thrift WHERE guild_id = ? ORDER BY id LIMIT 1 OFFSET ?",
+        (guild_id, position - 1)
+    )
+    return dict(row) if row else None
+
+def _list_thrift_item(guild_id, seller_id, item, price):
+    conn = get_db()
+    with conn:
+        row = conn.execute(
+            "SELECT id FROM inventory WHERE guild_id = ? AND user_id = ? AND item = ? ORDER BY id LIMIT 1",
+            (guild_id, seller_id, item)
+        ).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM inventory WHERE id = ?", (row["id"],))
+        conn.execute(
+            "INSERT INTO thrift (guild_id, seller_id, item, price) VALUES (?, ?, ?, ?)",
+            (guild_id, seller_id, item, price)
+        )
+    return True
+
+async def list_thrift_item(guild_id, seller_id, item, price):
+    """Move one copy of item from the seller's inventory into the thrift store in one transaction. False if they no longer have it."""
+    return await run_storage(_list_thrift_item, guild_id, seller_id, item, price)
+
+def _take_thrift_listing(listing_id):
+    conn = get_db()
+    with conn:
+        return conn.execute("DELETE FROM thrift WHERE id = ?", (listing_id,)).rowcount == 1
+
+async def take_thrift_listing(listing_id):
+    """Remove a listing for a buyer. False if another buyer got to it first."""
+    return await run_storage(_take_thrift_listing, listing_id)
+
+async def restore_thrift_listing(guild_id, listing):
+    """Put back a listing whose buyer couldn't pay, at its old place in the store."""
+    await db_execute(
+        "INSERT INTO thrift (id, guild_id, seller_id, item, price) VALUES (?, ?, ?, ?, ?)",
+        (listing["id"], guild_id, listing["seller"], listing["item"], listing["price"])
+    )
 
 @bot.command()
 async def sell(ctx, item: str, price: int):
@@ -4976,18 +6955,11 @@ async def sell(ctx, item: str, price: int):
     if price <= 0:
         await ctx.send(embed=nova_embed("sELL", "pRICE mUST bE pOSITIVE!"))
         return
-    inventory = load_inventory()
-    user_inv = inventory.get(str(ctx.author.id), [])
+    user_inv = await get_inventory(ctx.guild.id, ctx.author.id)
     matched = next((i for i in user_inv if i.lower() == item.lower()), None)
-    if not matched:
+    if not matched or not await list_thrift_item(ctx.guild.id, ctx.author.id, matched, price):
         await ctx.send(embed=nova_embed("sELL", "yOU dON'T oWN tHAT iTEM!"))
         return
-    user_inv.remove(matched)
-    inventory[str(ctx.author.id)] = user_inv
-    save_inventory(inventory)
-    thrift = load_thrift()
-    thrift.append({"item": matched, "price": price, "seller": ctx.author.id})
-    save_thrift(thrift)
     await ctx.send(embed=nova_embed("sELL", f"yOU lISTED {matched} fOR sALE aT {price} {CURRENCY_NAME} iN tHE tHRIFT sTORE!"))
 
 @bot.tree.command(name="sell", description="Sell an item from your inventory at a custom price")
@@ -4997,23 +6969,16 @@ async def sell_slash(interaction: discord.Interaction, item: str, price: int):
     if price <= 0:
         await interaction.response.send_message(embed=nova_embed("sELL", "pRICE mUST bE pOSITIVE!"), ephemeral=True)
         return
-    inventory = load_inventory()
-    user_inv = inventory.get(str(interaction.user.id), [])
+    user_inv = await get_inventory(interaction.guild.id, interaction.user.id)
     matched = next((i for i in user_inv if i.lower() == item.lower()), None)
-    if not matched:
+    if not matched or not await list_thrift_item(interaction.guild.id, interaction.user.id, matched, price):
         await interaction.response.send_message(embed=nova_embed("sELL", "yOU dON'T oWN tHAT iTEM!"), ephemeral=True)
         return
-    user_inv.remove(matched)
-    inventory[str(interaction.user.id)] = user_inv
-    save_inventory(inventory)
-    thrift = load_thrift()
-    thrift.append({"item": matched, "price": price, "seller": interaction.user.id})
-    save_thrift(thrift)
     await interaction.response.send_message(embed=nova_embed("sELL", f"yOU lISTED {matched} fOR sALE aT {price} {CURRENCY_NAME} iN tHE tHRIFT sTORE!"))
 
 @bot.command()
 async def thrift(ctx):
-    thrift = load_thrift()
+    thrift = await get_thrift_listings(ctx.guild.id)
     if not thrift:
         await ctx.send(embed=nova_embed("tHRIFT sTORE", "nO iTEMS fOR sALE rIGHT nOW!"))
         return
@@ -5026,7 +6991,7 @@ async def thrift(ctx):
 
 @bot.tree.command(name="thrift", description="Show the thrift store (member sales)")
 async def thrift_slash(interaction: discord.Interaction):
-    thrift = load_thrift()
+    thrift = await get_thrift_listings(interaction.guild.id)
     if not thrift:
         await interaction.response.send_message(embed=nova_embed("tHRIFT sTORE", "nO iTEMS fOR sALE rIGHT nOW!"), ephemeral=True)
         return
@@ -5039,53 +7004,245 @@ async def thrift_slash(interaction: discord.Interaction):
 
 @bot.command()
 async def buythrift(ctx, idx: int):
-    thrift = load_thrift()
-    if idx < 1 or idx > len(thrift):
+    entry = await get_thrift_listing(ctx.guild.id, idx)
+    if entry is None:
         await ctx.send(embed=nova_embed("bUY tHRIFT", "iNVALID iTEM nUMBER!"))
         return
-    entry = thrift[idx-1]
-    if get_balance(ctx.author.id) < entry["price"]:
-        await ctx.send(embed=nova_embed("bUY tHRIFT", "nOT eNOUGH dOLLARIANAS!"))
-        return
     if entry["seller"] == ctx.author.id:
         await ctx.send(embed=nova_embed("bUY tHRIFT", "yOU cAN'T bUY yOUR oWN iTEM!"))
         return
-    change_balance(ctx.author.id, -entry["price"])
-    change_balance(entry["seller"], entry["price"])
-    inventory = load_inventory()
-    user_inv = inventory.get(str(ctx.author.id), [])
-    user_inv.append(entry["item"])
-    inventory[str(ctx.author.id)] = user_inv
-    save_inventory(inventory)
-    del thrift[idx-1]
-    save_thrift(thrift)
+    # Take the listing before paying so two buyers can't both pay for it
+    if not await take_thrift_listing(entry["id"]):
+        await ctx.send(embed=nova_embed("bUY tHRIFT", "sOMEONE eLSE jUST bOUGHT tHAT!"))
+        return
+    paid = post_transaction(ctx.guild.id, [(ctx.author.id, -entry["price"]), (entry["seller"], entry["price"])], f"thrift {entry['item']}")
+    if paid is None:
+        await restore_thrift_listing(ctx.guild.id, entry)
+        await ctx.send(embed=nova_embed("bUY tHRIFT", "nOT eNOUGH dOLLARIANAS!"))
+        return
+    await add_inventory_item(ctx.guild.id, ctx.author.id, entry["item"])
+    await paid
     await ctx.send(embed=nova_embed("bUY tHRIFT", f"yOU bOUGHT {entry['item']} fOR {entry['price']} {CURRENCY_NAME}!"))
 
 @bot.tree.command(name="buythrift", description="Buy an item from the thrift store")
 @app_commands.describe(idx="The item number from /thrift")
 async def buythrift_slash(interaction: discord.Interaction, idx: int):
-    thrift = load_thrift()
-    if idx < 1 or idx > len(thrift):
+    entry = await get_thrift_listing(interaction.guild.id, idx)
+    if entry is None:
         await interaction.response.send_message(embed=nova_embed("bUY tHRIFT", "iNVALID iTEM nUMBER!"), ephemeral=True)
         return
-    entry = thrift[idx-1]
-    if get_balance(interaction.user.id) < entry["price"]:
-        await interaction.response.send_message(embed=nova_embed("bUY tHRIFT", "nOT eNOUGH dOLLARIANAS!"), ephemeral=True)
-        return
     if entry["seller"] == interaction.user.id:
         await interaction.response.send_message(embed=nova_embed("bUY tHRIFT", "yOU cAN'T bUY yOUR oWN iTEM!"), ephemeral=True)
         return
-    change_balance(interaction.user.id, -entry["price"])
-    change_balance(entry["seller"], entry["price"])
-    inventory = load_inventory()
-    user_inv = inventory.get(str(interaction.user.id), [])
-    user_inv.append(entry["item"])
-    inventory[str(interaction.user.id)] = user_inv
-    save_inventory(inventory)
-    del thrift[idx-1]
-    save_thrift(thrift)
+    if not await take_thrift_listing(entry["id"]):
+        await interaction.response.send_message(embed=nova_embed("bUY tHRIFT", "sOMEONE eLSE jUST bOUGHT tHAT!"), ephemeral=True)
+        return
+    paid = post_transaction(interaction.guild.id, [(interaction.user.id, -entry["price"]), (entry["seller"], entry["price"])], f"thrift {entry['item']}")
+    if paid is None:
+        await restore_thrift_listing(interaction.guild.id, entry)
+        await interaction.response.send_message(embed=nova_embed("bUY tHRIFT", "nOT eNOUGH dOLLARIANAS!"), ephemeral=True)
+        return
+    await add_inventory_item(interaction.guild.id, interaction.user.id, entry["item"])
+    await paid
     await interaction.response.send_message(embed=nova_embed("bUY tHRIFT", f"yOU bOUGHT {entry['item']} fOR {entry['price']} {CURRENCY_NAME}!"))
 
+# =========================
+# Transcripts
+# =========================
+
+TRANSCRIPT_SPOOL_LIMIT = 1024 * 1024  # bytes per format kept in memory before spilling to a temp file
+
+class Transcript:
+    """Channel transcript written message by message into spooled temp files.
+
+    Every format in formats ("txt", "jsonl", "html") is filled from the same pass over the
+    history, so memory stays flat however long the channel is. finish() it once, then
+    upload() it to as many channels as needed and close() it.
+    """
+
+    def __init__(self, title, header_lines=(), formats=("txt",), compress=False, record_ids=False):
+        self.compress = compress
+        self.count = 0
+        self.message_ids = set() if record_ids else None  # IDs of the messages added, for callers that delete exactly those
+        self.outputs = {}
+        for fmt in formats:
+            spool = tempfile.SpooledTemporaryFile(max_size=TRANSCRIPT_SPOOL_LIMIT)
+            sink = gzip.GzipFile(fileobj=spool, mode="wb") if compress else spool
+            self.outputs[fmt] = (spool, sink)
+        header_lines = list(header_lines)
+        self._write("txt", "\n".join([title, *header_lines, "=" * 50, ""]))
+        self._write("jsonl", json.dumps({"title": title, "header": header_lines}) + "\n")
+        self._write("html", (
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+            "<style>body{font-family:sans-serif}.time{color:#888}.msg{margin:4px 0}</style></head><body>"
+            f"<h1>{html.escape(title)}</h1>" + "".join(f"<p>{html.escape(line)}</p>" for line in header_lines) + "<hr>\n"
+        ))
+
+    def _write(self, fmt, text):
+        output = self.outputs.get(fmt)
+        if output is not None:
+            output[1].write(text.encode("utf-8"))
+
+    def add(self, message):
+        """Append one message to every format."""
+        self.count += 1
+        if self.message_ids is not None:
+            self.message_ids.add(message.id)
+        timestamp = message.created_at.strftime("%Y-%m-%d %H:%M:%S")
+        content = message.content or ("[Embed]" if message.embeds else "[No text content]")
+        if "txt" in self.outputs:
+            attachments = f" [attachments: {', '.join(att.filename for att in message.attachments)}]" if message.attachments else ""
+            self._write("txt", f"[{timestamp}] {message.author} ({message.author.id}): {content}{attachments}\n")
+        if "jsonl" in self.outputs:
+            self._write("jsonl", json.dumps({
+                "id": message.id,
+                "author": str(message.author),
+                "author_id": message.author.id,
+                "created_at": message.created_at.isoformat(),
+                "content": message.content,
+                "attachments": [att.url for att in message.attachments]
+            }) + "\n")
+        if "html" in self.outputs:
+            attachments = "".join(f" <a href=\"{html.escape(att.url)}\">{html.escape(att.filename)}</a>" for att in message.attachments)
+            self._write("html", (
+                f"<div class=\"msg\"><span class=\"time\">[{timestamp}]</span> <b>{html.escape(str(message.author))}</b>: "
+                f"{html.escape(content)}{attachments}</div>\n"
+            ))
+
+    def note(self, text):
+        """Append a line that isn't a message, e.g. what couldn't be recovered."""
+        self._write("txt", text + "\n")
+        self._write("jsonl", json.dumps({"note": text}) + "\n")
+        self._write("html", f"<p><i>{html.escape(text)}</i></p>\n")
+
+    async def stream(self, history, keep=None):
+        """Add every message from an async history iterator that passes keep."""
+        async for message in history:
+            if keep is None or keep(message):
+                self.add(message)
+        return self
+
+    def finish(self):
+        self._write("html", "</body></html>\n")
+        for spool, sink in self.outputs.values():
+            if sink is not spool:
+                sink.close()
+        return self
+
+    def upload(self, name, fmt="txt"):
+        """A discord.File over the finished transcript; call again for each channel it goes to."""
+        spool = self.outputs[fmt][0]
+        spool.seek(0)
+        # SpooledTemporaryFile only counts as an io.IOBase, which discord.File needs, from Python 3.11
+        fp = spool if isinstance(spool, io.IOBase) else spool._file
+        return discord.File(fp, filename=f"{name}.{fmt}" + (".gz" if self.compress else ""))
+
+    def close(self):
+        for spool, _ in self.outputs.values():
+            spool.close()
+
+# =========================
+# Bulk Deletes
+# =========================
+
+PURGE_EVENT_GRACE = 10  # seconds delete events for a finished purge may still trickle in
+PURGED_MESSAGE_IDS = {}  # message_id: monotonic time its delete event stops being expected, None while its purge runs
+
+def forget_expired_purges():
+    now = time.monotonic()
+    for message_id, expires in list(PURGED_MESSAGE_IDS.items()):
+        if expires is not None and expires < now:
+            del PURGED_MESSAGE_IDS[message_id]
+
+async def bot_purge(channel, limit, message_ids=None):
+    """Purge a channel without flooding the message logs; the caller logs the purge itself.
+
+    Given message_ids (what the caller's transcript holds), exactly those messages are deleted, so
+    the log matches what is gone. Only the messages the purge deletes have their delete events
+    skipped; anything else deleted in the channel meanwhile is logged as usual.
+    """
+    forget_expired_purges()
+    targeted = []
+    def check(message):
+        if message_ids is not None and message.id not in message_ids:
+            return False
+        targeted.append(message.id)
+        PURGED_MESSAGE_IDS[message.id] = None
+        return True
+    if message_ids is None:
+        history = {"limit": limit}
+    elif not message_ids:
+        return []
+    else:
+        # Walk back only as far as the oldest transcribed message, however many arrived since
+        history = {"limit": None, "after": discord.Object(id=min(message_ids) - 1)}
+    try:
+        return await channel.purge(check=check, **history)
+    finally:
+        expires = time.monotonic() + PURGE_EVENT_GRACE
+        for message_id in targeted:
+            if message_id in PURGED_MESSAGE_IDS:
+                PURGED_MESSAGE_IDS[message_id] = expires
+
+def is_bot_purge(message_ids):
+    """True if a bot purge deleted every one of message_ids. Each delete event comes once, so matched IDs are forgotten."""
+    if not message_ids or any(message_id not in PURGED_MESSAGE_IDS for message_id in message_ids):
+        return False
+    for message_id in message_ids:
+        del PURGED_MESSAGE_IDS[message_id]
+    return True
+
+@bot.event
+async def on_raw_bulk_message_delete(payload):
+    """Log a bulk delete as one transcript per log channel instead of one embed per message."""
+    if payload.guild_id is None or is_bot_purge(payload.message_ids):
+        return
+    guild = bot.get_guild(payload.guild_id)
+    if guild is None:
+        return
+    channel = guild.get_channel_or_thread(payload.channel_id)
+    channel_name = channel.name if channel else "unknown"
+    for message_id in payload.message_ids:
+        MESSAGE_CACHE.pop(message_id, None)
+    messages = [msg for msg in payload.cached_messages if not msg.author.bot]
+    cached_ids = {msg.id for msg in payload.cached_messages}
+    missing_ids = [message_id for message_id in payload.message_ids if message_id not in cached_ids]
+    if not messages and not missing_ids:
+        return
+    transcript = Transcript(
+        f"Bulk Delete - #{channel_name} ({payload.channel_id})",
+        [
+            f"Deleted at: {datetime.now(dt_timezone.utc).strftime('%Y-%m-%d %H:%M:%S')} UTC",
+            f"Messages: {len(payload.message_ids)} ({len(missing_ids)} not cached)"
+        ],
+        compress=True
+    )
+    for msg in sorted(messages, key=lambda m: m.id):
+        transcript.add(msg)
+    if missing_ids:
+        transcript.note("Not cached, content unknown: " + ", ".join(str(message_id) for message_id in sorted(missing_ids)))
+    transcript.finish()
+    name = f"bulk_delete_{channel_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    embed = discord.Embed(
+        title="🗑️ Messages Bulk Deleted",
+        description=f"**Channel:** <#{payload.channel_id}>\n**Messages Deleted:** {len(payload.message_ids)}",
+        color=0xff4444,
+        timestamp=datetime.now(dt_timezone.utc)
+    )
+    destinations = [await get_central_logging_channel(guild.id, "messages")]
+    if CHAT_LOGS_CHANNEL_ID:
+        destinations.append(guild.get_channel(CHAT_LOGS_CHANNEL_ID))
+    try:
+        for log_channel in destinations:
+            if log_channel is None:
+                continue
+            try:
+                await log_channel.send(embed=embed, file=transcript.upload(name))
+            except Exception as e:
+                print(f"Failed to send bulk delete log to #{log_channel.name}: {e}")
+    finally:
+        transcript.close()
+
 # Store last deleted and edited messages per channel
 snipes = {}
 edsnipes = {}
@@ -5103,6 +7260,10 @@ async def on_message_delete(message):
         'time': message.created_at
     }
     
+    # Purges log one transcript themselves; old messages they delete one by one would flood the logs
+    if is_bot_purge((message.id,)):
+        return
+    
     # Central logging for deleted messages
     print(f"DEBUG: Message deleted by {message.author} in {message.channel}")
     
@@ -5123,22 +7284,13 @@ async def on_message_delete(message):
             embed.set_thumbnail(url=message.author.avatar.url)
         
         # Log to central messages channel
-        central_logged = await log_to_central_channel(message.guild.id, "messages", embed)
-        
-        if central_logged:
-            print(f"DEBUG: Message deletion logged to central messages channel")
-        else:
-            print(f"DEBUG: Central logging failed for message deletion")
+        await log_to_central_channel(message.guild.id, "messages", embed)
         
         # Also log to local channel if configured (simultaneous, not fallback)
         if CHAT_LOGS_CHANNEL_ID:
             log_channel = message.guild.get_channel(CHAT_LOGS_CHANNEL_ID)
             if log_channel:
-                try:
-                    await log_channel.send(embed=embed)
-                    print(f"DEBUG: Message deletion also logged to local channel {log_channel.name}")
-                except Exception as e:
-                    print(f"ERROR: Failed to send to local chat log: {e}")
+                ship_log(log_channel, embed, LOG_PRIORITY_CHAT)
             else:
                 print(f"ERROR: Local chat logs channel not found with ID: {CHAT_LOGS_CHANNEL_ID}")
         else:
@@ -5176,8 +7328,7 @@ async def on_message_edit(before, after):
                     embed.timestamp = datetime.now(dt_timezone.utc)
                     embed.color = 0xffcc00  # Yellow for edits
                     
-                    await log_channel.send(embed=embed)
-                    print(f"DEBUG: Edit log sent successfully to {log_channel.name}")
+                    ship_log(log_channel, embed, LOG_PRIORITY_CHAT)
                 except Exception as e:
                     print(f"ERROR: Failed to send edit log: {e}")
                     import traceback
@@ -5198,6 +7349,9 @@ async def on_message_edit(before, after):
 
 @bot.event
 async def on_raw_reaction_remove(payload):
+    note_reaction(payload.message_id, str(payload.emoji), -1)
+    if payload.guild_id and str(payload.emoji) == RUNWAY_EMOJI:
+        await runway_reaction(payload, -1)
     # Store the last removed reaction for rsnipe
     if payload.guild_id is None:
         return
@@ -5210,16 +7364,11 @@ async def on_raw_reaction_remove(payload):
         user = guild.get_member(payload.user_id)
     if user is None or user.bot:
         return
-    try:
-        message = await channel.fetch_message(payload.message_id)
-    except Exception:
-        message = None
-    jump_url = message.jump_url if message else None
     rsnipes[payload.channel_id] = {
         'emoji': str(payload.emoji),
         'user': str(user),
         'message_id': payload.message_id,
-        'jump_url': jump_url,
+        'jump_url': message_jump_url(payload.guild_id, payload.channel_id, payload.message_id),
         'time': datetime.now(dt_timezone.utc)
     }
 
@@ -5471,7 +7620,7 @@ async def on_member_join(member):
             embed.set_thumbnail(url=member.display_avatar.url)
             embed.add_field(name="aCCOUNT cREATED", value=member.created_at.strftime("%Y-%m-%d %H:%M:%S UTC"), inline=True)
             embed.add_field(name="mEMBER cOUNT", value=str(member.guild.member_count), inline=True)
-            await log_channel.send(embed=embed)
+            ship_log(log_channel, embed, LOG_PRIORITY_SERVER)
     
     # Central logging
     try:
@@ -5503,7 +7652,7 @@ async def on_member_remove(member):
             embed.set_thumbnail(url=member.display_avatar.url)
             embed.add_field(name="jOINED sERVER", value=member.joined_at.strftime("%Y-%m-%d %H:%M:%S UTC") if member.joined_at else "Unknown", inline=True)
             embed.add_field(name="mEMBER cOUNT", value=str(member.guild.member_count), inline=True)
-            await log_channel.send(embed=embed)
+            ship_log(log_channel, embed, LOG_PRIORITY_SERVER)
     
     # Central logging
     try:
@@ -5527,17 +7676,7 @@ async def warn(ctx, member: discord.Member = None, *, reason="No reason provided
         return
     try:
         # Add infraction to user's record
-        user_id = str(member.id)
-        if user_id not in INFRACTIONS:
-            INFRACTIONS[user_id] = []
-        
-        INFRACTIONS[user_id].append({
-            "type": "warning",
-            "reason": reason,
-            "date": datetime.now(dt_timezone.utc).isoformat(),
-            "moderator": str(ctx.author)
-        })
-        save_infractions()
+        await add_infraction(ctx.guild.id, member.id, "warning", reason, str(ctx.author))
         
         # Log the warning
         log_case(ctx.guild.id, "Warn", ctx.author, ctx.channel, datetime.now(dt_timezone.utc))
@@ -5549,7 +7688,7 @@ async def warn(ctx, member: discord.Member = None, *, reason="No reason provided
         except Exception:
             pass  # Ignore if DMs are closed
         
-        warning_count = len(INFRACTIONS[user_id])
+        warning_count = len(await get_infractions(ctx.guild.id, member.id))
         await ctx.send(embed=nova_embed("wARN", f"{member.mention} wAS wARNED fOR: {reason}\n\ntOTAL wARNINGS: {warning_count}"))
     except Exception as e:
         await ctx.send(embed=nova_embed("wARN", f"cOULD nOT wARN: {e}"))
@@ -5725,22 +7864,21 @@ class TicketCloseView(discord.ui.View):
             )
             return
         
-        # Create transcript
-        messages = []
-        async for message in channel.history(limit=None, oldest_first=True):
-            if not message.author.bot or message.embeds:
-                timestamp = message.created_at.strftime("%Y-%m-%d %H:%M:%S")
-                content = message.content if message.content else "[Embed/Attachment]"
-                messages.append(f"[{timestamp}] {message.author}: {content}")
-        
-        transcript = "\n".join(messages)
+        # Create transcript in one pass over the ticket: text for the creator, text and HTML for the logs
+        transcript = Transcript(
+            f"Ticket Transcript - {channel.name}",
+            [f"Closed by: {interaction.user} ({interaction.user.id})", f"Closed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"],
+            formats=("txt", "html")
+        )
         
         # Send transcript to user via DM and logs channel
         try:
-            transcript_file = discord.File(
-                io.StringIO(transcript), 
-                filename=f"ticket-transcript-{channel.name}.txt"
+            await transcript.stream(
+                channel.history(limit=None, oldest_first=True),
+                keep=lambda message: not message.author.bot or message.embeds
             )
+            transcript.finish()
+            name = f"ticket-transcript-{channel.name}"
             
             # Find the ticket creator
             creator_name = channel.name.split('-')[-1]
@@ -5749,37 +7887,39 @@ class TicketCloseView(discord.ui.View):
             if creator:
                 await creator.send(
                     embed=nova_embed("📄 tICKET tRANSCRIPT", f"Your ticket **{channel.name}** has been closed."),
-                    file=transcript_file
+                    file=transcript.upload(name)
                 )
             
             # Log ticket closure to ticket logs channel
             if TICKET_LOGS_CHANNEL_ID:
                 logs_channel = interaction.guild.get_channel(TICKET_LOGS_CHANNEL_ID)
                 if logs_channel:
-                    # Create a new file object for the logs channel
-                    logs_transcript_file = discord.File(
-                        io.StringIO(transcript), 
-                        filename=f"ticket-transcript-{channel.name}.txt"
-                    )
-                    
                     log_embed = nova_embed(
                         "🔒 tICKET cLOSED",
                         f"**Channel:** {channel.name}\n**Closed by:** {interaction.user.mention}\n**Creator:** {creator.mention if creator else 'Unknown'}"
                     )
                     log_embed.timestamp = datetime.now(dt_timezone.utc)
-                    await logs_channel.send(embed=log_embed, file=logs_transcript_file)
+                    await logs_channel.send(embed=log_embed, files=[transcript.upload(name), transcript.upload(name, "html")])
                     
         except Exception as e:
             print(f"Failed to send transcript: {e}")
+        finally:
+            transcript.close()
         
         # Close the ticket
         await interaction.response.send_message(
             embed=nova_embed("🔒 tICKET cLOSED", "This ticket will be deleted in 5 seconds...")
         )
         
-        await asyncio.sleep(5)
+        schedule_job("ticket_close", time.time() + 5, {"channel_id": channel.id})
+
+async def delete_closed_ticket(payload):
+    channel = bot.get_channel(payload["channel_id"])
+    if channel is not None:
         await channel.delete(reason="Ticket closed")
 
+JOB_HANDLERS["ticket_close"] = delete_closed_ticket
+
 @bot.command()
 async def ticket(ctx):
     """Create a support ticket panel"""
@@ -5930,24 +8070,43 @@ async def getemojis(ctx):
 # =========================
 
 # Global variables for new features
-BLACKLIST_WORDS = set()
-PET_DATA = {}  # user_id: {"name": str, "type": str, "level": int, "xp": int, "hunger": int, "cleanliness": int, "happiness": int, "changed_pet": bool}
+BLACKLISTS = {}  # guild_id: set of blacklisted terms
 FOCUS_SESSIONS = {}  # user_id: {"start_time": datetime, "duration": int, "breaks": int}
 LOTTERY_PARTICIPANTS = set()  # user_ids
-INFRACTIONS = {}  # user_id: [{"type": str, "reason": str, "date": datetime, "moderator": str}]
 
 # Load data files for new features
 def load_blacklist():
-    global BLACKLIST_WORDS
+    global BLACKLISTS
     try:
         with open("blacklist.json", "r") as f:
-            BLACKLIST_WORDS = set(json.load(f))
+            data = json.load(f)
     except FileNotFoundError:
-        BLACKLIST_WORDS = set()
+        data = {}
+    if isinstance(data, list):
+        # Old format was one list shared by every server; keep it as the seed for each server's own list
+        data = {"global": data}
+    BLACKLISTS = {guild_id: set(words) for guild_id, words in data.items()}
+    invalidate_matchers()
 
 def save_blacklist():
-    with open("blacklist.json", "w") as f:
-        json.dump(list(BLACKLIST_WORDS), f)
+    mark_dirty("blacklist")
+
+register_store("blacklist", "blacklist.json", lambda: {guild_id: sorted(words) for guild_id, words in BLACKLISTS.items()}, indent=2)
+
+def get_guild_blacklist(guild_id):
+    """Return a guild's blacklist set, creating it on first use.
+
+    Servers that predate per-server blacklists start from a copy of the old shared list,
+    so existing filtering keeps working and each server can then edit its own copy. The first
+    lookup usually comes from on_message, so a read can schedule a blacklist save; a server
+    with nothing to inherit is not saved.
+    """
+    words = BLACKLISTS.get(guild_id)
+    if words is None:
+        words = BLACKLISTS[guild_id] = set(BLACKLISTS.get("global", ()))
+        if words:
+            save_blacklist()
+    return words
 
 def load_auto_reactions():
     global AUTO_REACTIONS
@@ -5957,77 +8116,270 @@ def load_auto_reactions():
     except FileNotFoundError:
         AUTO_REACTIONS = {}
 
-def load_pets():
-    global PET_DATA
-    try:
-        with open("pets.json", "r") as f:
-            PET_DATA = json.load(f)
-    except FileNotFoundError:
-        PET_DATA = {}
+def save_auto_reactions():
+    mark_dirty("auto_reactions")
 
-def save_pets():
-    with open("pets.json", "w") as f:
-        json.dump(PET_DATA, f)
+register_store("auto_reactions", "auto_reactions.json", lambda: AUTO_REACTIONS, indent=2)
 
-def load_infractions():
-    global INFRACTIONS
-    try:
-        with open("infractions.json", "r") as f:
-            content = f.read().strip()
-            if not content:  # Handle empty file
-                INFRACTIONS = {}
-                return
-            
-            data = json.loads(content)
-            # Convert date strings back to datetime objects
-            for user_id, infractions in data.items():
-                for infraction in infractions:
-                    if isinstance(infraction.get("date"), str):
-                        try:
-                            infraction["date"] = datetime.fromisoformat(infraction["date"])
-                        except ValueError:
-                            # If date parsing fails, use current time
-                            infraction["date"] = datetime.now(dt_timezone.utc)
-            INFRACTIONS = data
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Warning: Could not load infractions.json ({e}). Starting with empty infractions.")
-        INFRACTIONS = {}
-        # Create a fresh infractions file
-        save_infractions()
-
-def save_infractions():
-    with open("infractions.json", "w") as f:
-        # Convert datetime objects to strings for JSON serialization
-        data = {}
-        for user_id, infractions in INFRACTIONS.items():
-            data[user_id] = []
-            for infraction in infractions:
-                infraction_copy = infraction.copy()
-                # Handle both datetime objects and strings
-                if hasattr(infraction["date"], 'isoformat'):
-                    infraction_copy["date"] = infraction["date"].isoformat()
-                else:
-                    infraction_copy["date"] = str(infraction["date"])
-                data[user_id].append(infraction_copy)
-        json.dump(data, f)
-
-def add_infraction(user_id, infraction_type, reason, moderator):
-    user_id = str(user_id)
-    if user_id not in INFRACTIONS:
-        INFRACTIONS[user_id] = []
-    INFRACTIONS[user_id].append({
-        "type": infraction_type,
-        "reason": reason,
-        "date": datetime.now(),
-        "moderator": moderator
-    })
-    save_infractions()
+# =========================
+# Blacklist and Auto-reaction Matching
+# =========================
+
+# Blacklist term syntax:
+#   word      matches anywhere in the message (the original behavior)
+#   [word]    matches only as a whole word
+#   wo*d      * matches any run of letters or digits, e.g. [bad*] or f*ck
+# Auto-reaction triggers are plain text and match anywhere in the lowercased message, as before.
+
+GUILD_MATCHERS = {}  # guild_id: TermMatcher over the blacklist, rebuilt lazily after it changes
+REACTION_MATCHERS = {}  # guild_id: literal TermMatcher over the auto-reaction triggers
+
+# Leetspeak digits/symbols and common Cyrillic/Greek lookalikes, folded to plain latin letters
+CONFUSABLES = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "9": "g",
+    "@": "a", "$": "s", "€": "e", "£": "l",
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p",
+    "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j", "ѕ": "s", "ԁ": "d", "ɡ": "g",
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o",
+    "ρ": "p", "τ": "t", "υ": "u", "χ": "x", "ω": "w",
+})
+
+def normalize_text(text):
+    """Fold case, accents, full-width/stylized letters, lookalikes and leetspeak so 'Ｈ3ll0' and 'hello' compare equal.
+
+    Runs once per message; blacklist terms go through the same function when a matcher is built.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    if not text.isascii():
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return text.translate(CONFUSABLES)
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+def parse_term(raw):
+    """Split a raw term into (whole_word, literal segments between wildcards)."""
+    term = raw.strip().lower()
+    whole_word = len(term) > 2 and term.startswith("[") and term.endswith("]")
+    if whole_word:
+        term = term[1:-1]
+    return whole_word, term.split("*")
+
+def is_valid_term(raw):
+    """A term needs at least one literal character for the matcher to anchor on."""
+    return any(parse_term(raw)[1])
+
+class TermMatcher:
+    """Aho-Corasick automaton over the literal part of every term.
+
+    One pass over the message finds every anchor occurrence. Plain terms are hits straight away,
+    whole-word terms get a boundary check at the occurrence, and wildcard terms are confirmed with
+    their own regex only when their longest literal segment shows up.
+    """
+
+    def __init__(self, terms, normalize=None, literal=False):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # state: [(anchor_length, rule), ...]
+        for raw in terms:
+            # Literal terms skip the [word] and * syntax and match as typed
+            whole_word, segments = (False, [raw]) if literal else parse_term(raw)
+            if normalize:
+                segments = [normalize(segment) for segment in segments]
+            if not any(segments):
+                continue
+            if len(segments) == 1:
+                rule = (raw, whole_word, None)
+                anchor = segments[0]
+            else:
+                pattern = r"\w*".join(re.escape(segment) for segment in segments)
+                if whole_word:
+                    pattern = rf"(?<!\w){pattern}(?!\w)"
+                rule = (raw, whole_word, re.compile(pattern))
+                anchor = max(segments, key=len)
+            self._add(anchor, rule)
+        self._build_failure_links()
+
+    def _add(self, anchor, rule):
+        state = 0
+        for char in anchor:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = next_state
+            state = next_state
+        self.output[state].append((len(anchor), rule))
+
+    def _build_failure_links(self):
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                # Fold the fallback's outputs in so the search never has to walk failure chains
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+                queue.append(next_state)
+
+    def find(self, text):
+        """Return every matching raw term, in the order they first appear in text."""
+        hits = {}
+        checked = set()
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for anchor_length, rule in output[state]:
+                raw, whole_word, regex = rule
+                if raw in hits:
+                    continue
+                if regex is not None:
+                    # Wildcard terms: one regex confirmation per message, only once their anchor is present
+                    if raw not in checked:
+                        checked.add(raw)
+                        if regex.search(text):
+                            hits[raw] = None
+                    continue
+                start = end - anchor_length + 1
+                if whole_word and (
+                    (start > 0 and _is_word_char(text[start - 1]))
+                    or (end + 1 < len(text) and _is_word_char(text[end + 1]))
+                ):
+                    continue
+                hits[raw] = None
+        return list(hits)
+
+def get_guild_matcher(guild_id):
+    """Return the compiled matcher for a guild's blacklist, building it if needed.
+
+    Terms are normalized like messages, so one pass over normalize_text(message) catches
+    'b@dw0rd' for a blacklisted 'badword'.
+    """
+    matcher = GUILD_MATCHERS.get(guild_id)
+    if matcher is None:
+        matcher = GUILD_MATCHERS[guild_id] = TermMatcher(get_guild_blacklist(guild_id), normalize=normalize_text)
+    return matcher
+
+def get_reaction_matcher(guild_id):
+    """Return the compiled matcher for a guild's auto-reaction triggers; search it with the lowercased message."""
+    matcher = REACTION_MATCHERS.get(guild_id)
+    if matcher is None:
+        matcher = REACTION_MATCHERS[guild_id] = TermMatcher(AUTO_REACTIONS.get(guild_id, {}), literal=True)
+    return matcher
+
+def benchmark_term_matcher(term_counts=(10, 1000, 10000), message_count=2000, seed=1234):
+    """Measure messages filtered per second at each blacklist size, next to the old per-word substring loop.
+
+    Returns [(term_count, matcher_msgs_per_sec, naive_msgs_per_sec, build_ms)]. CPU bound, so run it in a thread.
+    """
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    messages = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 25))) for _ in range(message_count)]
+    results = []
+    for term_count in term_counts:
+        terms = {"".join(rng.choice(alphabet) for _ in range(rng.randint(4, 10))) for _ in range(term_count)}
+        build_started = time.perf_counter()
+        matcher = TermMatcher(terms, normalize=normalize_text)
+        build_ms = (time.perf_counter() - build_started) * 1000
+        
+        started = time.perf_counter()
+        for message in messages:
+            matcher.find(normalize_text(message))
+        matcher_rate = message_count / (time.perf_counter() - started)
+        
+        # The pre-matcher approach: one substring scan per word per message
+        started = time.perf_counter()
+        for message in messages:
+            message_lower = message.lower()
+            any(word in message_lower for word in terms)
+        naive_rate = message_count / (time.perf_counter() - started)
+        results.append((term_count, matcher_rate, naive_rate, build_ms))
+    return results
+
+def invalidate_matchers(guild_id=None):
+    """Drop compiled matchers after a list changes. No guild_id means every guild."""
+    if guild_id is None:
+        GUILD_MATCHERS.clear()
+        REACTION_MATCHERS.clear()
+    else:
+        GUILD_MATCHERS.pop(guild_id, None)
+        REACTION_MATCHERS.pop(guild_id, None)
+
+# A pet is one JSON row per owner: {"name": str, "type": str, "level": int, "xp": int, "hunger": int,
+# "cleanliness": int, "happiness": int, "changed_pet": bool, "last_update": unix time}. Pets follow their
+# owner across servers, so they stay under GLOBAL_SCOPE, and are read when a command needs one.
+
+async def get_pet(user_id):
+    """Return a user's pet dict, or None."""
+    row = await db_fetchone("SELECT data FROM pets WHERE guild_id = ? AND user_id = ?", (GLOBAL_SCOPE, user_id))
+    return json.loads(row["data"]) if row else None
+
+async def set_pet(user_id, pet):
+    await db_execute("INSERT OR REPLACE INTO pets (guild_id, user_id, data) VALUES (?, ?, ?)", (GLOBAL_SCOPE, user_id, json.dumps(pet)))
+
+def _update_pet(user_id, change):
+    conn = get_db()
+    with conn:
+        row = conn.execute("SELECT data FROM pets WHERE guild_id = ? AND user_id = ?", (GLOBAL_SCOPE, user_id)).fetchone()
+        if row is None:
+            return None, None
+        pet = json.loads(row["data"])
+        result = change(pet)
+        if result is not None:
+            conn.execute("UPDATE pets SET data = ? WHERE guild_id = ? AND user_id = ?", (json.dumps(pet), GLOBAL_SCOPE, user_id))
+    return pet, result
+
+async def update_pet(user_id, change):
+    """Run change(pet) on a user's pet and save it unless change returns None. Returns (pet, result), or (None, None) without a pet.
+
+    The read, change and write are one transaction on the storage thread, so two buttons pressed
+    together can't overwrite each other's update.
+    """
+    return await run_storage(_update_pet, user_id, change)
+
+# Infractions belong to the server whose mods gave them and are read per (guild_id, user_id) through
+# idx_infractions_user when a command needs a member's record.
+
+async def get_infractions(guild_id, user_id):
+    """Return a member's infractions in a server, oldest first, as dicts with id, type, reason, date and moderator."""
+    rows = await db_fetchall(
+        "SELECT id, type, reason, date, moderator FROM infractions WHERE guild_id = ? AND user_id = ? ORDER BY id",
+        (guild_id, user_id)
+    )
+    infractions = []
+    for row in rows:
+        infraction = dict(row)
+        # Convert date strings back to datetime objects
+        try:
+            infraction["date"] = datetime.fromisoformat(row["date"])
+        except (TypeError, ValueError):
+            # If date parsing fails, use current time
+            infraction["date"] = datetime.now(dt_timezone.utc)
+        infractions.append(infraction)
+    return infractions
+
+async def add_infraction(guild_id, user_id, infraction_type, reason, moderator):
+    await db_execute(
+        "INSERT INTO infractions (guild_id, user_id, type, reason, date, moderator) VALUES (?, ?, ?, ?, ?, ?)",
+        (guild_id, user_id, infraction_type, reason, datetime.now(dt_timezone.utc).isoformat(), moderator)
+    )
+
+async def delete_infraction(infraction_id):
+    await db_execute("DELETE FROM infractions WHERE id = ?", (infraction_id,))
+
+async def clear_infractions(guild_id, user_id):
+    await db_execute("DELETE FROM infractions WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
 
 # Load all new feature data on startup
 load_blacklist()
 load_auto_reactions()
-load_pets()
-load_infractions()
 
 # Drama command
 @bot.command()
@@ -6093,31 +8445,52 @@ async def serverinfo(ctx):
 # Blacklist command
 @bot.command()
 async def blacklist(ctx, *, word=None):
-    """Add or remove words from the blacklist (mods only)"""
+    """Add or remove words from the blacklist (mods only). Use [word] for whole words only and * as a wildcard."""
     if not has_mod_or_admin(ctx):
         await ctx.send(embed=nova_embed("bLACKLIST", "Only mods/admins can manage the blacklist!"))
         return
     
+    guild_id = str(ctx.guild.id)
+    guild_blacklist = get_guild_blacklist(guild_id)
+    
     if word is None:
-        if not BLACKLIST_WORDS:
+        if not guild_blacklist:
             await ctx.send(embed=nova_embed("bLACKLIST", "nO wORDS aRE cURRENTLY bLACKLISTED."))
         else:
-            word_list = "\n".join([f"• {w}" for w in sorted(BLACKLIST_WORDS)])
+            word_list = "\n".join([f"• {w}" for w in sorted(guild_blacklist)])
             embed = nova_embed("bLACKLIST", f"cURRENT bLACKLISTED wORDS:\n{word_list}")
             await ctx.send(embed=embed)
         return
     
     word = word.lower()
     
-    if word in BLACKLIST_WORDS:
-        BLACKLIST_WORDS.remove(word)
+    if word in guild_blacklist:
+        guild_blacklist.remove(word)
+        invalidate_matchers(guild_id)
         save_blacklist()
         await ctx.send(embed=nova_embed("bLACKLIST", f"rEMOVED '{word}' fROM bLACKLIST."))
+    elif not is_valid_term(word):
+        await ctx.send(embed=nova_embed("bLACKLIST", "tHE wORD nEEDS aT lEAST oNE lETTER bESIDES `*`!"))
     else:
-        BLACKLIST_WORDS.add(word)
+        guild_blacklist.add(word)
+        invalidate_matchers(guild_id)
         save_blacklist()
         await ctx.send(embed=nova_embed("bLACKLIST", f"aDDED '{word}' tO bLACKLIST."))
 
+@bot.command()
+async def filterbench(ctx):
+    """Benchmark the blacklist matcher at 10, 1,000 and 10,000 terms (Owner only)"""
+    if ctx.author.id != OWNER_ID:
+        await ctx.send(embed=nova_embed("fILTER bENCH", "oNLY tHE oWNER cAN dO tHIS!"))
+        return
+    await ctx.send(embed=nova_embed("fILTER bENCH", "rUNNING... tHIS tAKES a fEW sECONDS!"))
+    results = await asyncio.to_thread(benchmark_term_matcher)
+    lines = [
+        f"**{term_count:,} tERMS:** {matcher_rate:,.0f} msg/s (oLD lOOP: {naive_rate:,.0f} msg/s, bUILD {build_ms:.0f}ms)"
+        for term_count, matcher_rate, naive_rate, build_ms in results
+    ]
+    await ctx.send(embed=nova_embed("fILTER bENCH", "\n".join(lines)))
+
 # Focus timer command
 @bot.command()
 async def focus(ctx, duration: int = 25):
@@ -6145,26 +8518,45 @@ async def focus(ctx, duration: int = 25):
     )
     await ctx.send(embed=embed)
     
-    # Wait for the duration and then notify
-    await asyncio.sleep(duration * 60)
+    # Notify when the duration is up
+    schedule_job("focus_done", time.time() + duration * 60, {"user_id": user_id, "channel_id": ctx.channel.id, "duration": duration})
+
+def restore_focus_sessions():
+    """Rebuild FOCUS_SESSIONS from the focus jobs still pending after a restart."""
+    for _, job in get_jobs("focus_done") + get_jobs("focus_break_over"):
+        payload = job["payload"]
+        FOCUS_SESSIONS.setdefault(payload["user_id"], {
+            "start_time": datetime.fromtimestamp(job["due_at"]) - timedelta(minutes=payload["duration"]),
+            "duration": payload["duration"],
+            "breaks": payload.get("breaks", 0)
+        })
+
+async def finish_focus_session(payload):
+    user_id = payload["user_id"]
+    if user_id not in FOCUS_SESSIONS:
+        return
+    FOCUS_SESSIONS[user_id]["breaks"] += 1
+    breaks = FOCUS_SESSIONS[user_id]["breaks"]
     
-    if user_id in FOCUS_SESSIONS:
-        FOCUS_SESSIONS[user_id]["breaks"] += 1
-        breaks = FOCUS_SESSIONS[user_id]["breaks"]
-        
-        break_duration = 15 if breaks % 4 != 0 else 30  # Long break every 4 sessions
-        
+    break_duration = 15 if breaks % 4 != 0 else 30  # Long break every 4 sessions
+    
+    # Remove session after break
+    schedule_job("focus_break_over", time.time() + break_duration * 60, {"user_id": user_id, "duration": break_duration, "breaks": breaks})
+    
+    channel = bot.get_channel(payload["channel_id"])
+    if channel is not None:
         embed = nova_embed(
             "⏰ fOCUS sESSION cOMPLETE!",
             f"gREAT jOB! tAKE a {break_duration}-mINUTE bREAK! 🎉\n"
             f"sESSIONS cOMPLETED: {breaks}"
         )
-        await ctx.send(f"{ctx.author.mention}", embed=embed)
-        
-        # Remove session after break
-        await asyncio.sleep(break_duration * 60)
-        if user_id in FOCUS_SESSIONS:
-            del FOCUS_SESSIONS[user_id]
+        await channel.send(f"<@{user_id}>", embed=embed)
+
+async def end_focus_break(payload):
+    FOCUS_SESSIONS.pop(payload["user_id"], None)
+
+JOB_HANDLERS["focus_done"] = finish_focus_session
+JOB_HANDLERS["focus_break_over"] = end_focus_break
 
 # Lottery command (owner only)
 @bot.command()
@@ -6212,19 +8604,20 @@ async def lottery(ctx, action=None, price: int = None):
         winner_id = random.choice(list(LOTTERY_PARTICIPANTS))
         winner = ctx.guild.get_member(winner_id)
         entry_cost = config.get('lottery_price', 100)
-        prize = len(LOTTERY_PARTICIPANTS) * entry_cost
+        participants = len(LOTTERY_PARTICIPANTS)
+        prize = participants * entry_cost
         
-        change_balance(winner_id, prize)
+        # Cleared before awaiting the payout so a second draw can't pay out the same pool
+        LOTTERY_PARTICIPANTS.clear()
+        await transfer(ctx.guild.id, [(winner_id, prize)], "lottery prize")
         
         embed = nova_embed(
             "🎉 lOTTERY wINNER!",
             f"cONGRATULATIONS {winner.mention}!\n"
             f"yOU wON {prize} {CURRENCY_NAME}!\n\n"
-            f"pARTICIPANTS: {len(LOTTERY_PARTICIPANTS)}"
+            f"pARTICIPANTS: {participants}"
         )
         await ctx.send(embed=embed)
-        
-        LOTTERY_PARTICIPANTS.clear()
     
     elif action.lower() == "reset":
         LOTTERY_PARTICIPANTS.clear()
@@ -6254,13 +8647,14 @@ async def joinlottery(ctx):
     
     entry_cost = config.get('lottery_price', 100)
     
-    # Check if user has enough balance
-    if get_balance(user_id) < entry_cost:
+    # Posted without awaiting so a double-tapped command can't pay twice for one entry
+    paid = post_transaction(ctx.guild.id, [(user_id, -entry_cost)], "lottery entry")
+    if paid is None:
         await ctx.send(embed=nova_embed("🎰 lOTTERY", f"yOU nEED {entry_cost} {CURRENCY_NAME} tO jOIN tHE lOTTERY!"))
         return
     
-    change_balance(user_id, -entry_cost)
     LOTTERY_PARTICIPANTS.add(user_id)
+    await paid
     
     embed = nova_embed(
         "🎰 lOTTERY eNTRY",
@@ -6282,27 +8676,27 @@ class PetView(discord.ui.View):
             await interaction.response.send_message("tHIS iSN'T yOUR pET!", ephemeral=True)
             return
         
-        user_id = str(self.user_id)
-        if user_id not in PET_DATA:
+        def feed(pet):
+            if pet["hunger"] >= 100:
+                return None
+            pet["hunger"] = min(100, pet["hunger"] + 25)
+            pet["happiness"] = min(100, pet["happiness"] + 10)
+            pet["xp"] += 5
+            
+            # Check for level up
+            new_level = pet["xp"] // 100 + 1
+            level_up = new_level > pet["level"]
+            pet["level"] = new_level
+            return level_up
+        
+        pet, level_up = await update_pet(self.user_id, feed)
+        if pet is None:
             await interaction.response.send_message("yOU dON'T hAVE a pET!", ephemeral=True)
             return
-        
-        pet = PET_DATA[user_id]
-        if pet["hunger"] >= 100:
+        if level_up is None:
             await interaction.response.send_message(f"{pet['name']} iS aLREADY fULL!", ephemeral=True)
             return
         
-        pet["hunger"] = min(100, pet["hunger"] + 25)
-        pet["happiness"] = min(100, pet["happiness"] + 10)
-        pet["xp"] += 5
-        
-        # Check for level up
-        new_level = pet["xp"] // 100 + 1
-        level_up = new_level > pet["level"]
-        pet["level"] = new_level
-        
-        save_pets()
-        
         message = f"yOU fED {pet['name']}! 🍖\nhUNGER: {pet['hunger']}/100"
         if level_up:
             message += f"\n🎉 {pet['name']} lEVELED uP tO lEVEL {pet['level']}!"
@@ -6315,27 +8709,27 @@ class PetView(discord.ui.View):
             await interaction.response.send_message("tHIS iSN'T yOUR pET!", ephemeral=True)
             return
         
-        user_id = str(self.user_id)
-        if user_id not in PET_DATA:
+        def clean(pet):
+            if pet["cleanliness"] >= 100:
+                return None
+            pet["cleanliness"] = min(100, pet["cleanliness"] + 30)
+            pet["happiness"] = min(100, pet["happiness"] + 15)
+            pet["xp"] += 8
+            
+            # Check for level up
+            new_level = pet["xp"] // 100 + 1
+            level_up = new_level > pet["level"]
+            pet["level"] = new_level
+            return level_up
+        
+        pet, level_up = await update_pet(self.user_id, clean)
+        if pet is None:
             await interaction.response.send_message("yOU dON'T hAVE a pET!", ephemeral=True)
             return
-        
-        pet = PET_DATA[user_id]
-        if pet["cleanliness"] >= 100:
+        if level_up is None:
             await interaction.response.send_message(f"{pet['name']} iS aLREADY cLEAN!", ephemeral=True)
             return
         
-        pet["cleanliness"] = min(100, pet["cleanliness"] + 30)
-        pet["happiness"] = min(100, pet["happiness"] + 15)
-        pet["xp"] += 8
-        
-        # Check for level up
-        new_level = pet["xp"] // 100 + 1
-        level_up = new_level > pet["level"]
-        pet["level"] = new_level
-        
-        save_pets()
-        
         message = f"yOU cLEANED {pet['name']}! 🧽\ncLEANLINESS: {pet['cleanliness']}/100"
         if level_up:
             message += f"\n🎉 {pet['name']} lEVELED uP tO lEVEL {pet['level']}!"
@@ -6348,22 +8742,21 @@ class PetView(discord.ui.View):
             await interaction.response.send_message("tHIS iSN'T yOUR pET!", ephemeral=True)
             return
         
-        user_id = str(self.user_id)
-        if user_id not in PET_DATA:
+        def cuddle(pet):
+            pet["happiness"] = min(100, pet["happiness"] + 20)
+            pet["xp"] += 3
+            
+            # Check for level up
+            new_level = pet["xp"] // 100 + 1
+            level_up = new_level > pet["level"]
+            pet["level"] = new_level
+            return level_up
+        
+        pet, level_up = await update_pet(self.user_id, cuddle)
+        if pet is None:
             await interaction.response.send_message("yOU dON'T hAVE a pET!", ephemeral=True)
             return
         
-        pet = PET_DATA[user_id]
-        pet["happiness"] = min(100, pet["happiness"] + 20)
-        pet["xp"] += 3
-        
-        # Check for level up
-        new_level = pet["xp"] // 100 + 1
-        level_up = new_level > pet["level"]
-        pet["level"] = new_level
-        
-        save_pets()
-        
         responses = [
             f"{pet['name']} pURRS hAPPILY!",
             f"{pet['name']} wAGS tHEIR tAIL!",
@@ -6380,10 +8773,9 @@ class PetView(discord.ui.View):
 @bot.command()
 async def adoptpet(ctx):
     """Adopt a virtual pet"""
-    user_id = str(ctx.author.id)
-    
-    if user_id in PET_DATA:
-        await ctx.send(embed=nova_embed("aDOPT pET", f"yOU aLREADY hAVE a pET nAMED {PET_DATA[user_id]['name']}!"))
+    current_pet = await get_pet(ctx.author.id)
+    if current_pet is not None:
+        await ctx.send(embed=nova_embed("aDOPT pET", f"yOU aLREADY hAVE a pET nAMED {current_pet['name']}!"))
         return
     
     animals = ["Cat", "Dog", "Red Panda", "Raven", "Octopus", "Goldfish", "Tortoise", "Owl", "Lizard", "Bat", "Dove", "Fox"]
@@ -6414,7 +8806,7 @@ async def adoptpet(ctx):
         pet_name = name_msg.content
         
         # Create pet data
-        PET_DATA[user_id] = {
+        await set_pet(ctx.author.id, {
             "name": pet_name,
             "type": chosen_animal,
             "level": 1,
@@ -6423,8 +8815,7 @@ async def adoptpet(ctx):
             "cleanliness": 100,
             "happiness": 100,
             "changed_pet": False
-        }
-        save_pets()
+        })
         
         embed = nova_embed(
             "🎉 aDOPTION sUCCESSFUL!",
@@ -6440,9 +8831,8 @@ async def adoptpet(ctx):
 @bot.command()
 async def petname(ctx, *, new_name: str = None):
     """Change your pet's name"""
-    user_id = str(ctx.author.id)
-    
-    if user_id not in PET_DATA:
+    pet = await get_pet(ctx.author.id)
+    if pet is None:
         await ctx.send(embed=nova_embed("pET nAME", "yOU dON'T hAVE a pET! uSE `?adoptpet` fIRST."))
         return
     
@@ -6454,9 +8844,9 @@ async def petname(ctx, *, new_name: str = None):
         await ctx.send(embed=nova_embed("pET nAME", "pET nAME mUST bE 20 cHARACTERS oR lESS!"))
         return
     
-    old_name = PET_DATA[user_id]["name"]
-    PET_DATA[user_id]["name"] = new_name
-    save_pets()
+    old_name = pet["name"]
+    pet["name"] = new_name
+    await set_pet(ctx.author.id, pet)
     
     await ctx.send(embed=nova_embed(
         "🏷️ pET nAME cHANGED!",
@@ -6466,20 +8856,18 @@ async def petname(ctx, *, new_name: str = None):
 @bot.command()
 async def changepet(ctx):
     """Change your pet type (only once, resets all stats)"""
-    user_id = str(ctx.author.id)
-    
-    if user_id not in PET_DATA:
+    current_pet = await get_pet(ctx.author.id)
+    if current_pet is None:
         await ctx.send(embed=nova_embed("cHANGE pET", "yOU dON'T hAVE a pET! uSE `?adoptpet` fIRST."))
         return
     
-    if PET_DATA[user_id].get("changed_pet", False):
+    if current_pet.get("changed_pet", False):
         await ctx.send(embed=nova_embed(
             "cHANGE pET", 
             "yOU hAVE aLREADY cHANGED yOUR pET oNCE! yOU cANNOT cHANGE iT aGAIN."
         ))
         return
     
-    current_pet = PET_DATA[user_id]
     animals = ["Cat", "Dog", "Red Panda", "Raven", "Octopus", "Goldfish", "Tortoise", "Owl", "Lizard", "Bat", "Dove", "Fox"]
     animal_emojis = {"Cat": "🐱", "Dog": "🐶", "Red Panda": "🐼", "Raven": "🐦‍⬛", "Octopus": "🐙", 
                     "Goldfish": "🐠", "Tortoise": "🐢", "Owl": "🦉", "Lizard": "🦎", "Bat": "🦇", "Dove": "🕊️", "Fox": "🦊"}
@@ -6507,7 +8895,7 @@ async def changepet(ctx):
             return
         
         # Reset pet with new type but keep name
-        PET_DATA[user_id] = {
+        await set_pet(ctx.author.id, {
             "name": current_pet['name'],
             "type": chosen_animal,
             "level": 1,
@@ -6516,8 +8904,7 @@ async def changepet(ctx):
             "cleanliness": 100,
             "happiness": 100,
             "changed_pet": True
-        }
-        save_pets()
+        })
         
         embed = nova_embed(
             "🔄 pET cHANGED!",
@@ -6533,28 +8920,26 @@ async def changepet(ctx):
 @bot.command()
 async def pet(ctx):
     """Interact with your pet"""
-    user_id = str(ctx.author.id)
+    # Decrease stats over time (basic simulation)
+    def decay(pet):
+        current_time = time.time()
+        if "last_update" not in pet:
+            pet["last_update"] = current_time
+            return True
+        time_diff = (current_time - pet["last_update"]) / 3600  # Hours
+        if time_diff > 1:  # Only update if more than 1 hour passed
+            pet["hunger"] = max(0, pet["hunger"] - int(time_diff * 5))
+            pet["cleanliness"] = max(0, pet["cleanliness"] - int(time_diff * 3))
+            pet["happiness"] = max(0, pet["happiness"] - int(time_diff * 2))
+            pet["last_update"] = current_time
+            return True
+        return None
     
-    if user_id not in PET_DATA:
+    pet, _ = await update_pet(ctx.author.id, decay)
+    if pet is None:
         await ctx.send(embed=nova_embed("pET", "yOU dON'T hAVE a pET! uSE `?adoptpet` tO aDOPT oNE!"))
         return
     
-    pet = PET_DATA[user_id]
-    
-    # Decrease stats over time (basic simulation)
-    import time
-    current_time = time.time()
-    if "last_update" not in pet:
-        pet["last_update"] = current_time
-    
-    time_diff = (current_time - pet["last_update"]) / 3600  # Hours
-    if time_diff > 1:  # Only update if more than 1 hour passed
-        pet["hunger"] = max(0, pet["hunger"] - int(time_diff * 5))
-        pet["cleanliness"] = max(0, pet["cleanliness"] - int(time_diff * 3))
-        pet["happiness"] = max(0, pet["happiness"] - int(time_diff * 2))
-        pet["last_update"] = current_time
-        save_pets()
-    
     # Create status bars
     def create_bar(value, max_val=100):
         filled = int((value / max_val) * 10)
@@ -6777,9 +9162,154 @@ async def setlogs(ctx, category_name: str = "📋 Logs"):
         import traceback
         traceback.print_exc()
 
+# =========================
+# History Scan
+# =========================
+
+HISTORY_SCAN_CONCURRENCY = 3  # channels fetched at once
+HISTORY_SCAN_RATE = 4.0  # history requests per second across all channels
+HISTORY_SCAN_PAGE = 100  # messages per history request, the API maximum
+HISTORY_SCAN_PROGRESS_INTERVAL = 5  # seconds between progress edits
+HISTORY_SCANS_RUNNING = set()  # guild IDs with a scan in progress
+
+class RateBudget:
+    """Token bucket shared by the scan workers so the whole scan stays under a fixed request rate."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def plan_history_scan(guild):
+    """Wipe a guild's activity and lay out a fresh scan of every text channel.
+
+    Every channel is scanned up to the snowflake for right now. Messages after that are counted
+    live by on_message (or by reconciliation after downtime), starting from the checkpoint set here.
+    """
+    stop = discord.utils.time_snowflake(datetime.now(dt_timezone.utc))
+    MESSAGE_ACTIVITY[guild.id] = {}
+    ACTIVITY_BOARDS.pop(guild.id, None)
+    save_message_activity()
+    clear_guild_checkpoints(guild.id)
+    for key in [key for key in HISTORY_SCANS if key[0] == guild.id]:
+        del HISTORY_SCANS[key]
+        mark_dirty("history_scans", key)
+    for channel in guild.text_channels:
+        key = (guild.id, channel.id)
+        HISTORY_SCANS[key] = {"after": 0, "stop": stop, "done": False}
+        mark_dirty("history_scans", key)
+        advance_checkpoint(guild.id, channel.id, stop - 1)
+
+def has_unfinished_scan(guild_id):
+    return any(key[0] == guild_id and not state["done"] for key, state in HISTORY_SCANS.items())
+
+async def scan_channel(guild, channel_id, budget, stats):
+    """Fetch one channel page by page from its cursor, folding each page into the activity store."""
+    key = (guild.id, channel_id)
+    state = HISTORY_SCANS[key]
+    channel = guild.get_channel(channel_id)
+    if channel is None or not channel.permissions_for(guild.me).read_message_history:
+        state["done"] = True
+        mark_dirty("history_scans", key)
+        return
+    stats["current"] = channel.name
+    try:
+        while not state["done"]:
+            await budget.acquire()
+            page = [message async for message in channel.history(
+                limit=HISTORY_SCAN_PAGE,
+                after=discord.Object(id=state["after"]),
+                before=discord.Object(id=state["stop"]),
+                oldest_first=True
+            )]
+            for message in page:
+                if not message.author.bot:
+                    track_message(guild.id, message.author.id, message.created_at)
+                    stats["messages"] += 1
+            if page:
+                state["after"] = page[-1].id
+            if len(page) < HISTORY_SCAN_PAGE:
+                state["done"] = True
+            mark_dirty("history_scans", key)
+    except discord.Forbidden:
+        state["done"] = True
+        mark_dirty("history_scans", key)
+    except Exception as e:
+        print(f"Error scanning channel {channel.name}: {e}")
+    finally:
+        if state["done"]:
+            stats["channels_done"] += 1
+
+def scan_rate(stats):
+    elapsed = time.monotonic() - stats["started"]
+    return stats["messages"] / elapsed if elapsed > 0 else 0.0
+
+async def run_history_scan(guild, on_progress=None):
+    """Scan every unfinished channel of a guild, HISTORY_SCAN_CONCURRENCY at a time under one RateBudget.
+
+    Safe to call again after a crash or restart: each channel picks up after its saved cursor.
+    """
+    pending = [key[1] for key, state in HISTORY_SCANS.items() if key[0] == guild.id and not state["done"]]
+    total_channels = sum(1 for key in HISTORY_SCANS if key[0] == guild.id)
+    stats = {
+        "messages": 0, "channels_done": total_channels - len(pending), "channels_total": total_channels,
+        "current": None, "started": time.monotonic(),
+    }
+    budget = RateBudget(HISTORY_SCAN_RATE)
+    queue = asyncio.Queue()
+    for channel_id in pending:
+        queue.put_nowait(channel_id)
+
+    async def worker():
+        while not queue.empty():
+            await scan_channel(guild, queue.get_nowait(), budget, stats)
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(HISTORY_SCAN_PROGRESS_INTERVAL)
+            try:
+                await on_progress(stats)
+            except Exception as e:
+                print(f"Error updating scan progress: {e}")
+
+    HISTORY_SCANS_RUNNING.add(guild.id)
+    progress_task = bot.loop.create_task(reporter()) if on_progress else None
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(HISTORY_SCAN_CONCURRENCY, len(pending)))))
+    finally:
+        HISTORY_SCANS_RUNNING.discard(guild.id)
+        if progress_task:
+            progress_task.cancel()
+        save_message_activity()
+    print(f"📊 History scan of {guild.name}: {stats['messages']:,} messages at {scan_rate(stats):,.0f} msgs/s")
+    return stats
+
+def resume_history_scans():
+    """Restart scans that were interrupted by a crash or restart, in the background."""
+    for guild in bot.guilds:
+        if guild.id not in HISTORY_SCANS_RUNNING and has_unfinished_scan(guild.id):
+            print(f"🔁 Resuming history scan of {guild.name}")
+            bot.loop.create_task(run_history_scan(guild))
+
 @bot.command()
-async def scanhistory(ctx):
-    """Scan server message history to build comprehensive activity stats (Owner only)"""
+async def scanhistory(ctx, mode: str = None):
+    """Scan server message history to build comprehensive activity stats (Owner only)
+
+    Picks up an interrupted scan where it left off; ?scanhistory restart wipes and starts over.
+    """
     if ctx.author.id != OWNER_ID:
         await ctx.send(embed=nova_embed("sCAN hISTORY", "oNLY tHE oWNER cAN rUN tHIS cOMMAND!"))
         return
@@ -6791,113 +9321,49 @@ async def scanhistory(ctx):
     guild = ctx.guild
     guild_id = guild.id
     
-    # Send initial status
-    status_embed = nova_embed(
+    if guild_id in HISTORY_SCANS_RUNNING:
+        await ctx.send(embed=nova_embed("sCAN hISTORY", "a sCAN iS aLREADY rUNNING fOR tHIS sERVER!"))
+        return
+    
+    resuming = mode != "restart" and has_unfinished_scan(guild_id)
+    if not resuming:
+        plan_history_scan(guild)
+    
+    status_msg = await ctx.send(embed=nova_embed(
         "🔍 sCAN hISTORY",
-        f"Scanning message history for **{guild.name}**...\n"
-        f"This may take several minutes for large servers."
-    )
-    status_msg = await ctx.send(embed=status_embed)
+        f"{'Resuming' if resuming else 'Scanning'} message history for **{guild.name}**...\n"
+        f"Fetching {HISTORY_SCAN_CONCURRENCY} channels at a time. This may take several minutes for large servers."
+    ))
     
-    try:
-        # Initialize or clear existing data for this server
-        MESSAGE_ACTIVITY[guild_id] = {}
-        
-        total_messages = 0
-        total_channels = 0
-        processed_channels = 0
-        
-        # Get all text channels
-        text_channels = [channel for channel in guild.channels if isinstance(channel, discord.TextChannel)]
-        total_channels = len(text_channels)
-        
-        # Update status
+    async def show_progress(stats):
         await status_msg.edit(embed=nova_embed(
             "🔍 sCAN hISTORY",
-            f"Found {total_channels} text channels to scan...\n"
-            f"Starting historical scan from server creation: {guild.created_at.strftime('%B %d, %Y')}"
+            f"**Progress:** {stats['channels_done']}/{stats['channels_total']} channels\n"
+            f"**Current:** #{stats['current']}\n"
+            f"**Total Messages:** {stats['messages']:,}\n"
+            f"**Speed:** {scan_rate(stats):,.0f} msgs/s"
         ))
+    
+    try:
+        stats = await run_history_scan(guild, show_progress)
+        
+        if has_unfinished_scan(guild_id):
+            await status_msg.edit(embed=nova_embed(
+                "⚠️ sCAN pAUSED",
+                f"**Total Messages:** {stats['messages']:,}\n"
+                f"**Channels Scanned:** {stats['channels_done']}/{stats['channels_total']}\n\n"
+                f"Some channels hit errors. Run ?scanhistory again to pick up where it stopped."
+            ))
+            return
         
-        for channel in text_channels:
-            try:
-                processed_channels += 1
-                channel_messages = 0
-                
-                # Update progress every few channels
-                if processed_channels % 5 == 0 or processed_channels == total_channels:
-                    progress_embed = nova_embed(
-                        "🔍 sCAN hISTORY",
-                        f"**Progress:** {processed_channels}/{total_channels} channels\n"
-                        f"**Current:** #{channel.name}\n"
-                        f"**Total Messages:** {total_messages:,}\n"
-                        f"**Channel Messages:** {channel_messages:,}"
-                    )
-                    await status_msg.edit(embed=progress_embed)
-                
-                # Scan messages in this channel (from oldest to newest)
-                async for message in channel.history(limit=None, oldest_first=True):
-                    # Skip bot messages
-                    if message.author.bot:
-                        continue
-                    
-                    user_id = message.author.id
-                    message_date = message.created_at
-                    
-                    # Initialize user data if needed
-                    if user_id not in MESSAGE_ACTIVITY[guild_id]:
-                        MESSAGE_ACTIVITY[guild_id][user_id] = []
-                    
-                    user_messages = MESSAGE_ACTIVITY[guild_id][user_id]
-                    
-                    # Check if we can batch with recent entry (within same day)
-                    if (user_messages and 
-                        user_messages[-1]["timestamp"].date() == message_date.date()):
-                        # Update the most recent entry for this day
-                        user_messages[-1]["count"] += 1
-                        if message_date > user_messages[-1]["timestamp"]:
-                            user_messages[-1]["timestamp"] = message_date
-                    else:
-                        # Create a new entry for this day
-                        user_messages.append({
-                            "timestamp": message_date,
-                            "count": 1
-                        })
-                    
-                    total_messages += 1
-                    channel_messages += 1
-                    
-                    # Save periodically to avoid memory issues
-                    if total_messages % 10000 == 0:
-                        save_message_activity()
-                        await status_msg.edit(embed=nova_embed(
-                            "🔍 sCAN hISTORY",
-                            f"**Progress:** {processed_channels}/{total_channels} channels\n"
-                            f"**Current:** #{channel.name}\n"
-                            f"**Total Messages:** {total_messages:,}\n"
-                            f"**Saving progress...**"
-                        ))
-                
-            except discord.Forbidden:
-                # Skip channels we can't access
-                continue
-            except Exception as e:
-                print(f"Error scanning channel {channel.name}: {e}")
-                continue
-        
-        # Final save
-        save_message_activity()
-        
-        # Calculate some stats
-        unique_users = len(MESSAGE_ACTIVITY[guild_id])
-        
-        # Send completion message
         completion_embed = nova_embed(
             "✅ hISTORY sCAN cOMPLETE!",
             f"**Server:** {guild.name}\n"
             f"**Scanned Period:** {guild.created_at.strftime('%B %d, %Y')} - Today\n"
-            f"**Total Messages:** {total_messages:,}\n"
-            f"**Unique Users:** {unique_users:,}\n"
-            f"**Channels Scanned:** {processed_channels}/{total_channels}\n\n"
+            f"**Total Messages:** {stats['messages']:,}{' (this run)' if resuming else ''}\n"
+            f"**Unique Users:** {len(MESSAGE_ACTIVITY.get(guild_id, {})):,}\n"
+            f"**Channels Scanned:** {stats['channels_done']}/{stats['channels_total']}\n"
+            f"**Speed:** {scan_rate(stats):,.0f} msgs/s\n\n"
             f"?mostactive now shows true lifetime stats!"
         )
         completion_embed.set_footer(text=f"Scan completed by {ctx.author}")
@@ -6907,8 +9373,7 @@ async def scanhistory(ctx):
         await status_msg.edit(embed=nova_embed(
             "❌ sCAN fAILED",
             f"An error occurred during the scan: {str(e)}\n\n"
-            f"Progress: {processed_channels}/{total_channels} channels\n"
-            f"Messages scanned: {total_messages:,}"
+            f"Run ?scanhistory again to resume from the last saved position."
         ))
         print(f"Error in scanhistory command: {e}")
         import traceback
@@ -6927,7 +9392,7 @@ async def log_mod_action(guild, action, moderator, target, reason=None, duration
     
     # Add to infractions system
     if target:
-        add_infraction(target.id, action, reason or "No reason provided", str(moderator))
+        await add_infraction(guild.id, target.id, action, reason or "No reason provided", str(moderator))
     
     # Create mod log embed
     embed = discord.Embed(
@@ -6949,10 +9414,7 @@ async def log_mod_action(guild, action, moderator, target, reason=None, duration
     if target and target.avatar:
         embed.set_thumbnail(url=target.avatar.url)
     
-    try:
-        await channel.send(embed=embed)
-    except Exception as e:
-        print(f"Failed to send mod log: {e}")
+    ship_log(channel, embed, LOG_PRIORITY_MOD)
 
 # =========================
 # Enhanced Event Handlers for Logging
@@ -7000,10 +9462,7 @@ async def on_member_join(member):
             
             embed.set_footer(text=f"Member #{member.guild.member_count}")
             
-            try:
-                await channel.send(embed=embed)
-            except Exception as e:
-                print(f"Failed to send join log: {e}")
+            ship_log(channel, embed, LOG_PRIORITY_SERVER)
 
 @bot.event
 async def on_member_remove(member):
@@ -7042,10 +9501,7 @@ async def on_member_remove(member):
             if member.avatar:
                 embed.set_thumbnail(url=member.avatar.url)
             
-            try:
-                await channel.send(embed=embed)
-            except Exception as e:
-                print(f"Failed to send leave log: {e}")
+            ship_log(channel, embed, LOG_PRIORITY_SERVER)
 
 # Server/Member update logging
 @bot.event
@@ -7114,8 +9570,7 @@ async def on_member_update(before, after):
             if after.avatar:
                 embed.set_thumbnail(url=after.avatar.url)
             
-            await channel.send(embed=embed)
-            print("DEBUG: Member update log sent successfully")
+            ship_log(channel, embed, LOG_PRIORITY_SERVER)
         else:
             print("DEBUG: No changes detected for member update")
             
@@ -7181,8 +9636,7 @@ async def on_user_update(before, after):
                     if after.avatar:
                         embed.set_thumbnail(url=after.avatar.url)
                     
-                    await channel.send(embed=embed)
-                    print("DEBUG: User update log sent successfully")
+                    ship_log(channel, embed, LOG_PRIORITY_SERVER)
                 else:
                     print("DEBUG: No changes detected for user update")
                 
@@ -7201,6 +9655,9 @@ async def on_guild_role_create(role):
 @bot.event
 async def on_guild_update(before, after):
     """Log server changes"""
+    # Logging channels are looked up by ID, so a rename keeps working; just allow a fresh scan
+    CENTRAL_LOG_MISSES.pop(after.id, None)
+    
     print(f"DEBUG: Guild update event triggered for {after.name}")
     print(f"DEBUG: SERVER_LOGS_CHANNEL_ID = {SERVER_LOGS_CHANNEL_ID}")
     
@@ -7252,8 +9709,7 @@ async def on_guild_update(before, after):
             if after.icon:
                 embed.set_thumbnail(url=after.icon.url)
             
-            await channel.send(embed=embed)
-            print("DEBUG: Server update log sent successfully")
+            ship_log(channel, embed, LOG_PRIORITY_SERVER)
         else:
             print("DEBUG: No changes detected for server update")
             
@@ -7278,28 +9734,16 @@ async def unwarn(ctx, member: discord.Member = None):
         await ctx.send("Usage: ?unwarn @user - Removes the most recent warning from a member. Only mods/admins can use this.")
         return
     
-    user_id = str(member.id)
-    
-    if user_id not in INFRACTIONS or not INFRACTIONS[user_id]:
-        await ctx.send(embed=nova_embed("uNWARN", f"{member.mention} hAS nO wARNINGS tO rEMOVE!"))
-        return
-    
     # Find and remove the most recent warning
-    warnings = [inf for inf in INFRACTIONS[user_id] if inf['type'].lower() == 'warn']
+    warnings = [inf for inf in await get_infractions(ctx.guild.id, member.id) if inf['type'].lower() == 'warn']
     
     if not warnings:
         await ctx.send(embed=nova_embed("uNWARN", f"{member.mention} hAS nO wARNINGS tO rEMOVE!"))
         return
     
-    # Remove the most recent warning
-    most_recent_warning = max(warnings, key=lambda x: x['date'])
-    INFRACTIONS[user_id].remove(most_recent_warning)
-    
-    # Clean up empty infraction lists
-    if not INFRACTIONS[user_id]:
-        del INFRACTIONS[user_id]
-    
-    save_infractions()
+    # Remove the most recent warning; IDs go up in the order infractions were recorded
+    most_recent_warning = max(warnings, key=lambda x: x['id'])
+    await delete_infraction(most_recent_warning['id'])
     
     # Log to mod logs channel
     await log_mod_action(ctx.guild, "unwarn", ctx.author, member, f"Removed warning: {most_recent_warning['reason']}")
@@ -7319,28 +9763,16 @@ async def unwarn_slash(interaction: discord.Interaction, member: discord.Member)
         await interaction.response.send_message(embed=nova_embed("uNWARN", "yOU dON'T hAVE pERMISSION!"), ephemeral=True)
         return
     
-    user_id = str(member.id)
-    
-    if user_id not in INFRACTIONS or not INFRACTIONS[user_id]:
-        await interaction.response.send_message(embed=nova_embed("uNWARN", f"{member.mention} hAS nO wARNINGS tO rEMOVE!"), ephemeral=True)
-        return
-    
     # Find and remove the most recent warning
-    warnings = [inf for inf in INFRACTIONS[user_id] if inf['type'].lower() == 'warn']
+    warnings = [inf for inf in await get_infractions(interaction.guild.id, member.id) if inf['type'].lower() == 'warn']
     
     if not warnings:
         await interaction.response.send_message(embed=nova_embed("uNWARN", f"{member.mention} hAS nO wARNINGS tO rEMOVE!"), ephemeral=True)
         return
     
-    # Remove the most recent warning
-    most_recent_warning = max(warnings, key=lambda x: x['date'])
-    INFRACTIONS[user_id].remove(most_recent_warning)
-    
-    # Clean up empty infraction lists
-    if not INFRACTIONS[user_id]:
-        del INFRACTIONS[user_id]
-    
-    save_infractions()
+    # Remove the most recent warning; IDs go up in the order infractions were recorded
+    most_recent_warning = max(warnings, key=lambda x: x['id'])
+    await delete_infraction(most_recent_warning['id'])
     
     # Log to mod logs channel
     await log_mod_action(interaction.guild, "unwarn", interaction.user, member, f"Removed warning: {most_recent_warning['reason']}")
@@ -7452,18 +9884,15 @@ async def clearcase(ctx, member: discord.Member = None):
         await ctx.send("Usage: ?clearcase @user - Clears all infractions for a member. Only mods/admins can use this.")
         return
     
-    user_id = str(member.id)
+    # Count infractions before clearing
+    infraction_count = len(await get_infractions(ctx.guild.id, member.id))
     
-    if user_id not in INFRACTIONS or not INFRACTIONS[user_id]:
+    if not infraction_count:
         await ctx.send(embed=nova_embed("cLEAR cASE", f"{member.mention} hAS nO iNFRACTIONS tO cLEAR!"))
         return
     
-    # Count infractions before clearing
-    infraction_count = len(INFRACTIONS[user_id])
-    
     # Clear all infractions
-    del INFRACTIONS[user_id]
-    save_infractions()
+    await clear_infractions(ctx.guild.id, member.id)
     
     # Log the case clearing
     log_case(ctx.guild.id, "Clear Case", ctx.author, ctx.channel, datetime.now(dt_timezone.utc))
@@ -7485,18 +9914,15 @@ async def clearcase_slash(interaction: discord.Interaction, member: discord.Memb
         await interaction.response.send_message(embed=nova_embed("cLEAR cASE", "yOU dON'T hAVE pERMISSION!"), ephemeral=True)
         return
     
-    user_id = str(member.id)
+    # Count infractions before clearing
+    infraction_count = len(await get_infractions(interaction.guild.id, member.id))
     
-    if user_id not in INFRACTIONS or not INFRACTIONS[user_id]:
+    if not infraction_count:
         await interaction.response.send_message(embed=nova_embed("cLEAR cASE", f"{member.mention} hAS nO iNFRACTIONS tO cLEAR!"), ephemeral=True)
         return
     
-    # Count infractions before clearing
-    infraction_count = len(INFRACTIONS[user_id])
-    
     # Clear all infractions
-    del INFRACTIONS[user_id]
-    save_infractions()
+    await clear_infractions(interaction.guild.id, member.id)
     
     # Log the case clearing
     log_case(interaction.guild.id, "Clear Case", interaction.user, interaction.channel, datetime.now(dt_timezone.utc))
@@ -7629,7 +10055,7 @@ async def setbcanomdeadline(ctx, *, end_time: str = None):
             return
     
     # Reset announcement tracker when deadline changes
-    reset_announcement_tracker()
+    plan_bca_announcements()
     save_config()
 
 @bot.command()
@@ -7661,7 +10087,7 @@ async def setbcavotedeadline(ctx, *, end_time: str = None):
             return
     
     # Reset announcement tracker when deadline changes
-    reset_announcement_tracker()
+    plan_bca_announcements()
     save_config()
 
 @bot.command()
@@ -8543,33 +10969,13 @@ async def countdown(ctx, *, event_name: str = None):
                 await ctx.send(embed=nova_embed("cOUNTDOWN", f"eVENT '{event_name}' nOT fOUND!\n\naVAILABLE eVENTS: {', '.join(available_events) if available_events else 'None'}"))
                 return
         
-        event_data = server_countdowns[event_name]
-        est = pytz.timezone('US/Eastern')
-        now = datetime.now(est)
-        time_diff = event_data["end_time"] - now
-        
-        if time_diff.total_seconds() <= 0:
-            time_str = "eVENT hAS eNDED!"
-            color = 0x808080  # Gray for ended events
-        else:
-            days = time_diff.days
-            hours, remainder = divmod(time_diff.seconds, 3600)
-            minutes, seconds = divmod(remainder, 60)
-            time_str = f"{days} days, {hours} hours, {minutes} minutes, {seconds} seconds"
-            color = 0xff69b4
-        
-        description = f"{event_data['description']}\n\n⏱️ **tIME rEMAINING:** **{time_str}**"
-        message = await ctx.send(embed=nova_embed(f"⏰ {event_name}", description))
-        
-        # Track this message for live updates (only for specific countdowns, not "all" view)
-        if time_diff.total_seconds() > 0:  # Only track if not ended
-            global active_countdown_messages
-            active_countdown_messages[message.id] = {
-                'guild_id': guild_id,
-                'channel_id': ctx.channel.id,
-                'event_name': event_name,
-                'message_obj': message
-            }
+            event_data = server_countdowns[event_name]
+            description, next_change = render_countdown(event_name, event_data)
+            message = await ctx.send(embed=nova_embed(f"⏰ {event_name}", description))
+            
+            # Track this message for live updates (only for specific countdowns, not "all" view)
+            if next_change is not None:  # Only track if not ended
+                track_countdown_message(guild_id, ctx.channel.id, event_name, message, description)
             
     except Exception as e:
         print(f"ERROR in countdown command: {e}")
@@ -8627,33 +11033,13 @@ async def countdown_slash(interaction: discord.Interaction, event_name: str = No
                 return
         
             event_data = server_countdowns[event_name]
-            est = pytz.timezone('US/Eastern')
-            now = datetime.now(est)
-            time_diff = event_data["end_time"] - now
-            
-            if time_diff.total_seconds() <= 0:
-                time_str = "eVENT hAS eNDED!"
-                color = 0x808080  # Gray for ended events
-            else:
-                days = time_diff.days
-                hours, remainder = divmod(time_diff.seconds, 3600)
-                minutes, seconds = divmod(remainder, 60)
-                time_str = f"{days} days, {hours} hours, {minutes} minutes, {seconds} seconds"
-                color = 0xff69b4
-            
-            description = f"{event_data['description']}\n\n⏱️ **tIME rEMAINING:** **{time_str}**"
+            description, next_change = render_countdown(event_name, event_data)
             await interaction.response.send_message(embed=nova_embed(f"⏰ {event_name}", description))
             
             # Track this message for live updates (only for specific countdowns, not "all" view)
-            if time_diff.total_seconds() > 0:  # Only track if not ended
+            if next_change is not None:  # Only track if not ended
                 message = await interaction.original_response()
-                global active_countdown_messages
-                active_countdown_messages[message.id] = {
-                    'guild_id': guild_id,
-                    'channel_id': interaction.channel.id,
-                    'event_name': event_name,
-                    'message_obj': message
-                }
+                track_countdown_message(guild_id, interaction.channel.id, event_name, message, description)
                 
     except Exception as e:
         print(f"ERROR in countdown slash command: {e}")
@@ -8755,8 +11141,8 @@ async def membercount(ctx):
     await ctx.send(embed=embed)
 
 @bot.command()
-async def mostactive(ctx):
-    """Show the most active users by message count for all time periods (Admin/Mod only)"""
+async def mostactive(ctx, period: str = None, page: int = 1):
+    """Show the most active users by message count for all time periods, or page through one period (Admin/Mod only)"""
     # Check permissions - only mods/admins can use this command
     if not has_mod_or_admin(ctx):
         await ctx.send(embed=nova_embed("mOST aCTIVE", "yOU dON'T hAVE pERMISSION tO uSE tHIS cOMMAND!"))
@@ -8773,34 +11159,25 @@ async def mostactive(ctx):
         await ctx.send(embed=nova_embed("mOST aCTIVE", "nO mESSAGE dATA fOUND fOR tHIS sERVER yET!"))
         return
     
-    now = datetime.now(dt_timezone.utc)
-    
-    # Define all periods
-    periods = [
-        ("lAST mONTH", now - timedelta(days=30)),
-        ("lAST 3 mONTHS", now - timedelta(days=90)),
-        ("lAST yEAR", now - timedelta(days=365)),
-        ("lIFETIME", datetime.min.replace(tzinfo=dt_timezone.utc))
-    ]
+    if period is not None:
+        if period.lower() not in ACTIVITY_PERIOD_NAMES:
+            await ctx.send(embed=nova_embed("mOST aCTIVE", f"uNKNOWN pERIOD! uSE oNE oF: {', '.join(ACTIVITY_PERIOD_NAMES)}"))
+            return
+        window = ACTIVITY_PERIOD_NAMES[period.lower()]
+        period_name = next(name for name, period_window in ACTIVITY_PERIODS if period_window == window)
+        text, page, total_pages = build_activity_page(ctx.guild, window, page)
+        embed = nova_embed(f"📊 mOST aCTIVE • {period_name}", text)
+        embed.set_footer(text=f"pAGE {page}/{total_pages}")
+        await ctx.send(embed=embed)
+        return
     
     embed = nova_embed("📊 mOST aCTIVE uSERS", "")
     
-    for period_name, cutoff in periods:
-        # Calculate message counts for each user for this period
-        user_counts = {}
-        for user_id, messages in MESSAGE_ACTIVITY[guild_id].items():
-            total_count = 0
-            for msg_data in messages:
-                if msg_data["timestamp"] >= cutoff:
-                    total_count += msg_data["count"]
-            
-            if total_count > 0:
-                user_counts[user_id] = total_count
+    for period_name, window in ACTIVITY_PERIODS:
+        # Top 3 users for this period from the running window totals
+        sorted_users = get_top_active(guild_id, window, 3)
         
-        if user_counts:
-            # Sort users by message count (descending) and get top 3
-            sorted_users = sorted(user_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            
+        if sorted_users:
             # Create leaderboard for this period
             leaderboard = []
             for i, (user_id, count) in enumerate(sorted_users, 1):
@@ -8836,7 +11213,8 @@ async def mostactive(ctx):
     await ctx.send(embed=embed)
 
 @bot.tree.command(name="mostactive", description="Show the most active users by message count for all time periods (Admin/Mod only)")
-async def mostactive_slash(interaction: discord.Interaction):
+@app_commands.describe(period="Only show one period: month, 3months, year or lifetime", page="Page of that period's leaderboard")
+async def mostactive_slash(interaction: discord.Interaction, period: str = None, page: int = 1):
     """Show the most active users by message count for all time periods (slash command version)"""
     # Check permissions - only mods/admins can use this command
     if not has_mod_or_admin_interaction(interaction):
@@ -8854,34 +11232,25 @@ async def mostactive_slash(interaction: discord.Interaction):
         await interaction.response.send_message(embed=nova_embed("mOST aCTIVE", "nO mESSAGE dATA fOUND fOR tHIS sERVER yET!"), ephemeral=True)
         return
     
-    now = datetime.now(dt_timezone.utc)
-    
-    # Define all periods
-    periods = [
-        ("lAST mONTH", now - timedelta(days=30)),
-        ("lAST 3 mONTHS", now - timedelta(days=90)),
-        ("lAST yEAR", now - timedelta(days=365)),
-        ("lIFETIME", datetime.min.replace(tzinfo=dt_timezone.utc))
-    ]
+    if period is not None:
+        if period.lower() not in ACTIVITY_PERIOD_NAMES:
+            await interaction.response.send_message(embed=nova_embed("mOST aCTIVE", f"uNKNOWN pERIOD! uSE oNE oF: {', '.join(ACTIVITY_PERIOD_NAMES)}"), ephemeral=True)
+            return
+        window = ACTIVITY_PERIOD_NAMES[period.lower()]
+        period_name = next(name for name, period_window in ACTIVITY_PERIODS if period_window == window)
+        text, page, total_pages = build_activity_page(interaction.guild, window, page)
+        embed = nova_embed(f"📊 mOST aCTIVE • {period_name}", text)
+        embed.set_footer(text=f"pAGE {page}/{total_pages}")
+        await interaction.response.send_message(embed=embed)
+        return
     
     embed = nova_embed("📊 mOST aCTIVE uSERS", "")
     
-    for period_name, cutoff in periods:
-        # Calculate message counts for each user for this period
-        user_counts = {}
-        for user_id, messages in MESSAGE_ACTIVITY[guild_id].items():
-            total_count = 0
-            for msg_data in messages:
-                if msg_data["timestamp"] >= cutoff:
-                    total_count += msg_data["count"]
-            
-            if total_count > 0:
-                user_counts[user_id] = total_count
+    for period_name, window in ACTIVITY_PERIODS:
+        # Top 3 users for this period from the running window totals
+        sorted_users = get_top_active(guild_id, window, 3)
         
-        if user_counts:
-            # Sort users by message count (descending) and get top 3
-            sorted_users = sorted(user_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            
+        if sorted_users:
             # Create leaderboard for this period
             leaderboard = []
             for i, (user_id, count) in enumerate(sorted_users, 1):
@@ -9099,7 +11468,7 @@ async def slash_setbcanomdeadline(interaction: discord.Interaction, end_time: st
             return
     
     # Reset announcement tracker when deadline changes
-    reset_announcement_tracker()
+    plan_bca_announcements()
     save_config()
 
 @bot.tree.command(name="setbcavotedeadline", description="Set voting deadline (mods only). Format: YYYY-MM-DD HH:MM EST")
@@ -9131,7 +11500,7 @@ async def slash_setbcavotedeadline(interaction: discord.Interaction, end_time: s
             return
     
     # Reset announcement tracker when deadline changes
-    reset_announcement_tracker()
+    plan_bca_announcements()
     save_config()
 
 @bot.tree.command(name="bcadeadlines", description="Show current BCA deadlines")
@@ -9464,152 +11833,126 @@ async def slash_bcaresults(interaction: discord.Interaction, category: str):
 # Background Task System for Deadline Monitoring
 # =========================
 
-# Track which announcements have been sent to avoid duplicates
-announcement_tracker = {
-    'nomination_1h_warning': False,
-    'nomination_closed': False,
-    'voting_1h_warning': False,
-    'voting_closed': False,
-    'voting_opened': False
-}
-
 @bot.event
 async def on_ready():
     print(f'{bot.user} has connected to Discord!')
-    
-    # Load all data
     load_config()
-    load_balances()
-    load_xp()
-    load_birthdays()
-    load_afk()
     
-    # Start the live countdown update loop - THIS IS THE CRITICAL PART!
+    # Start the write-behind persistence flusher and the loop lag monitor
+    start_persistence()
+    start_loop_lag_monitor()
+    if not activity_expiry_task.is_running():
+        activity_expiry_task.start()
+    start_activity_reconcile()
+    resume_history_scans()
+    start_scheduler()
+    start_ledger()
+    start_log_shipper()
+    start_cooldown_compactor()
+    start_message_workers()
+    
+    # Start the live countdown renderer
     try:
-        bot.loop.create_task(countdown_update_loop())
-        print("🚀 LIVE COUNTDOWN UPDATE LOOP STARTED SUCCESSFULLY!")
-        print("🔴 Countdown messages will now auto-edit every second!")
+        start_countdown_renderer()
     except Exception as e:
-        print(f"❌ Error starting countdown update loop: {e}")
+        print(f"❌ Error starting countdown renderer: {e}")
     
-    # Start the deadline monitoring task
-    deadline_monitor.start()
+    # Queue the BCA deadline announcements
+    plan_bca_announcements()
 
-from discord.ext import tasks
+BCA_WARNING_LEAD = timedelta(hours=1)
+BCA_CATCHUP_LIMIT = 86400  # seconds; announcements missed by more than this are marked sent without posting
 
-@tasks.loop(minutes=5)  # Check every 5 minutes
-async def deadline_monitor():
-    """Monitor deadlines and send automatic announcements"""
-    try:
-        global BCA_NOMINATION_DEADLINE, BCA_VOTING_DEADLINE, announcement_tracker
-        
-        # Get current time in UTC
-        now_utc = datetime.now(pytz.UTC)
-        est = pytz.timezone('US/Eastern')
-        
-        # Find announcement channels
-        nomination_channel = None
-        if BCA_NOMINATIONS_CHANNEL_ID:
-            nomination_channel = bot.get_channel(BCA_NOMINATIONS_CHANNEL_ID)
-        
-        # === NOMINATION DEADLINE MONITORING ===
-        if BCA_NOMINATION_DEADLINE:
-            time_until_nom_deadline = BCA_NOMINATION_DEADLINE - now_utc
-            
-            # 1 hour warning for nominations
-            if (3540 <= time_until_nom_deadline.total_seconds() <= 3660 and 
-                not announcement_tracker['nomination_1h_warning']):
-                
-                if nomination_channel:
-                    deadline_est = BCA_NOMINATION_DEADLINE.astimezone(est)
-                    embed = discord.Embed(
-                        title="⚠️ nOMINATION dEADLINE wARNING!",
-                        description=f"⏰ **1 hOUR lEFT tO nOMINATE!**\n\nDeadline: {deadline_est.strftime('%Y-%m-%d at %H:%M EST')}\n\nUse `?nominate @user <category>` to submit your nominations!",
-                        color=0xffaa00
-                    )
-                    await nomination_channel.send(embed=embed)
-                    announcement_tracker['nomination_1h_warning'] = True
-            
-            # Nominations closed announcement
-            elif (time_until_nom_deadline.total_seconds() <= 0 and 
-                  not announcement_tracker['nomination_closed']):
-                
-                if nomination_channel:
-                    embed = discord.Embed(
-                        title="📝 nOMINATIONS cLOSED!",
-                        description="📝 **nOMINATIONS fOR aLL cATEGORIES hAVE cLOSED!**\n\n🗳️ vOTING wILL oPEN sOON!",
-                        color=0xff0000
-                    )
-                    await nomination_channel.send(embed=embed)
-                    announcement_tracker['nomination_closed'] = True
-                    announcement_tracker['voting_opened'] = False  # Reset for voting announcement
-        
-        # === VOTING DEADLINE MONITORING ===
-        if BCA_VOTING_DEADLINE:
-            time_until_vote_deadline = BCA_VOTING_DEADLINE - now_utc
-            
-            # 1 hour warning for voting
-            if (3540 <= time_until_vote_deadline.total_seconds() <= 3660 and 
-                not announcement_tracker['voting_1h_warning']):
-                
-                voting_channel = bot.get_channel(BCA_VOTING_CHANNEL_ID) if BCA_VOTING_CHANNEL_ID else nomination_channel
-                if voting_channel:
-                    deadline_est = BCA_VOTING_DEADLINE.astimezone(est)
-                    embed = discord.Embed(
-                        title="⚠️ vOTING dEADLINE wARNING!",
-                        description=f"⏰ **1 hOUR lEFT tO vOTE!**\n\nDeadline: {deadline_est.strftime('%Y-%m-%d at %H:%M EST')}\n\nMods can use `?bcavote <category>` to create voting sessions!",
-                        color=0xffaa00
-                    )
-                    await voting_channel.send(embed=embed)
-                    announcement_tracker['voting_1h_warning'] = True
-            
-            # Voting closed announcement
-            elif (time_until_vote_deadline.total_seconds() <= 0 and 
-                  not announcement_tracker['voting_closed']):
-                
-                voting_channel = bot.get_channel(BCA_VOTING_CHANNEL_ID) if BCA_VOTING_CHANNEL_ID else nomination_channel
-                if voting_channel:
-                    embed = discord.Embed(
-                        title="🗳️ vOTING cLOSED!",
-                        description="🗳️ **vOTING fOR aLL cATEGORIES hAS cLOSED!**\n\n🏆 rESULTS wILL bE aNNOUNCED sOON!",
-                        color=0xff0000
-                    )
-                    await voting_channel.send(embed=embed)
-                    announcement_tracker['voting_closed'] = True
-        
-        # === VOTING OPENED ANNOUNCEMENT ===
-        # Announce when nominations are closed but voting hasn't started yet
-        if (BCA_NOMINATION_DEADLINE and BCA_VOTING_DEADLINE and 
-            now_utc > BCA_NOMINATION_DEADLINE and now_utc < BCA_VOTING_DEADLINE and 
-            not announcement_tracker['voting_opened']):
-            
-            voting_channel = bot.get_channel(BCA_VOTING_CHANNEL_ID) if BCA_VOTING_CHANNEL_ID else nomination_channel
-            if voting_channel:
-                vote_deadline_est = BCA_VOTING_DEADLINE.astimezone(est)
-                embed = discord.Embed(
-                    title="🗳️ vOTING iS nOW oPEN!",
-                    description=f"🗳️ **vOTING iS nOW oPEN!**\n\nVoting deadline: {vote_deadline_est.strftime('%Y-%m-%d at %H:%M EST')}\n\nMods can use `?bcavote <category>` to create voting sessions!",
-                    color=0x00ff00
-                )
-                await voting_channel.send(embed=embed)
-                announcement_tracker['voting_opened'] = True
-    
-    except Exception as e:
-        print(f"Error in deadline_monitor: {e}")
-        import traceback
-        traceback.print_exc()
+def bca_announcement_channel(key):
+    if key.startswith("nomination"):
+        return bot.get_channel(BCA_NOMINATIONS_CHANNEL_ID) if BCA_NOMINATIONS_CHANNEL_ID else None
+    if BCA_VOTING_CHANNEL_ID:
+        return bot.get_channel(BCA_VOTING_CHANNEL_ID)
+    return bot.get_channel(BCA_NOMINATIONS_CHANNEL_ID) if BCA_NOMINATIONS_CHANNEL_ID else None
 
-# Reset announcement tracker when deadlines are changed
-def reset_announcement_tracker():
-    """Reset announcement tracker when deadlines change"""
-    global announcement_tracker
-    announcement_tracker = {
-        'nomination_1h_warning': False,
-        'nomination_closed': False,
-        'voting_1h_warning': False,
-        'voting_closed': False,
-        'voting_opened': False
-    }
+def bca_announcement_deadline(key):
+    return BCA_NOMINATION_DEADLINE if key.startswith("nomination") or key == "voting_opened" else BCA_VOTING_DEADLINE
+
+def build_bca_announcement(key):
+    """The embed for one announcement, or None if it no longer makes sense to send it."""
+    now_utc = datetime.now(pytz.UTC)
+    est = COUNTDOWN_TZ
+    if key == "nomination_1h_warning" and now_utc < BCA_NOMINATION_DEADLINE:
+        deadline_est = BCA_NOMINATION_DEADLINE.astimezone(est)
+        return discord.Embed(
+            title="⚠️ nOMINATION dEADLINE wARNING!",
+            description=f"⏰ **1 hOUR lEFT tO nOMINATE!**\n\nDeadline: {deadline_est.strftime('%Y-%m-%d at %H:%M EST')}\n\nUse `?nominate @user <category>` to submit your nominations!",
+            color=0xffaa00
+        )
+    if key == "nomination_closed":
+        return discord.Embed(
+            title="📝 nOMINATIONS cLOSED!",
+            description="📝 **nOMINATIONS fOR aLL cATEGORIES hAVE cLOSED!**\n\n🗳️ vOTING wILL oPEN sOON!",
+            color=0xff0000
+        )
+    if key == "voting_opened" and BCA_VOTING_DEADLINE and now_utc < BCA_VOTING_DEADLINE:
+        vote_deadline_est = BCA_VOTING_DEADLINE.astimezone(est)
+        return discord.Embed(
+            title="🗳️ vOTING iS nOW oPEN!",
+            description=f"🗳️ **vOTING iS nOW oPEN!**\n\nVoting deadline: {vote_deadline_est.strftime('%Y-%m-%d at %H:%M EST')}\n\nMods can use `?bcavote <category>` to create voting sessions!",
+            color=0x00ff00
+        )
+    if key == "voting_1h_warning" and now_utc < BCA_VOTING_DEADLINE:
+        deadline_est = BCA_VOTING_DEADLINE.astimezone(est)
+        return discord.Embed(
+            title="⚠️ vOTING dEADLINE wARNING!",
+            description=f"⏰ **1 hOUR lEFT tO vOTE!**\n\nDeadline: {deadline_est.strftime('%Y-%m-%d at %H:%M EST')}\n\nMods can use `?bcavote <category>` to create voting sessions!",
+            color=0xffaa00
+        )
+    if key == "voting_closed":
+        return discord.Embed(
+            title="🗳️ vOTING cLOSED!",
+            description="🗳️ **vOTING fOR aLL cATEGORIES hAS cLOSED!**\n\n🏆 rESULTS wILL bE aNNOUNCED sOON!",
+            color=0xff0000
+        )
+    return None
+
+def plan_bca_announcements():
+    """Queue a scheduler job at the exact time of each BCA announcement for the current deadlines.
+
+    Called on startup and whenever a deadline changes. Jobs for deadlines that already passed fire
+    straight away, so announcements missed during downtime are caught up; warnings whose deadline
+    has since passed, and anything over BCA_CATCHUP_LIMIT late, are dropped rather than sent late.
+    """
+    for job_id, _ in get_jobs("bca_announcement"):
+        cancel_job(job_id)
+    planned = []
+    if BCA_NOMINATION_DEADLINE:
+        planned.append(("nomination_1h_warning", BCA_NOMINATION_DEADLINE - BCA_WARNING_LEAD))
+        planned.append(("nomination_closed", BCA_NOMINATION_DEADLINE))
+        if BCA_VOTING_DEADLINE and BCA_VOTING_DEADLINE > BCA_NOMINATION_DEADLINE:
+            planned.append(("voting_opened", BCA_NOMINATION_DEADLINE))
+    if BCA_VOTING_DEADLINE:
+        planned.append(("voting_1h_warning", BCA_VOTING_DEADLINE - BCA_WARNING_LEAD))
+        planned.append(("voting_closed", BCA_VOTING_DEADLINE))
+    for key, fire_at in planned:
+        schedule_job("bca_announcement", fire_at.timestamp(), {
+            "key": key, "deadline": bca_announcement_deadline(key).isoformat(), "fire_at": fire_at.timestamp()
+        })
+
+async def send_bca_announcement(payload):
+    key = payload["key"]
+    deadline = bca_announcement_deadline(key)
+    if deadline is None or deadline.isoformat() != payload["deadline"]:
+        return  # the deadline moved since this was queued
+    channel = bca_announcement_channel(key)
+    if channel is None:
+        return
+    guild_fired = BCA_ANNOUNCEMENTS.setdefault(str(channel.guild.id), {})
+    if guild_fired.get(key) == payload["deadline"]:
+        return
+    embed = build_bca_announcement(key)
+    if embed is not None and time.time() - payload["fire_at"] <= BCA_CATCHUP_LIMIT:
+        await channel.send(embed=embed)
+    guild_fired[key] = payload["deadline"]
+    save_bca_announcements()
+
+JOB_HANDLERS["bca_announcement"] = send_bca_announcement
 
 # =========================
 # Centralized Logging Configuration Commands
@@ -9712,11 +12055,8 @@ async def backfillcentrallogging(ctx):
     
     for guild in target_servers:
         try:
-            # Check if category already exists
-            category_name = f"{sanitize_server_name(guild.name)}-logs"
-            existing_category = discord.utils.get(central_guild.categories, name=category_name)
-            
-            if existing_category:
+            # Check if category already exists, and make sure it's in the ID map
+            if heal_central_channels(central_guild, guild.id) or find_central_category(central_guild, guild.id):
                 skipped_count += 1
                 continue
             
@@ -9988,5 +12328,11 @@ async def centralloggingstatus(ctx):
 # Load config and initialize bot before running
 load_config()
 init_bot()
+load_storage()
+
+bot.run(TOKEN)
 
-bot.run(TOKEN)
\ No newline at end of file
+# close() already saved everything on Ctrl+C or SIGTERM; this catches whatever it couldn't write
+STORAGE_EXECUTOR.shutdown(wait=True)
+flush_ledger_journal()
+flush_all_stores()
\ No newline at end of file